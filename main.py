@@ -6,12 +6,14 @@ import os
 import argparse # For --resend flag (C9)
 import json     # For deduplication (C8)
 from pathlib import Path # For path handling
+from concurrent.futures import ThreadPoolExecutor # Tutorial generation runs alongside the feed steps
+from collections.abc import Mapping # Config sections are read-only mappings
 
 from src.config_loader import load_config
 from src.ingestion import fetch_all_feeds
-from src.processing import configure_gemini, filter_and_tag_items, reset_token_counts, get_token_counts
+from src.processing import configure_gemini, configure_response_cache, configure_rate_limits, filter_and_tag_items, reset_token_counts, get_token_counts
 from src.summarization import summarize_and_analyze
-from src.tutorial_generator import load_tutorial_topics, select_tutorial_topic, generate_tutorial
+from src.tutorial_generator import load_tutorial_topics, select_tutorial_topic, generate_tutorial, save_tutorial_rotation, TUTORIAL_STATE_FILE
 from src.assembly import assemble_digest
 from src.email_utils import send_email
 
@@ -47,7 +49,7 @@ logger = logging.getLogger(__name__)
 # --- Helper Function for Cost Estimation (Optional) ---
 def _calculate_estimated_cost(token_counts, pricing_config):
     """Calculates estimated cost based on token counts and pricing config."""
-    if not pricing_config or not isinstance(pricing_config, dict):
+    if not pricing_config or not isinstance(pricing_config, Mapping):
         return 0.0
 
     # Assuming pricing is per Million tokens
@@ -59,13 +61,13 @@ def _calculate_estimated_cost(token_counts, pricing_config):
     # For now, let's use a default or average price if available
     # Example: Use 'gemini-2.0-flash' pricing as a proxy if available
     flash_pricing = pricing_config.get('gemini-2.0-flash')
-    if flash_pricing and isinstance(flash_pricing, dict):
+    if flash_pricing and isinstance(flash_pricing, Mapping):
         input_price = flash_pricing.get('input', 0.0)
         output_price = flash_pricing.get('output', 0.0)
     else:
          # Fallback: Use 1.5 flash pricing or a generic placeholder if 2.0 flash not defined
          flash_15_pricing = pricing_config.get('gemini-1.5-flash-latest')
-         if flash_15_pricing and isinstance(flash_15_pricing, dict):
+         if flash_15_pricing and isinstance(flash_15_pricing, Mapping):
              input_price = flash_15_pricing.get('input', 0.0)
              output_price = flash_15_pricing.get('output', 0.0)
          else:
@@ -75,6 +77,48 @@ def _calculate_estimated_cost(token_counts, pricing_config):
     estimated_cost = (prompt_tokens_m * input_price) + (candidates_tokens_m * output_price)
     return estimated_cost
 
+def _collect_tutorial(tutorial_future, selected_topic):
+    """Waits for the tutorial generated in the background; returns its HTML, or None if there is none."""
+    if tutorial_future is None:
+        return None
+    logger.info("Waiting for custom tutorial...")
+    generated_tutorial_html = None
+    try:
+        generated_tutorial_html = tutorial_future.result()
+    except Exception as e:
+        logger.error(f"Tutorial generation raised an exception: {e}", exc_info=True)
+    if not generated_tutorial_html:
+        logger.warning(f"Failed to generate tutorial for topic: {selected_topic}")
+    else:
+        logger.info(f"Tutorial generation complete for topic: {selected_topic}")
+    return generated_tutorial_html
+
+# --- Email Config Helper ---
+def _resolve_email_config(config):
+    """Returns the email settings to send with, creating or enabling them as needed.
+
+    The loaded config is read-only, so any adjustment is made on a new dict rather than in place.
+    """
+    email_config = config.get('email_config')
+    if not email_config:
+        # Create email_config if it doesn't exist
+        logger.info("Created email_config section in configuration")
+        return {
+            'enabled': True,
+            'email_provider': 'smtp',
+            'smtp_server': config.get('smtp_server'),
+            'smtp_port': config.get('smtp_port'),
+            'smtp_username': config.get('smtp_username'),
+            'smtp_password': config.get('smtp_password'),
+            'sender_email': config.get('sender_email'),
+            'recipient_email': config.get('recipient_email')
+        }
+    if not email_config.get('enabled'):
+        # Enable email if it's disabled
+        email_config = dict(email_config, enabled=True)
+        logger.info("Enabled email sending in configuration")
+    return email_config
+
 # --- Context Loading Function (C7) ---
 def load_project_context(filepath=PROJECT_CONTEXT_FILE):
     """Loads project context from the specified markdown file."""
@@ -176,60 +220,68 @@ def run_daily_digest_pipeline(config, args):
     if not configure_gemini(api_key=config.get('gemini_api_key'), credentials_path=config.get('google_application_credentials')):
         logger.error("Failed to configure Gemini API. Aborting pipeline.")
         return
+    configure_response_cache(config.get('response_cache', {}))
+    configure_rate_limits(config.get('rate_limits', {}))
     # No longer need to get a default model instance here
     # Models are fetched dynamically in processing, summarization, tutorial generation
 
-    # 3. Ingestion - Fetch RSS Feeds
-    logger.info("Fetching RSS feeds...")
-    all_items = fetch_all_feeds(config.get('rss_feeds', []), config, processed_urls) # Pass processed_urls (B.4)
-    logger.info(f"Ingestion complete. {len(all_items)} items fetched (deduplication handled during fetch)." ) # Logging reflects change
+    # Start Tutorial Generation (collected in step 6)
+    # It needs nothing from the feeds, so its Gemini call runs in the background while they are
+    # fetched, filtered and summarized instead of adding its latency after them
+    tutorial_state_filepath = config.get('tutorial_state_filepath', TUTORIAL_STATE_FILE)
+    load_tutorial_topics(config.get('initial_tutorial_topics', []), tutorial_state_filepath)
+    selected_topic = select_tutorial_topic()
+    tutorial_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='tutorial')
+    tutorial_future = None
+    if selected_topic:
+        logger.info("Generating custom tutorial in the background...")
+        tutorial_future = tutorial_executor.submit(generate_tutorial, selected_topic, config)
+    else:
+        logger.warning("No tutorial topic selected for generation.")
 
-    items_to_process = all_items # No separate filtering needed here now
+    # Steps 3-5 run under try/finally so the tutorial is collected (and its errors logged) on every
+    # exit path, including an aborted run; a tutorial generated for an aborted run is still cached
+    try:
+        # 3. Ingestion - Fetch RSS Feeds
+        logger.info("Fetching RSS feeds...")
+        all_items = fetch_all_feeds(config.get('rss_feeds', []), config, processed_urls) # Pass processed_urls (B.4)
+        logger.info(f"Ingestion complete. {len(all_items)} items fetched (deduplication handled during fetch)." ) # Logging reflects change
 
-    if not items_to_process:
-        logger.warning("No new items found after ingestion and deduplication. Pipeline might produce an empty digest.")
-        # Optionally, skip the rest of the pipeline if no new items
-        # return
+        items_to_process = all_items # No separate filtering needed here now
 
-    # 4. Processing - Filter & Tag
-    logger.info("Filtering and tagging items...")
-    # Pass config instead of gemini_model
-    filtered_items = filter_and_tag_items(items_to_process, config)
-    if filtered_items is None: # Check for None explicitly, as empty list is valid
-        logger.error("Failed to filter and tag items. Aborting pipeline.")
-        return
-    logger.info(f"Processing complete. {len(filtered_items)} items selected for summarization/analysis.")
-    if not filtered_items:
-        logger.warning("No items remained after filtering. Pipeline might produce an empty digest.")
-
-    # 5. Summarization - Summarize & Analyze
-    logger.info("Summarizing and analyzing top items...")
-    # Pass config instead of gemini_model
-    # Pass project_context (C7)
-    news_data, feed_tutorials_data = summarize_and_analyze(
-        filtered_items,
-        config,
-        project_context=project_context, # Pass context here (B.3)
-        num_news=config.get('num_news_items_to_summarize', 7),
-        num_tutorials=config.get('num_feed_tutorials_to_include', 5)
-    )
-    logger.info("Summarization and analysis complete.")
-    # Summarization function handles internal errors and returns empty lists
+        if not items_to_process:
+            logger.warning("No new items found after ingestion and deduplication. Pipeline might produce an empty digest.")
+            # Optionally, skip the rest of the pipeline if no new items
+            # return
 
-    # 6. Tutorial Generation
-    logger.info("Generating custom tutorial...")
-    load_tutorial_topics(config.get('initial_tutorial_topics', []))
-    selected_topic = select_tutorial_topic()
-    generated_tutorial_html = None
-    if selected_topic:
+        # 4. Processing - Filter & Tag
+        logger.info("Filtering and tagging items...")
         # Pass config instead of gemini_model
-        generated_tutorial_html = generate_tutorial(selected_topic, config)
-        if not generated_tutorial_html:
-            logger.warning(f"Failed to generate tutorial for topic: {selected_topic}")
-        else:
-            logger.info(f"Tutorial generation complete for topic: {selected_topic}")
-    else:
-        logger.warning("No tutorial topic selected for generation.")
+        filtered_items = filter_and_tag_items(items_to_process, config)
+        if filtered_items is None: # Check for None explicitly, as empty list is valid
+            logger.error("Failed to filter and tag items. Aborting pipeline.")
+            return
+        logger.info(f"Processing complete. {len(filtered_items)} items selected for summarization/analysis.")
+        if not filtered_items:
+            logger.warning("No items remained after filtering. Pipeline might produce an empty digest.")
+
+        # 5. Summarization - Summarize & Analyze
+        logger.info("Summarizing and analyzing top items...")
+        # Pass config instead of gemini_model
+        # Pass project_context (C7)
+        news_data, feed_tutorials_data = summarize_and_analyze(
+            filtered_items,
+            config,
+            project_context=project_context, # Pass context here (B.3)
+            num_news=config.get('num_news_items_to_summarize', 7),
+            num_tutorials=config.get('num_feed_tutorials_to_include', 5)
+        )
+        logger.info("Summarization and analysis complete.")
+        # Summarization function handles internal errors and returns empty lists
+    finally:
+        # 6. Tutorial Generation - collect the tutorial started before ingestion
+        generated_tutorial_html = _collect_tutorial(tutorial_future, selected_topic)
+        tutorial_executor.shutdown()
 
     # 7. Assembly - Create Digest
     logger.info("Assembling the digest...")
@@ -259,40 +311,22 @@ def run_daily_digest_pipeline(config, args):
     # 8. Delivery - Send Email
     send_attempted = False
     # Make sure email_config exists and is enabled
-    if not config.get('email_config'):
-        # Create email_config if it doesn't exist
-        config['email_config'] = {
-            'enabled': True,
-            'email_provider': 'smtp',
-            'smtp_server': config.get('smtp_server'),
-            'smtp_port': config.get('smtp_port'),
-            'smtp_username': config.get('smtp_username'),
-            'smtp_password': config.get('smtp_password'),
-            'sender_email': config.get('sender_email'),
-            'recipient_email': config.get('recipient_email')
-        }
-        logger.info("Created email_config section in configuration")
-    elif not config['email_config'].get('enabled'):
-        # Enable email if it's disabled
-        config['email_config']['enabled'] = True
-        logger.info("Enabled email sending in configuration")
+    email_config = _resolve_email_config(config)
 
-    if config.get('email_config') and config['email_config'].get('enabled', True) and final_digest_html:
+    if email_config.get('enabled', True) and final_digest_html:
         logger.info("Sending digest email...")
         email_subject = f"AI Daily Digest - {datetime.datetime.now().strftime('%B %d, %Y')}"
         email_sent = send_email(
             subject=email_subject,
             html_body=final_digest_html,
-            config=config.get('email_config')
+            config=email_config
         )
         send_attempted = True
     else:
         logger.info("Email sending is disabled or digest is empty. Skipping email.")
         if not final_digest_html:
             logger.warning("Digest is empty - no content to send")
-        elif not config.get('email_config'):
-            logger.warning("Email configuration is missing")
-        elif not config['email_config'].get('enabled'):
+        elif not email_config.get('enabled'):
             logger.warning("Email sending is explicitly disabled in config")
         email_sent = False # Explicitly set to false if not attempted
 
@@ -302,6 +336,9 @@ def run_daily_digest_pipeline(config, args):
         if email_sent or not send_attempted:
             logger.info("Updating processed URLs file...")
             save_processed_urls(processed_urls, items_actually_in_digest, processed_urls_filepath)
+            if generated_tutorial_html:
+                # The next run moves on to the following topic
+                save_tutorial_rotation(selected_topic, tutorial_state_filepath)
         else:
             logger.warning("Email sending failed. Not updating processed URLs file to allow reprocessing.")
     else:
@@ -335,25 +372,9 @@ def resend_last_digest(config):
     last_digest_path = Path(LAST_DIGEST_FILE)
 
     # Make sure email_config exists and is enabled
-    if not config.get('email_config'):
-        # Create email_config if it doesn't exist
-        config['email_config'] = {
-            'enabled': True,
-            'email_provider': 'smtp',
-            'smtp_server': config.get('smtp_server'),
-            'smtp_port': config.get('smtp_port'),
-            'smtp_username': config.get('smtp_username'),
-            'smtp_password': config.get('smtp_password'),
-            'sender_email': config.get('sender_email'),
-            'recipient_email': config.get('recipient_email')
-        }
-        logger.info("Created email_config section in configuration for resend")
-    elif not config['email_config'].get('enabled'):
-        # Enable email if it's disabled
-        config['email_config']['enabled'] = True
-        logger.info("Enabled email sending in configuration for resend")
+    email_config = _resolve_email_config(config)
 
-    if not config.get('email_config') or not config['email_config'].get('enabled', True):
+    if not email_config.get('enabled', True):
         logger.error("Email sending is not enabled in the configuration. Cannot resend.")
         return
 
@@ -374,7 +395,7 @@ def resend_last_digest(config):
         email_sent = send_email(
             subject=email_subject,
             html_body=last_digest_html,
-            config=config.get('email_config')
+            config=email_config
         )
 
         if email_sent:
@@ -2,7 +2,6 @@ import logging
 import datetime
 import re
 import html # For escaping
-import markdown # Import the markdown library
 # Import Pygments for code highlighting with inline styles
 import pygments
 from pygments.lexers import PythonLexer
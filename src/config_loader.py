@@ -1,84 +1,302 @@
 import os
+import re
+import sys
 import logging
-import yaml
+import functools
+import copy
+from types import MappingProxyType
+from dataclasses import dataclass, field, fields
 from pathlib import Path
-from dotenv import load_dotenv
+from dotenv import load_dotenv, find_dotenv
 
 logger = logging.getLogger(__name__)
 
-def load_config():
-    """Loads configuration from config.yaml and .env file, with .env taking precedence for sensitive data."""
+# Located once at import (relative to the working directory, like config.yaml);
+# empty string when there is no .env file, e.g. in containers that inject env vars directly
+_DOTENV_PATH = find_dotenv(usecwd=True)
+
+# Keys of configuration problems already reported, so reloads don't repeat them
+_WARNED = set()
+
+def _warn_once(key, msg, *args, level=logging.WARNING):
+    """Logs msg (lazily %-formatted) the first time a given problem key is seen."""
+    if key in _WARNED:
+        return
+    _WARNED.add(key)
+    logger.log(level, msg, *args)
+
+# Set once the .env file has been loaded, so repeated calls don't re-parse it
+_DOTENV_LOADED = False
+
+def _load_dotenv_once():
+    """Loads the .env file into os.environ on the first call only; a no-op when no .env exists."""
+    global _DOTENV_LOADED
+    if not _DOTENV_LOADED:
+        if _DOTENV_PATH:
+            load_dotenv(_DOTENV_PATH, override=True)
+        _DOTENV_LOADED = True
+
+# --- Environment override tables ---
+# (config key, environment variable) pairs copied verbatim when the variable is set
+_STR_FIELDS = (
+    ('gemini_api_key', 'GEMINI_API_KEY'),
+    ('google_application_credentials', 'GOOGLE_APPLICATION_CREDENTIALS'),
+    ('redis_url', 'REDIS_URL'), # Feed cache; redis_host/redis_port are used when no URL is set
+    ('redis_host', 'REDIS_HOST'),
+)
+_EMAIL_STR_FIELDS = (
+    ('recipient_email', 'RECIPIENT_EMAIL'),
+    ('sender_email', 'SENDER_EMAIL'),
+    ('email_subject_prefix', 'EMAIL_SUBJECT_PREFIX'),
+)
+_SMTP_STR_FIELDS = (
+    ('smtp_server', 'SMTP_SERVER'),
+    ('smtp_username', 'SMTP_USERNAME'),
+    ('smtp_password', 'SMTP_PASSWORD'),
+)
+_SENDGRID_STR_FIELDS = (
+    ('sendgrid_api_key', 'SENDGRID_API_KEY'),
+)
+# (config key, environment variable, default) triples parsed as integers
+_INT_FIELDS = (
+    ('num_news_items_to_summarize', 'NUM_NEWS_ITEMS_TO_SUMMARIZE', 7),
+    ('num_feed_tutorials_to_include', 'NUM_FEED_TUTORIALS_TO_INCLUDE', 5),
+    ('redis_port', 'REDIS_PORT', 6379),
+)
+_SMTP_INT_FIELDS = (
+    ('smtp_port', 'SMTP_PORT', 587),
+    ('smtp_timeout', 'SMTP_TIMEOUT', 30), # Seconds; bounds connect and each socket operation
+)
+
+def _apply_str_fields(target, env, fields):
+    """Overrides target[key] with the environment value for every variable that is set."""
+    for key, env_name in fields:
+        value = env.get(env_name)
+        if value:
+            target[key] = value
+
+def _apply_int_fields(target, env, fields):
+    """Sets target[key] to the integer environment value, else the integer config.yaml value, else the default.
+
+    Values from either source are parsed the same way; a non-numeric one is reported and skipped.
+    """
+    for key, env_name, default in fields:
+        value = None
+        for raw, source in ((env.get(env_name), env_name), (target.get(key), key)):
+            if raw is None or raw == '':
+                continue
+            try:
+                value = int(raw)
+                break
+            except (ValueError, TypeError):
+                _warn_once(f"invalid_{source}", "Invalid %s value %r, ignoring it (default %s)", source, raw, default)
+        target[key] = value or default
+
+def _parse_flag(value):
+    """True for any set value except an explicit off value ('', 0, false, no, none)."""
+    return str(value).strip().lower() not in ('', '0', 'false', 'no', 'none')
+
+# Splits comma-separated env values (RSS_FEEDS, INITIAL_TUTORIAL_TOPICS), absorbing surrounding whitespace
+_CSV_SPLIT = re.compile(r'\s*,\s*')
+
+def _split_csv(value):
+    """Splits a comma-separated string into a list of non-empty, stripped entries."""
+    return [part for part in _CSV_SPLIT.split(value.strip()) if part]
+
+# Parsed config.yaml contents keyed by (path, mtime_ns, size)
+_YAML_CACHE = {}
+
+def _read_yaml_config(config_yaml_path):
+    """Parses config.yaml, reusing the previous result while the file is unchanged on disk."""
+    st = os.stat(config_yaml_path)
+    cache_key = (str(config_yaml_path), st.st_mtime_ns, st.st_size)
+    cached = _YAML_CACHE.get(cache_key)
+    if cached is None:
+        # Imported lazily so .env-only setups don't pay for PyYAML at startup
+        import yaml
+        # Prefer the libyaml-backed loader when PyYAML was built with it
+        loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+        # Hand PyYAML the raw bytes in one read; it detects the encoding itself
+        with open(config_yaml_path, 'rb') as f:
+            cached = yaml.load(f.read(), Loader=loader) or {}
+        _YAML_CACHE.clear() # Only the current version of the file is worth keeping
+        _YAML_CACHE[cache_key] = cached
+    # Callers mutate nested sections (e.g. email_config), so never hand out the cached object
+    return copy.deepcopy(cached)
+
+# --- Typed Email Settings ---
+@dataclass(frozen=True, slots=True)
+class EmailConfig:
+    """Immutable, attribute-access view of the email_config section."""
+    enabled: bool = True
+    email_provider: str = 'smtp'
+    sender_email: str | None = None
+    recipient_email: str | None = None
+    email_subject_prefix: str = '[AI Digest]'
+    plain_text_alternative: bool = True # False sends a single text/html part
+    smtp_server: str | None = None
+    smtp_port: int | None = None
+    smtp_timeout: float = 30
+    smtp_username: str | None = None
+    smtp_password: str | None = None
+    sendgrid_api_key: str | None = None
+    dry_run: bool = False # Write emails to .eml files instead of sending them (MAIL_DRY_RUN)
+
+    @classmethod
+    def from_mapping(cls, mapping):
+        """Builds an EmailConfig from an email_config mapping, ignoring unknown and unset keys."""
+        if isinstance(mapping, cls):
+            return mapping
+        return cls(**{key: mapping[key] for key in _EMAIL_CONFIG_FIELDS
+                      if mapping.get(key) is not None})
+
+_EMAIL_CONFIG_FIELDS = tuple(f.name for f in fields(EmailConfig))
+
+@dataclass(frozen=True, slots=True)
+class SmtpConfig:
+    """Validated SMTP delivery settings, built once so the send path needs no further checks."""
+    sender: str
+    recipient: str
+    username: str
+    password: str = field(repr=False)
+    host: str
+    port: int
+    timeout: float = 30
+    use_ssl: bool = False # Implicit TLS (SMTPS) instead of STARTTLS
+    plain_text_alternative: bool = True
+
+    @classmethod
+    def from_email_config(cls, email_config):
+        """Validates an email_config mapping (or EmailConfig) into an SmtpConfig.
+
+        Raises:
+            ValueError: If any required setting is missing; the message names all of them.
+        """
+        if isinstance(email_config, cls):
+            return email_config
+        email = EmailConfig.from_mapping(email_config)
+        required = (('sender_email', email.sender_email), ('recipient_email', email.recipient_email),
+                    ('smtp_password', email.smtp_password), ('smtp_server', email.smtp_server),
+                    ('smtp_port', email.smtp_port))
+        missing = [name for name, value in required if not value]
+        if missing:
+            raise ValueError(f"SMTP configuration is incomplete. Missing: {', '.join(missing)}")
+        port = int(email.smtp_port)
+        return cls(sender=email.sender_email, recipient=email.recipient_email,
+                   username=email.smtp_username or email.sender_email, password=email.smtp_password,
+                   host=email.smtp_server, port=port, timeout=email.smtp_timeout, use_ssl=port == 465,
+                   plain_text_alternative=email.plain_text_alternative)
+
+# --- Email Provider Loaders ---
+def _load_smtp_config(email_config, env):
+    """Applies SMTP environment overrides and defaults to email_config."""
+    # SMTP configuration (environment variables take precedence)
+    _apply_str_fields(email_config, env, _SMTP_STR_FIELDS)
+    _apply_int_fields(email_config, env, _SMTP_INT_FIELDS)
+
+    # Set defaults
+    if not email_config.get('smtp_username'):
+        email_config['smtp_username'] = email_config.get('sender_email')
+
+    # Log the SMTP configuration for debugging (without revealing password)
+    logger.debug("SMTP Configuration loaded: Server=%s, Port=%s, Username=%s",
+                 email_config.get('smtp_server'), email_config.get('smtp_port'), email_config.get('smtp_username'))
+
+    # Validate at load time so incomplete settings are reported up front, not only when sending
+    try:
+        SmtpConfig.from_email_config(email_config)
+    except ValueError as e:
+        _warn_once("smtp_incomplete", "%s. Please check your .env file and ensure SMTP_SERVER, SMTP_PORT, "
+                   "and SMTP_PASSWORD are set correctly. Email functionality will not work without these values.",
+                   e, level=logging.ERROR)
+
+def _load_sendgrid_config(email_config, env):
+    """Applies SendGrid environment overrides to email_config."""
+    _apply_str_fields(email_config, env, _SENDGRID_STR_FIELDS)
+    if not email_config.get('sendgrid_api_key'):
+        _warn_once("sendgrid_key_missing", "SendGrid API Key not found in .env. Please set SENDGRID_API_KEY in your .env file.",
+                   level=logging.ERROR)
+
+# Maps a normalized email_provider value to the loader for its settings
+_PROVIDER_LOADERS = {
+    'smtp': _load_smtp_config,
+    'sendgrid': _load_sendgrid_config,
+}
+
+def _freeze(value):
+    """Recursively converts dicts to read-only mappings and lists to tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+def load_config(path="config.yaml"):
+    """Loads configuration from a YAML file (config.yaml by default) and .env file, with .env taking precedence for sensitive data.
+
+    The result is memoized for the lifetime of the process and returned as a read-only mapping
+    (lists become tuples) so every caller can share the same instance; copy a section with
+    dict(...) if it needs changing. Use reload_config() to force a re-read.
+    """
+    # Memoized on the absolute path, so load_config() and load_config("config.yaml") share one entry
+    return _load_config(os.path.abspath(path))
+
+@functools.lru_cache(maxsize=1)
+def _load_config(path):
+    """Body of load_config for an absolute path."""
     # Load environment variables first
-    load_dotenv(override=True)
+    _load_dotenv_once()
+    # Snapshot the environment once; every lookup below is a plain dict read
+    env = dict(os.environ)
 
     config = {}
 
     # --- Load YAML Configuration ---
-    config_yaml_path = Path("config.yaml")
+    config_yaml_path = Path(path)
     if config_yaml_path.exists():
         try:
-            with open(config_yaml_path, 'r', encoding='utf-8') as f:
-                yaml_config = yaml.safe_load(f) or {}
-            logger.info("Successfully loaded configuration from config.yaml")
+            yaml_config = _read_yaml_config(config_yaml_path)
+            logger.info(f"Successfully loaded configuration from {config_yaml_path}")
             
             # Merge YAML config into main config
             config.update(yaml_config)
             
         except Exception as e:
-            logger.error(f"Error loading config.yaml: {e}")
+            logger.error(f"Error loading {config_yaml_path}: {e}")
             logger.warning("Continuing with .env configuration only")
     else:
-        logger.warning("config.yaml not found, using .env configuration only")
+        _warn_once("config_yaml_missing", "%s not found, using .env configuration only", config_yaml_path)
 
     # --- Override with Environment Variables (for sensitive data) ---
     
     # Gemini API (environment variables take precedence)
-    if os.getenv('GEMINI_API_KEY'):
-        config['gemini_api_key'] = os.getenv('GEMINI_API_KEY')
-    if os.getenv('GOOGLE_APPLICATION_CREDENTIALS'):
-        config['google_application_credentials'] = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
+    _apply_str_fields(config, env, _STR_FIELDS)
     
     if not config.get('gemini_api_key') and not config.get('google_application_credentials'):
-        logger.warning("Gemini API key or Google Application Credentials not found in .env or config.yaml")
+        _warn_once("gemini_credentials_missing", "Gemini API key or Google Application Credentials not found in .env or config.yaml")
 
     # --- RSS Feeds ---
     # Use RSS feeds from config.yaml if available, otherwise fall back to .env
     if not config.get('rss_feeds'):
-        rss_feeds_str = os.getenv('RSS_FEEDS', '')
-        config['rss_feeds'] = [url.strip() for url in rss_feeds_str.split(',') if url.strip()]
+        rss_feeds_str = env.get('RSS_FEEDS', '')
+        config['rss_feeds'] = _split_csv(rss_feeds_str)
         if config['rss_feeds']:
             logger.info(f"Loaded {len(config['rss_feeds'])} RSS feeds from .env")
     else:
         logger.info(f"Loaded {len(config['rss_feeds'])} RSS feeds from config.yaml")
     
     if not config.get('rss_feeds'):
-        logger.warning("No RSS feeds found in config.yaml or .env file.")
+        _warn_once("rss_feeds_missing", "No RSS feeds found in config.yaml or .env file.")
         config['rss_feeds'] = []
 
     # --- Processing Configuration ---
     # Environment variables can override YAML settings
-    if os.getenv('NUM_NEWS_ITEMS_TO_SUMMARIZE'):
-        try:
-            config['num_news_items_to_summarize'] = int(os.getenv('NUM_NEWS_ITEMS_TO_SUMMARIZE'))
-        except ValueError:
-            logger.warning("Invalid NUM_NEWS_ITEMS_TO_SUMMARIZE in .env, using config.yaml or default")
-    
-    if not config.get('num_news_items_to_summarize'):
-        config['num_news_items_to_summarize'] = 7
-
-    if os.getenv('NUM_FEED_TUTORIALS_TO_INCLUDE'):
-        try:
-            config['num_feed_tutorials_to_include'] = int(os.getenv('NUM_FEED_TUTORIALS_TO_INCLUDE'))
-        except ValueError:
-            logger.warning("Invalid NUM_FEED_TUTORIALS_TO_INCLUDE in .env, using config.yaml or default")
-    
-    if not config.get('num_feed_tutorials_to_include'):
-        config['num_feed_tutorials_to_include'] = 5
+    _apply_int_fields(config, env, _INT_FIELDS)
 
     # Tutorial topics from environment or config
-    if os.getenv('INITIAL_TUTORIAL_TOPICS'):
-        tutorial_topics_str = os.getenv('INITIAL_TUTORIAL_TOPICS')
-        config['initial_tutorial_topics'] = [topic.strip() for topic in tutorial_topics_str.split(',') if topic.strip()]
+    tutorial_topics_str = env.get('INITIAL_TUTORIAL_TOPICS')
+    if tutorial_topics_str:
+        config['initial_tutorial_topics'] = _split_csv(tutorial_topics_str)
     
     if not config.get('initial_tutorial_topics'):
         config['initial_tutorial_topics'] = []
@@ -87,70 +305,46 @@ def load_config():
     email_config = config.get('email_config', {})
     
     # Override with environment variables
-    if os.getenv('EMAIL_PROVIDER'):
-        email_config['email_provider'] = os.getenv('EMAIL_PROVIDER').lower().strip()
-    if os.getenv('RECIPIENT_EMAIL'):
-        email_config['recipient_email'] = os.getenv('RECIPIENT_EMAIL')
-    if os.getenv('SENDER_EMAIL'):
-        email_config['sender_email'] = os.getenv('SENDER_EMAIL')
-    if os.getenv('EMAIL_SUBJECT_PREFIX'):
-        email_config['email_subject_prefix'] = os.getenv('EMAIL_SUBJECT_PREFIX')
+    email_provider = env.get('EMAIL_PROVIDER')
+    if email_provider:
+        email_config['email_provider'] = email_provider
+    _apply_str_fields(email_config, env, _EMAIL_STR_FIELDS)
     
     # Set defaults
     if not email_config.get('enabled'):
         email_config['enabled'] = True
-    if not email_config.get('email_provider'):
-        email_config['email_provider'] = 'smtp'
+    # Normalize (and intern) once so provider dispatch here and in email_utils is a plain lookup
+    # that hits the identity fast path against the literal table keys
+    email_config['email_provider'] = sys.intern(str(email_config.get('email_provider') or 'smtp').lower().strip())
     if not email_config.get('email_subject_prefix'):
         email_config['email_subject_prefix'] = '[AI Digest]'
+    email_config['dry_run'] = _parse_flag(env['MAIL_DRY_RUN'] if 'MAIL_DRY_RUN' in env else email_config.get('dry_run'))
 
     if not email_config.get('recipient_email') or not email_config.get('sender_email'):
-        logger.warning("Recipient or Sender email not configured in .env or config.yaml. Email delivery will fail.")
+        _warn_once("email_addresses_missing", "Recipient or Sender email not configured in .env or config.yaml. Email delivery will fail.")
 
-    if email_config['email_provider'] == 'smtp':
-        # SMTP configuration (environment variables take precedence)
-        if os.getenv('SMTP_SERVER'):
-            email_config['smtp_server'] = os.getenv('SMTP_SERVER')
-        if os.getenv('SMTP_PORT'):
-            try:
-                email_config['smtp_port'] = int(os.getenv('SMTP_PORT'))
-            except (ValueError, TypeError):
-                logger.warning("Invalid SMTP_PORT in .env, using config.yaml or default 587")
-        if os.getenv('SMTP_USERNAME'):
-            email_config['smtp_username'] = os.getenv('SMTP_USERNAME')
-        if os.getenv('SMTP_PASSWORD'):
-            email_config['smtp_password'] = os.getenv('SMTP_PASSWORD')
-        
-        # Set defaults
-        if not email_config.get('smtp_port'):
-            email_config['smtp_port'] = 587
-        if not email_config.get('smtp_username'):
-            email_config['smtp_username'] = email_config.get('sender_email')
-        
-        # Log the SMTP configuration for debugging (without revealing password)
-        logger.debug(f"SMTP Configuration loaded: Server={email_config.get('smtp_server')}, "
-                    f"Port={email_config.get('smtp_port')}, Username={email_config.get('smtp_username')}")
-        
-        if not all([email_config.get('smtp_server'), email_config.get('smtp_port'), email_config.get('smtp_password')]):
-            logger.error("SMTP configuration is incomplete. Please check your .env file and ensure "
-                      "SMTP_SERVER, SMTP_PORT, and SMTP_PASSWORD are set correctly. "
-                      "Email functionality will not work without these values.")
-                
-    elif email_config['email_provider'] == 'sendgrid':
-        if os.getenv('SENDGRID_API_KEY'):
-            email_config['sendgrid_api_key'] = os.getenv('SENDGRID_API_KEY')
-        if not email_config.get('sendgrid_api_key'):
-            logger.error("SendGrid API Key not found in .env. Please set SENDGRID_API_KEY in your .env file.")
-    else:
-        logger.error(f"Unsupported email provider: '{email_config['email_provider']}'. Please set EMAIL_PROVIDER=smtp "
-                  f"or EMAIL_PROVIDER=sendgrid in your .env file. Defaulting to 'smtp', but email functionality "
-                  f"will not work correctly without proper configuration.")
+    provider_loader = _PROVIDER_LOADERS.get(email_config['email_provider'])
+    if provider_loader is None:
+        _warn_once(f"unsupported_provider_{email_config['email_provider']}",
+                   "Unsupported email provider: '%s'. Please set EMAIL_PROVIDER=smtp "
+                   "or EMAIL_PROVIDER=sendgrid in your .env file. Defaulting to 'smtp', but email functionality "
+                   "will not work correctly without proper configuration.", email_config['email_provider'],
+                   level=logging.ERROR)
         email_config['email_provider'] = 'smtp'
+        provider_loader = _load_smtp_config
+    provider_loader(email_config, env)
 
     # Add the email config to the main config
     config['email_config'] = email_config
 
-    return config
+    return _freeze(config)
+
+def reload_config(path="config.yaml"):
+    """Clears the memoized configuration (and .env load flag) and loads it again."""
+    global _DOTENV_LOADED
+    _DOTENV_LOADED = False
+    _load_config.cache_clear()
+    return load_config(path)
 
 if __name__ == '__main__':
     # Basic test loading
@@ -1,166 +1,570 @@
 import smtplib
 import ssl
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import atexit
+import asyncio
+import socket
+import time
+import threading
+import functools
+import re
+import html
+import os
+import tempfile
+import uuid
+from pathlib import Path
+from email.message import EmailMessage
+from email import policy
+from email.generator import BytesGenerator
+from io import BytesIO
 import logging
+from dataclasses import dataclass
+from src.config_loader import EmailConfig, SmtpConfig, load_config
 # from sendgrid import SendGridAPIClient # Uncomment if using SendGrid
 # from sendgrid.helpers.mail import Mail # Uncomment if using SendGrid
 
 logger = logging.getLogger(__name__)
 
-def send_email_smtp(subject, html_body, config):
-    """Sends an email using SMTP, assuming html_body is already HTML."""
-    sender_email = config.get('sender_email')
-    receiver_email = config.get('recipient_email')
-    # Get username, default to sender_email if not provided
-    smtp_username = config.get('smtp_username', sender_email)
-    password = config.get('smtp_password')
-    smtp_server = config.get('smtp_server')
-    smtp_port = config.get('smtp_port')
-
-    print(f"SMTP_SERVER: {smtp_server}")
-    print(f"SMTP_PORT: {smtp_port}")
-    print(f"SMTP_USERNAME: {smtp_username}")
-    print(f"SMTP_PASSWORD: {'******' if password else 'MISSING'}")
-    print(f"SENDER_EMAIL: {sender_email}")
-    print(f"RECIPIENT_EMAIL: {receiver_email}")
+@functools.lru_cache(maxsize=1)
+def _get_ssl_context():
+    """Returns the process-wide SSL context used for SMTP connections.
+
+    Built on first use rather than at import, and kept alive so OpenSSL can reuse its session cache.
+    """
+    logger.info("SSL Context created for SMTP connections")
+    return ssl.create_default_context()
+
+# --- TLS Session Resumption ---
+# Last TLS session per (server, port); offering it on reconnect lets the server skip the full handshake
+_TLS_SESSIONS = {}
+
+class _ResumableSMTP(smtplib.SMTP):
+    """smtplib.SMTP whose STARTTLS offers the previous TLS session for resumption."""
+
+    def starttls(self, keyfile=None, certfile=None, context=None):
+        # Mirrors smtplib.SMTP.starttls, adding session= to wrap_socket
+        self.ehlo_or_helo_if_needed()
+        if not self.has_extn("starttls"):
+            raise smtplib.SMTPNotSupportedError("STARTTLS extension not supported by server.")
+        (resp, reply) = self.docmd("STARTTLS")
+        if resp != 220:
+            raise smtplib.SMTPResponseException(resp, reply)
+        session = _TLS_SESSIONS.get((self._host, self.sock.getpeername()[1]))
+        self.sock = context.wrap_socket(self.sock, server_hostname=self._host, session=session)
+        self.file = None
+        # RFC 3207: forget everything learned from the server before the TLS handshake
+        self.helo_resp = None
+        self.ehlo_resp = None
+        self.esmtp_features = {}
+        self.does_esmtp = False
+        return (resp, reply)
+
+class _ResumableSMTP_SSL(smtplib.SMTP_SSL):
+    """smtplib.SMTP_SSL that offers the previous TLS session for resumption."""
+
+    def _get_socket(self, host, port, timeout):
+        new_socket = smtplib.SMTP._get_socket(self, host, port, timeout)
+        return self.context.wrap_socket(new_socket, server_hostname=self._host,
+                                        session=_TLS_SESSIONS.get((host, port)))
+
+def _remember_tls_session(server, smtp_server, smtp_port):
+    """Stores the connection's TLS session for the next reconnect to the same server."""
+    session = getattr(server.sock, 'session', None)
+    if session is not None:
+        _TLS_SESSIONS[(smtp_server, smtp_port)] = session
+        logger.debug("TLS session for %s:%s reused: %s", smtp_server, smtp_port,
+                     getattr(server.sock, 'session_reused', False))
+
+# --- SMTP Connection Pool ---
+# Authenticated SMTP sessions kept open between sends, keyed by (server, port, username).
+# Each thread gets its own pool: an smtplib session must not be shared between threads
+_POOL_LOCAL = threading.local()
+# Every thread's pool, so the atexit hook can close sessions opened by worker threads too
+_ALL_POOLS = []
+_ALL_POOLS_LOCK = threading.Lock()
+
+def _thread_pool():
+    """Returns the calling thread's SMTP session pool, creating it on first use."""
+    pool = getattr(_POOL_LOCAL, 'sessions', None)
+    if pool is None:
+        pool = _POOL_LOCAL.sessions = {}
+        with _ALL_POOLS_LOCK:
+            _ALL_POOLS.append(pool)
+    return pool
+
+def _open_smtp(smtp):
+    """Opens a new SMTP connection (implicit SSL for smtp.use_ssl, STARTTLS otherwise) and logs in.
+
+    smtp.timeout bounds the TCP connect and every later socket operation, so a dead server fails
+    fast instead of hanging the digest run.
+    """
+    smtp_server, smtp_port, smtp_username = smtp.host, smtp.port, smtp.username
+    logger.info(f"SMTP ATTEMPT: Connecting to {smtp_server}:{smtp_port}")
     
-    # Log all config keys for debugging (without sensitive values)
-    logger.debug("Full email config keys: %s", ', '.join(config.keys()))
-
-    # Check configuration completeness
-    missing_config = []
-    if not sender_email: missing_config.append("sender_email")
-    if not receiver_email: missing_config.append("recipient_email")
-    if not password: missing_config.append("smtp_password")
-    if not smtp_server: missing_config.append("smtp_server")
-    if not smtp_port: missing_config.append("smtp_port")
+    # Shared SSL context (CA bundle is loaded once per process)
+    context = _get_ssl_context()
     
-    if missing_config:
-        logger.error(f"SMTP configuration is incomplete. Missing: {', '.join(missing_config)}")
-        logger.error("Please check your .env file and ensure all SMTP configuration values are set correctly.")
-        return False
+    # Note whether we're using explicit or implicit SSL
+    use_ssl = smtp.use_ssl
+    logger.info(f"Using {'SSL (implicit)' if use_ssl else 'STARTTLS (explicit)'} for connection")
+    
+    # Set up the SMTP connection based on port
+    if use_ssl:
+        logger.info(f"Creating SMTP_SSL connection to {smtp_server}:{smtp_port}")
+        server = _ResumableSMTP_SSL(smtp_server, smtp_port, context=context, timeout=smtp.timeout)
+    else:
+        logger.info(f"Creating SMTP connection to {smtp_server}:{smtp_port}")
+        server = _ResumableSMTP(smtp_server, smtp_port, timeout=smtp.timeout)
+        logger.info("SMTP connection established, attempting STARTTLS")
+        # Enable debug output on the SMTP connection if needed
+        # server.set_debuglevel(1)
+        server.starttls(context=context)
+        logger.info("STARTTLS completed successfully")
 
-    if not all([sender_email, receiver_email, password, smtp_server, smtp_port]):
-        logger.error("SMTP configuration is incomplete (missing sender, recipient, password, server, or port). Cannot send email.")
-        logger.error("Please check your .env file and ensure all SMTP configuration values are set correctly.")
-        return False
+    # SMTP is a chatty request/response protocol; don't let Nagle hold back small commands
+    try:
+        server.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except OSError as e:
+        logger.debug("Could not set TCP_NODELAY on SMTP socket: %s", e)
+    
+    # A single login; smtplib already negotiates the best mechanism the server advertises,
+    # and repeating the same credentials only adds round trips (and risks lockouts)
+    try:
+        logger.info(f"Attempting login with username: {smtp_username}")
+        server.login(smtp_username, smtp.password)
+    except Exception:
+        # Don't leak a connection that never got authenticated; the caller logs the failure
+        _close_smtp(server)
+        raise
+    logger.info(f"Login successful for {smtp_username}")
+    # Under TLS 1.3 the session ticket arrives after the handshake, so capture it post-login
+    _remember_tls_session(server, smtp_server, smtp_port)
+
+    return server
+
+def _close_smtp(server):
+    """Closes an SMTP connection, ignoring errors from an already-dead socket."""
+    try:
+        server.quit()
+        logger.info("SMTP connection closed")
+    except Exception as e:
+        logger.warning(f"Error closing SMTP connection: {e}")
+        server.close()
+
+def _get_smtp(smtp):
+    """Returns a live pooled SMTP session, reconnecting if the cached one has gone stale."""
+    key = (smtp.host, smtp.port, smtp.username)
+    pool = _thread_pool()
+    server = pool.get(key)
+    if server is not None:
+        # Cheap health check before reuse; servers drop idle sessions on their own schedule
+        try:
+            if server.noop()[0] == 250:
+                logger.info(f"Reusing pooled SMTP connection to {smtp.host}:{smtp.port}")
+                return server
+        except (smtplib.SMTPException, OSError):
+            pass
+        logger.info(f"Pooled SMTP connection to {smtp.host}:{smtp.port} is no longer usable, reconnecting")
+        _discard_smtp(key)
 
-    message = MIMEMultipart("alternative")
+    server = _open_smtp(smtp)
+    pool[key] = server
+    return server
+
+def _discard_smtp(key):
+    """Removes a session from the calling thread's pool and closes it."""
+    server = _thread_pool().pop(key, None)
+    if server is not None:
+        _close_smtp(server)
+
+def _close_all_smtp():
+    """Closes every pooled SMTP session in every thread (registered to run at interpreter exit)."""
+    with _ALL_POOLS_LOCK:
+        pools = list(_ALL_POOLS)
+    for pool in pools:
+        while pool:
+            _close_smtp(pool.popitem()[1])
+
+atexit.register(_close_all_smtp)
+
+# --- HTML to Plain Text ---
+_NON_CONTENT_RE = re.compile(r'<(head|style|script)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_BLOCK_BREAK_RE = re.compile(r'<br\s*/?>|</(?:p|div|h[1-6]|li|tr|pre|blockquote)\s*>', re.IGNORECASE)
+_LIST_ITEM_RE = re.compile(r'<li\b[^>]*>', re.IGNORECASE)
+_TAG_RE = re.compile(r'<[^>]+>')
+_SPACES_RE = re.compile(r'[ \t\r\f\v]+')
+_BLANK_LINES_RE = re.compile(r'\n\s*\n+')
+_PLAIN_TEXT_PLACEHOLDER = "Please view this email in an HTML-compatible client to see the full digest."
+
+@functools.lru_cache(maxsize=4)
+def _html_to_text(html_body):
+    """Converts the digest HTML into a readable plain-text alternative (cached per body)."""
+    text = _NON_CONTENT_RE.sub('', html_body)
+    text = _LIST_ITEM_RE.sub('\n- ', text)
+    text = _BLOCK_BREAK_RE.sub('\n', text)
+    text = html.unescape(_TAG_RE.sub('', text))
+    text = _SPACES_RE.sub(' ', text)
+    text = _BLANK_LINES_RE.sub('\n\n', text).strip()
+    return text or _PLAIN_TEXT_PLACEHOLDER
+
+def render_digest_mime(subject, html_body, sender_email, plain_text_alternative=True):
+    """Builds the MIME message for a digest once; callers set the To header per recipient.
+
+    With plain_text_alternative=False the message is a single text/html part, skipping the
+    multipart/alternative wrapper and the text rendering entirely.
+    """
+    # policy.SMTP emits CRLF line endings directly, so the bytes can go on the wire as-is
+    message = EmailMessage(policy=policy.SMTP)
     message["Subject"] = subject
     message["From"] = sender_email
-    message["To"] = receiver_email
-
-    # We still need a plain text part for email clients that don't support HTML.
-    # Create a basic plain text version (e.g., stripping tags or a simple message).
-    # For now, a simple message is sufficient. A more robust solution could strip HTML tags.
-    plain_text_fallback = "Please view this email in an HTML-compatible client to see the full digest."
-    text_part = MIMEText(plain_text_fallback, "plain")
-    message.attach(text_part)
-
-    # Attach the HTML part directly
-    # The html_body argument is now assumed to be the full HTML document string
-    html_part = MIMEText(html_body, "html")
-    message.attach(html_part)
-
-    # Authentication methods to try in order
-    auth_methods = ['', 'PLAIN', 'LOGIN', 'CRAM-MD5']  # '' means let the server choose
-    
-    # Initialize variables for tracking auth attempts
-    auth_errors = []
-    last_exception = None
-    
+
+    # Pin the charset and transfer encoding so the body is encoded in one pass, without the
+    # ASCII/line-length scan email.contentmanager otherwise runs to pick an encoding
+    if not plain_text_alternative:
+        message.set_content(html_body, subtype="html", charset="utf-8", cte="base64")
+        return message
+
+    # A plain text part for email clients that don't support HTML.
+    # Derive it from the HTML so it carries the actual digest content.
+    message.set_content(_html_to_text(html_body), charset="utf-8", cte="base64")
+    # The html_body argument is assumed to be the full HTML document string
+    message.add_alternative(html_body, subtype="html", charset="utf-8", cte="base64")
+    return message
+
+# Normalizes line endings to CRLF and dot-stuffs lines starting with '.' (RFC 5321 4.5.2)
+_BARE_EOL_RE = re.compile(rb'\r\n|\n|\r')
+_LEADING_DOT_RE = re.compile(rb'(?m)^\.')
+
+# Failures worth one retry on a fresh connection: the pooled session went away underneath us
+_TRANSIENT_SMTP_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+class _DeliveryUncertain(Exception):
+    """The connection failed once the message data was under way; the server may have accepted it.
+
+    Not one of _TRANSIENT_SMTP_ERRORS, so the message is counted as failed rather than resent
+    (a resend could deliver it twice).
+    """
+
+def _plain_send(server, from_addr, to_addrs, msg):
+    """server.sendmail() for servers without PIPELINING, split so a failure during DATA is told apart."""
+    code, resp = server.mail(from_addr)
+    if code != 250:
+        server.rset()
+        raise smtplib.SMTPSenderRefused(code, resp, from_addr)
+    refused = {}
+    for addr in to_addrs:
+        code, resp = server.rcpt(addr)
+        if code not in (250, 251):
+            refused[addr] = (code, resp)
+    if len(refused) == len(to_addrs):
+        server.rset()
+        raise smtplib.SMTPRecipientsRefused(refused)
     try:
-        logger.info(f"SMTP ATTEMPT: Connecting to {smtp_server}:{smtp_port}")
-        
-        # Create SSL context
-        context = ssl.create_default_context()
-        logger.info(f"SSL Context created for SMTP connection")
-        
-        # Note whether we're using explicit or implicit SSL
-        use_ssl = smtp_port == 465
-        logger.info(f"Using {'SSL (implicit)' if use_ssl else 'STARTTLS (explicit)'} for connection")
-        
-        # Set up the SMTP connection based on port
-        if use_ssl:
-            logger.info(f"Creating SMTP_SSL connection to {smtp_server}:{smtp_port}")
-            server = smtplib.SMTP_SSL(smtp_server, smtp_port, context=context)
-        else:
-            logger.info(f"Creating SMTP connection to {smtp_server}:{smtp_port}")
-            server = smtplib.SMTP(smtp_server, smtp_port)
-            logger.info("SMTP connection established, attempting STARTTLS")
-            # Enable debug output on the SMTP connection if needed
-            # server.set_debuglevel(1)
-            server.starttls()
-            logger.info("STARTTLS completed successfully")
-        
-        # Try each authentication method until one works
+        # data() sends the command and the message together, so any failure in it counts as uncertain
+        code, resp = server.data(msg)
+    except _TRANSIENT_SMTP_ERRORS as e:
+        raise _DeliveryUncertain(f"connection lost during DATA: {e}") from e
+    if code != 250:
+        server.rset()
+        raise smtplib.SMTPDataError(code, resp)
+    return refused
+
+def _pipelined_send(server, from_addr, to_addrs, msg):
+    """Sends one message, batching MAIL FROM / RCPT TO / DATA into a single write when possible.
+
+    Uses ESMTP PIPELINING (RFC 2920) so the envelope costs one round trip instead of one per
+    command; falls back to one command at a time when the server doesn't advertise it.
+    Raises the same smtplib exceptions as sendmail() and returns its refused-recipients dict;
+    a connection failure once the message data has started going out raises _DeliveryUncertain.
+    """
+    if isinstance(msg, str):
+        msg = msg.encode('ascii')
+    server.ehlo_or_helo_if_needed()
+    if not server.has_extn('pipelining'):
+        return _plain_send(server, from_addr, to_addrs, msg)
+
+    commands = [f"MAIL FROM:{smtplib.quoteaddr(from_addr)}"]
+    commands.extend(f"RCPT TO:{smtplib.quoteaddr(addr)}" for addr in to_addrs)
+    commands.append("DATA")
+    server.send("".join(command + "\r\n" for command in commands))
+
+    # The server answers every pipelined command in order; all replies must be read
+    mail_code, mail_resp = server.getreply()
+    refused = {}
+    for addr in to_addrs:
+        code, resp = server.getreply()
+        if code not in (250, 251):
+            refused[addr] = (code, resp)
+    data_code, data_resp = server.getreply()
+
+    if data_code == 354 and (mail_code != 250 or len(refused) == len(to_addrs)):
+        # Some servers accept DATA even with no valid recipient; end the empty transaction
+        server.send(b".\r\n")
+        server.getreply()
+    if mail_code != 250:
+        server.rset()
+        raise smtplib.SMTPSenderRefused(mail_code, mail_resp, from_addr)
+    if len(refused) == len(to_addrs):
+        server.rset()
+        raise smtplib.SMTPRecipientsRefused(refused)
+    if data_code != 354:
+        server.rset()
+        raise smtplib.SMTPDataError(data_code, data_resp)
+
+    payload = _LEADING_DOT_RE.sub(b'..', _BARE_EOL_RE.sub(b'\r\n', msg))
+    if not payload.endswith(b'\r\n'):
+        payload += b'\r\n'
+    try:
+        server.send(payload + b".\r\n")
+        code, resp = server.getreply()
+    except _TRANSIENT_SMTP_ERRORS as e:
+        raise _DeliveryUncertain(f"connection lost after sending the message data: {e}") from e
+    if code != 250:
+        server.rset()
+        raise smtplib.SMTPDataError(code, resp)
+    return refused
+
+def _serialize_message(message):
+    """Flattens a message straight to wire-format bytes (no intermediate str / EOL rewrite)."""
+    buffer = BytesIO()
+    BytesGenerator(buffer, policy=policy.SMTP).flatten(message)
+    return buffer.getvalue()
+
+def _send_via(server, from_addr, to_addrs, payload):
+    """Sends one pre-serialized message over an already-authenticated SMTP session."""
+    logger.info(f"Sending email from '{from_addr}' to {to_addrs}")
+    _pipelined_send(server, from_addr, to_addrs, payload)
+    logger.info(f"Email sent successfully to {to_addrs}")
+
+def _resolve_smtp_settings(config):
+    """Returns the validated SmtpConfig for config, or None (after logging why) if it is incomplete."""
+    if isinstance(config, SmtpConfig):
+        return config
+    # Built from the mapping passed in every time (it's cheap), so a copied or adjusted
+    # email config is never sent with settings validated for another one
+    try:
+        return SmtpConfig.from_email_config(config)
+    except ValueError as e:
+        logger.error(f"{e}. Cannot send email.")
+        logger.error("Please check your .env file and ensure all SMTP configuration values are set correctly.")
+        return None
+
+# --- Batch Sending ---
+# Once a batch of at least _ABORT_MIN_BATCH messages has had a third of them fail, the provider
+# is most likely rate limiting or rejecting us; stop instead of deepening the penalty
+_ABORT_MIN_BATCH = 30
+
+@dataclass(frozen=True, slots=True)
+class BatchResult:
+    """Outcome of a batch send."""
+    sent: int
+    failed: int
+    aborted: bool = False # True if the batch stopped before every message was attempted
+
+def _should_abort(failed, total):
+    """Failure-threshold circuit breaker for a batch of total messages."""
+    return total >= _ABORT_MIN_BATCH and failed * 3 >= total
+
+# Seconds between full tracebacks for the same exception type; repeats in between log one line
+_TRACEBACK_INTERVAL = 60
+_LAST_TRACEBACK = {}
+
+def _log_send_error(msg, exc):
+    """Logs a send failure, including the traceback at most once per interval per exception type.
+
+    When the provider is down every message fails the same way, and formatting the traceback
+    (frame walk plus source reads) each time is pure overhead.
+    """
+    now = time.monotonic()
+    kind = type(exc)
+    if now - _LAST_TRACEBACK.get(kind, float('-inf')) >= _TRACEBACK_INTERVAL:
+        _LAST_TRACEBACK[kind] = now
+        logger.error(msg, exc_info=exc)
+    else:
+        logger.error(msg)
+
+def _send_batch(smtp, envelopes, total):
+    """Sends total (to_addrs, message) pairs over one pooled SMTP session; returns a BatchResult.
+
+    Each message is serialized once, so a retry after a dropped connection resends the same bytes.
+    Only failures before the message data went out are retried; see _DeliveryUncertain.
+    """
+    smtp_username = smtp.username
+    key = (smtp.host, smtp.port, smtp_username)
+    sent_count = 0
+    failed_count = 0
+    server = None
+    for to_addrs, message in envelopes:
+        try:
+            payload = _serialize_message(message)
+            if server is None:
+                server = _get_smtp(smtp)
+            try:
+                _send_via(server, smtp_username, to_addrs, payload)
+            except _TRANSIENT_SMTP_ERRORS as e:
+                logger.warning(f"SMTP connection lost while sending to {to_addrs} ({e}), retrying once")
+                _discard_smtp(key)
+                server = _get_smtp(smtp)
+                _send_via(server, smtp_username, to_addrs, payload)
+            sent_count += 1
+            continue
+        except smtplib.SMTPAuthenticationError as e:
+            logger.error(f"SMTP Authentication failed for {smtp_username}. Error: {str(e)}")
+            # Retrying the remaining messages with the same credentials would fail the same way
+            return BatchResult(sent_count, failed_count + 1, aborted=sent_count + failed_count + 1 < total)
+        except Exception as e:
+            _log_send_error(f"Failed to send email via SMTP: {e}", e)
+            # The session may be half-way through a transaction; start fresh for the next message
+            _discard_smtp(key)
+            server = None
+        failed_count += 1
+        if _should_abort(failed_count, total):
+            logger.error(f"Aborting batch after {failed_count} of {total} sends failed")
+            return BatchResult(sent_count, failed_count, aborted=sent_count + failed_count < total)
+
+    return BatchResult(sent_count, failed_count)
+
+def _parse_recipients(recipient_email):
+    """Splits a comma-separated recipient_email setting into individual addresses."""
+    return [addr.strip() for addr in recipient_email.split(',') if addr.strip()]
+
+def send_email_smtp(subject, html_body, config):
+    """Sends an email using SMTP, assuming html_body is already HTML.
+
+    recipient_email may hold several comma-separated addresses; the digest is then built once
+    and sent to each of them. Returns True only if every recipient was sent the email.
+    """
+    smtp = _resolve_smtp_settings(config)
+    if smtp is None:
+        return False
+    recipients = _parse_recipients(smtp.recipient)
+    if not recipients:
+        logger.error(f"No valid recipient address in recipient_email ({smtp.recipient!r}). Cannot send email.")
+        return False
+    return _send_digest(subject, html_body, recipients, smtp).sent == len(recipients)
+
+def send_digest(subject, html_body, recipients, config):
+    """Sends the same digest to several recipients, building the MIME message only once.
+
+    Returns:
+        A BatchResult counting the recipients the digest was and wasn't sent to.
+    """
+    smtp = _resolve_smtp_settings(config)
+    if smtp is None:
+        return BatchResult(0, len(recipients))
+    return _send_digest(subject, html_body, recipients, smtp)
+
+def _set_recipient(message, recipient):
+    """Points a shared digest message at a single recipient."""
+    if 'To' in message:
+        message.replace_header('To', recipient)
+    else:
+        message['To'] = recipient
+
+def _send_digest(subject, html_body, recipients, smtp):
+    """send_digest() for already-validated settings."""
+    message = render_digest_mime(subject, html_body, smtp.sender, smtp.plain_text_alternative)
+
+    def envelopes():
+        for recipient in recipients:
+            # Only the To header differs; the body parts are encoded once above
+            _set_recipient(message, recipient)
+            yield [recipient], message
+
+    return _send_batch(smtp, envelopes(), len(recipients))
+
+def send_emails(messages, config):
+    """Sends several (subject, html_body) emails to the configured recipient over one pooled SMTP session.
+
+    Returns:
+        A BatchResult counting the messages that were and weren't sent.
+    """
+    messages = list(messages)
+    smtp = _resolve_smtp_settings(config)
+    if smtp is None:
+        return BatchResult(0, len(messages))
+
+    recipients = _parse_recipients(smtp.recipient)
+
+    def envelopes():
+        for subject, html_body in messages:
+            message = render_digest_mime(subject, html_body, smtp.sender, smtp.plain_text_alternative)
+            message['To'] = ', '.join(recipients)
+            yield recipients, message
+
+    return _send_batch(smtp, envelopes(), len(messages))
+
+async def send_digest_async(subject, html_body, recipients, config, max_connections=5):
+    """Sends the same digest to many recipients over several concurrent SMTP connections.
+
+    SMTP is strictly sequential within one connection, so the fan-out comes from up to
+    max_connections sockets working through a shared recipient queue. Requires the optional
+    aiosmtplib package (`pip install aiosmtplib`).
+
+    Returns:
+        A BatchResult counting the recipients the digest was and wasn't sent to.
+    """
+    try:
+        import aiosmtplib
+    except ImportError:
+        logger.error("send_digest_async requires aiosmtplib. Install it with `pip install aiosmtplib`.")
+        return BatchResult(0, len(recipients))
+
+    smtp = _resolve_smtp_settings(config)
+    if smtp is None:
+        return BatchResult(0, len(recipients))
+    message = render_digest_mime(subject, html_body, smtp.sender, smtp.plain_text_alternative)
+
+    queue = asyncio.Queue()
+    for recipient in recipients:
+        queue.put_nowait(recipient)
+    total = len(recipients)
+    sent_count = 0
+    failed_count = 0
+
+    async def worker():
+        nonlocal sent_count, failed_count
+        client = aiosmtplib.SMTP(hostname=smtp.host, port=smtp.port,
+                                 use_tls=smtp.use_ssl, tls_context=_get_ssl_context(),
+                                 timeout=smtp.timeout)
         try:
-            for auth_method in auth_methods:
+            await client.connect()
+            await client.login(smtp.username, smtp.password)
+        except Exception as e:
+            logger.error(f"Async SMTP connection to {smtp.host}:{smtp.port} failed: {e}")
+            return
+        try:
+            while not queue.empty() and not _should_abort(failed_count, total):
+                recipient = queue.get_nowait()
+                # Workers interleave only at await points, so the shared message can't be
+                # modified between setting To and serializing it
+                _set_recipient(message, recipient)
+                payload = _serialize_message(message)
                 try:
-                    if auth_method == '':
-                        logger.info(f"Attempting login with username: {smtp_username} (server's preferred method)")
-                        server.login(smtp_username, password)
-                    elif auth_method == 'PLAIN':
-                        logger.info(f"Attempting login with username: {smtp_username} (method: PLAIN)")
-                        # For PLAIN, we could do the specific encoding ourselves, but for simplicity,
-                        # let's try the normal login which will often select PLAIN automatically
-                        server.login(smtp_username, password) 
-                    elif auth_method == 'LOGIN':
-                        logger.info(f"Attempting login with username: {smtp_username} (method: LOGIN)")
-                        # Similar to PLAIN, we'll use the standard login which usually works for LOGIN
-                        server.login(smtp_username, password)
-                    elif auth_method == 'CRAM-MD5':
-                        logger.info(f"Attempting login with username: {smtp_username} (method: CRAM-MD5)")
-                        # Standard login often selects CRAM-MD5 if available
-                        server.login(smtp_username, password)
-                    else:
-                        # Fallback
-                        logger.info(f"Attempting login with username: {smtp_username} (method: {auth_method})")
-                        server.login(smtp_username, password)
-                    
-                    logger.info(f"Login successful for {smtp_username}")
-                    break  # Success! Break out of the auth method loop
-                except smtplib.SMTPAuthenticationError as e:
-                    auth_error = f"Auth method {auth_method or 'default'} failed: {e}"
-                    logger.warning(auth_error)
-                    auth_errors.append(auth_error)
-                    last_exception = e
-                    continue  # Try the next auth method
+                    await client.sendmail(smtp.username, [recipient], payload)
+                    sent_count += 1
+                    logger.info(f"Email sent successfully to {recipient}")
                 except Exception as e:
-                    auth_error = f"Unexpected error with auth method {auth_method or 'default'}: {e}"
-                    logger.warning(auth_error)
-                    auth_errors.append(auth_error)
-                    last_exception = e
-                    continue  # Try the next auth method
-            else:
-                # We only get here if all auth methods failed (didn't break out of loop)
-                auth_errors_str = "; ".join(auth_errors)
-                logger.error(f"All authentication methods failed: {auth_errors_str}")
-                if last_exception:
-                    raise last_exception
-                else:
-                    raise smtplib.SMTPAuthenticationError(535, b"All authentication methods failed")
-            
-            # Send the email
-            logger.info(f"Sending email from '{smtp_username}' to '{receiver_email}'")
-            server.sendmail(smtp_username, receiver_email, message.as_string())
-            logger.info(f"Email sent successfully to {receiver_email}")
-            
-            return True
+                    logger.error(f"Failed to send email to {recipient} via async SMTP: {e}")
+                    failed_count += 1
         finally:
-            # Always close the connection
             try:
-                server.quit()
-                logger.info("SMTP connection closed")
-            except Exception as e:
-                logger.warning(f"Error closing SMTP connection: {e}")
-    except smtplib.SMTPAuthenticationError as e:
-        logger.error(f"SMTP Authentication failed for {smtp_username}. Error: {str(e)}")
-        return False
-    except Exception as e:
-        logger.error(f"Failed to send email via SMTP: {e}", exc_info=True)
-        return False
+                await client.quit()
+            except Exception:
+                client.close()
+
+    await asyncio.gather(*(worker() for _ in range(max(1, min(max_connections, total)))))
+    unsent = queue.qsize()
+    if _should_abort(failed_count, total):
+        logger.error(f"Aborted batch after {failed_count} of {total} sends failed")
+    elif unsent:
+        # No worker could connect or log in, so these recipients were never attempted
+        logger.error(f"Could not send to {unsent} of {total} recipients: no SMTP connection was available")
+        failed_count += unsent
+    return BatchResult(sent_count, failed_count, aborted=unsent > 0)
+
+def send_digest_concurrently(subject, html_body, recipients, config, max_connections=5):
+    """Synchronous wrapper around send_digest_async() for non-async callers."""
+    return asyncio.run(send_digest_async(subject, html_body, recipients, config, max_connections))
 
 def send_email_sendgrid(subject, html_body, config):
     """Sends an email using SendGrid."""
@@ -173,7 +577,6 @@ def send_email_sendgrid(subject, html_body, config):
     #     return False
     #
     # try:
-    #     html_content = markdown.markdown(markdown_body, extensions=['extra', 'sane_lists'])
     #     message = Mail(
     #         from_email=sender_email,
     #         to_emails=receiver_email,
@@ -186,27 +589,57 @@ def send_email_sendgrid(subject, html_body, config):
     logger.warning("Install sendgrid library (`pip install sendgrid`) and uncomment the code if needed.")
     return False # Functionality disabled by default
 
+# Maps an email_provider value (normalized by load_config) to its send function
+_EMAIL_SENDERS = {
+    'smtp': send_email_smtp,
+    'sendgrid': send_email_sendgrid,
+}
+
+# --- Dry Run ---
+# With MAIL_DRY_RUN set, emails are written here as .eml files instead of being sent
+_DRY_RUN_DIR = Path(tempfile.gettempdir()) / 'mail'
+
+def _dry_run_enabled():
+    """True when the loaded configuration turns dry run on (MAIL_DRY_RUN or email_config.dry_run)."""
+    return load_config()['email_config']['dry_run']
+
+def _write_dry_run(subject, html_body, config):
+    """Writes the email that would have been sent to an .eml file; no network or TLS involved."""
+    email = EmailConfig.from_mapping(config)
+    message = render_digest_mime(subject, html_body, email.sender_email or '', email.plain_text_alternative)
+    if email.recipient_email:
+        message['To'] = email.recipient_email
+    _DRY_RUN_DIR.mkdir(parents=True, exist_ok=True)
+    path = _DRY_RUN_DIR / f"{uuid.uuid4()}.eml"
+    path.write_bytes(_serialize_message(message))
+    logger.info(f"MAIL_DRY_RUN is set; wrote email to {path} instead of sending it")
+    return True
+
 def send_email(subject, html_body, config):
-    """Sends the email using the configured provider."""
-    provider = config.get('email_provider', 'smtp').lower()
+    """Sends the email using the configured provider (or writes it to disk under MAIL_DRY_RUN)."""
+    if _dry_run_enabled():
+        return _write_dry_run(subject, html_body, config)
+
+    # load_config normalizes the provider, but hand-built configs may not be
+    provider = (config.get('email_provider') or 'smtp').strip().lower()
     logger.info(f"Attempting to send email via {provider}...")
 
-    if provider == 'smtp':
-        return send_email_smtp(subject, html_body, config)
-    elif provider == 'sendgrid':
-        return send_email_sendgrid(subject, html_body, config)
-    else:
+    sender = _EMAIL_SENDERS.get(provider)
+    if sender is None:
         logger.error(f"Unsupported email provider specified: {provider}")
         return False
+    return sender(subject, html_body, config)
 
 # --- Example Usage (for testing) ---
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO)
+    # Write the test email to disk rather than sending it; run with MAIL_DRY_RUN=0 to really send
+    os.environ.setdefault('MAIL_DRY_RUN', '1')
 
-    # Dummy config (Load from .env in real use)
+    import datetime
     # Requires a .env file with SMTP settings for this test to work
-    from config_loader import load_config
-    test_config = load_config()
+    # Use the shared loader; send_email() expects the email_config section
+    test_config = load_config()['email_config']
 
     # Basic HTML example
     test_html = """
@@ -235,7 +668,7 @@ if __name__ == '__main__':
     # Ensure you have configured .env with valid credentials before running this
     if not test_config.get('recipient_email') or not test_config.get('sender_email'):
          print("SKIPPING TEST: Recipient or Sender email not found in config (.env)")
-    elif test_config.get('email_provider') == 'smtp' and not test_config.get('smtp_password'):
+    elif test_config.get('email_provider') == 'smtp' and not test_config.get('smtp_password') and not _dry_run_enabled():
          print("SKIPPING TEST: SMTP provider chosen, but SMTP password not found in config (.env)")
     # Add similar check for SendGrid API key if testing SendGrid
     # elif test_config.get('email_provider') == 'sendgrid' and not test_config.get('sendgrid_api_key'):
@@ -0,0 +1,165 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from src.config_loader import load_config
+
+logger = logging.getLogger(__name__)
+
+# How long a feed's entry is kept. Much longer than the freshness TTL in ingestion, so the
+# next daily run still has the ETag/Last-Modified validators and can get a 304 back
+ENTRY_TTL_SECONDS = 60 * 60 * 24 * 7 # 7 days
+# Most feeds kept in process memory; least recently used entries are dropped first
+MEMORY_MAXSIZE = 1024
+# Versioned so entries stored in an older item format (including the old pickled ones) are never read back
+_REDIS_KEY_PREFIX = "feed:v3:"
+# What a corrupt or partial Redis entry raises while being decoded
+_DECODE_ERRORS = (KeyError, ValueError, TypeError, AttributeError)
+
+class FeedCache:
+    """Feed fetch cache shared across runs when Redis is configured, per-process otherwise.
+
+    Entries are (fetched_at, {'items': ..., 'etag': ..., 'modified': ...}) tuples keyed by feed URL.
+    Redis is used when redis_url or redis_host is configured (REDIS_URL/REDIS_HOST in .env) and
+    the optional redis package is installed;
+    if it is missing or unreachable the cache silently degrades to an in-process store. The
+    in-process store is bounded (LRU, entries expire after ttl) and safe to use from the
+    fetch worker threads. Items go to Redis as JSON: encode_item/decode_item convert each
+    item to and from a JSON-serializable value (items are stored as-is without them).
+    """
+
+    def __init__(self, ttl=ENTRY_TTL_SECONDS, maxsize=MEMORY_MAXSIZE, encode_item=None, decode_item=None):
+        self._ttl = ttl
+        self._maxsize = maxsize
+        self._encode_item = encode_item
+        self._decode_item = decode_item
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+        self._redis_errors = ()
+        self._redis_checked = False
+        self._init_lock = threading.Lock()
+
+    def _client(self):
+        """Connects to Redis on first use; returns None when Redis isn't configured or available."""
+        if self._redis_checked:
+            return self._redis
+        with self._init_lock:
+            if self._redis_checked:
+                return self._redis
+            config = load_config()
+            redis_url = config.get('redis_url')
+            redis_host = config.get('redis_host')
+            if redis_url or redis_host:
+                try:
+                    import redis
+                    if redis_url:
+                        client = redis.Redis.from_url(redis_url)
+                    else:
+                        client = redis.Redis(host=redis_host, port=config['redis_port'])
+                    client.ping()
+                    self._redis = client
+                    self._redis_errors = (redis.exceptions.RedisError,)
+                    logger.info("Using Redis for the feed cache")
+                except ImportError:
+                    logger.warning("REDIS_URL/REDIS_HOST is set but the redis package is not installed "
+                                   "(`pip install redis`). Using an in-memory feed cache.")
+                except Exception as e:
+                    logger.warning(f"Could not connect to Redis ({e}). Using an in-memory feed cache.")
+            self._redis_checked = True
+        return self._redis
+
+    def _disable_redis(self, error):
+        logger.warning(f"Redis feed cache error ({error}). Falling back to the in-memory cache for this run.")
+        self._redis = None
+
+    def _memory_get(self, url):
+        with self._lock:
+            entry = self._memory.get(url)
+            if entry is None:
+                return None
+            if time.time() - entry[0] > self._ttl:
+                del self._memory[url]
+                return None
+            self._memory.move_to_end(url)
+            return entry
+
+    def _memory_put(self, url, entry):
+        with self._lock:
+            self._memory[url] = entry
+            self._memory.move_to_end(url)
+            while len(self._memory) > self._maxsize:
+                self._memory.popitem(last=False)
+
+    def get(self, url):
+        """Returns the cached (fetched_at, data) entry for url, or None."""
+        entry = self._memory_get(url)
+        if entry is not None:
+            return entry
+        client = self._client()
+        if client is None:
+            return None
+        try:
+            fields = client.hgetall(_REDIS_KEY_PREFIX + url)
+        except self._redis_errors as e:
+            self._disable_redis(e)
+            return None
+        if not fields:
+            return None
+        # Validators and items live in one hash, so they are always evicted together and a
+        # 304 never arrives for a feed whose items are gone
+        try:
+            items = json.loads(fields[b'items'])
+            if self._decode_item is not None:
+                items = [self._decode_item(item) for item in items]
+            data = {
+                'items': items,
+                'etag': fields.get(b'etag', b'').decode() or None,
+                'modified': fields.get(b'modified', b'').decode() or None,
+            }
+            entry = (float(fields[b'fetched_at']), data)
+        except _DECODE_ERRORS as e:
+            # Treat it as a miss; the feed is fetched again and the entry rewritten
+            logger.warning(f"Discarding unreadable feed cache entry for {url} ({e!r})")
+            self.delete(url)
+            return None
+        self._memory_put(url, entry)
+        return entry
+
+    def put(self, url, fetched_at, data):
+        """Stores a (fetched_at, data) entry for url."""
+        self._memory_put(url, (fetched_at, data))
+        client = self._client()
+        if client is None:
+            return
+        key = _REDIS_KEY_PREFIX + url
+        items = data.get('items', [])
+        if self._encode_item is not None:
+            items = [self._encode_item(item) for item in items]
+        mapping = {
+            'fetched_at': repr(fetched_at),
+            'items': json.dumps(items),
+            'etag': data.get('etag') or '',
+            'modified': data.get('modified') or '',
+        }
+        try:
+            pipe = client.pipeline()
+            pipe.hset(key, mapping=mapping)
+            pipe.expire(key, self._ttl)
+            pipe.execute()
+        except self._redis_errors as e:
+            self._disable_redis(e)
+
+    def delete(self, url):
+        """Drops any cached entry for url."""
+        with self._lock:
+            self._memory.pop(url, None)
+        client = self._client()
+        if client is None:
+            return
+        try:
+            client.delete(_REDIS_KEY_PREFIX + url)
+        except self._redis_errors as e:
+            self._disable_redis(e)
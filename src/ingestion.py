@@ -1,110 +1,475 @@
 import feedparser
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
+import re
 import time
+import functools
+import heapq
+import calendar
 import datetime # Add datetime
+import email.utils
+import html
+from io import BytesIO
+from lxml import etree
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
+from collections import defaultdict
+from urllib.parse import urlparse
+from dataclasses import dataclass, field
+from collections.abc import Mapping
+from src.feed_cache import FeedCache
+try:
+    import httpx
+    import h2 # noqa: F401 - httpx only negotiates HTTP/2 when h2 is installed
+except ImportError:
+    httpx = None
 
 logger = logging.getLogger(__name__)
 
-# Simple cache to avoid refetching the same URL immediately
-# In a production system, consider a more robust cache (e.g., Redis, disk cache)
-_fetch_cache = {}
+
+# One pooled, keep-alive HTTP session for all feeds, so feeds on the same host
+# (blogspot, substack, feedburner, ...) reuse connections instead of a new TCP+TLS handshake each
+_REQUEST_TIMEOUT = (5, 15) # (connect, read) seconds
+_SESSION = requests.Session()
+# Add a user-agent to potentially avoid blocking
+_SESSION.headers['User-Agent'] = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+# Upper bound on concurrent feed fetches; matches the adapter's per-host pool size below
+_MAX_FETCH_WORKERS = 32
+_ADAPTER = HTTPAdapter(pool_connections=16, pool_maxsize=_MAX_FETCH_WORKERS,
+                       max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=(500, 502, 503, 504)))
+_SESSION.mount('https://', _ADAPTER)
+_SESSION.mount('http://', _ADAPTER)
+# With the optional httpx[http2] installed, feeds are fetched over HTTP/2 instead: every feed on a
+# host (substack, huggingface, Cloudflare-fronted blogs, ...) shares one multiplexed connection
+_HTTP2_CLIENT = None
+if httpx is not None:
+    _HTTP2_CLIENT = httpx.Client(
+        http2=True,
+        headers={'User-Agent': _SESSION.headers['User-Agent']},
+        timeout=httpx.Timeout(_REQUEST_TIMEOUT[1], connect=_REQUEST_TIMEOUT[0]),
+        follow_redirects=True, # requests' default, which the feed list relies on
+        transport=httpx.HTTPTransport(
+            http2=True, retries=2, # Retries connection failures only
+            limits=httpx.Limits(max_connections=_MAX_FETCH_WORKERS, max_keepalive_connections=_MAX_FETCH_WORKERS),
+        ),
+    )
+
+def _http_get(url, headers):
+    """GETs url over HTTP/2 when httpx is available, else through the pooled requests session."""
+    if _HTTP2_CLIENT is not None:
+        return _HTTP2_CLIENT.get(url, headers=headers)
+    return _SESSION.get(url, headers=headers, timeout=_REQUEST_TIMEOUT)
+
+@dataclass(slots=True)
+class FeedItem:
+    """One feed entry as collected and filtered during ingestion.
+
+    Slotted to keep the per-item footprint small while feeds are cached and filtered;
+    fetch_all_feeds() hands the survivors to the rest of the pipeline as plain dicts.
+    """
+    title: str
+    link: str
+    published: time.struct_time | None # UTC
+    published_epoch: float | None
+    summary: str
+    source_feed: str
+    id: str | None # Unique ID for deduplication
+    # Title and summary joined once at construction, so the keyword filter runs one search
+    # per item no matter how many times the (cached) item is filtered
+    search_text: str = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.search_text = f"{self.title}\n{self.summary}"
+
+    def as_dict(self):
+        return {
+            'title': self.title,
+            'link': self.link,
+            'published': self.published,
+            'published_epoch': self.published_epoch,
+            'summary': self.summary,
+            'source_feed': self.source_feed,
+            'id': self.id,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuilds an item from as_dict() output that went through JSON (published is then a list)."""
+        published = data['published']
+        return cls(
+            title=data['title'],
+            link=data['link'],
+            published=time.struct_time(published) if published else None,
+            published_epoch=data['published_epoch'],
+            summary=data['summary'],
+            source_feed=data['source_feed'],
+            id=data['id'],
+        )
+
+# Cache to avoid refetching the same URL immediately; backed by Redis when REDIS_URL/REDIS_HOST
+# is set, so ETag/Last-Modified revalidation also works across daily runs
+_fetch_cache = FeedCache(encode_item=FeedItem.as_dict, decode_item=FeedItem.from_dict)
 _CACHE_EXPIRY_SECONDS = 60 * 5 # 5 minutes
 
-def _fetch_single_feed(feed_url, processed_urls):
-    """Fetches and parses a single RSS feed with basic error handling and deduplication check."""
+# --- Feed Parsing ---
+_ATOM_NS = 'http://www.w3.org/2005/Atom'
+# RSS 2.0 <item>, RSS 1.0 (RDF) <item> and Atom <entry>
+_ENTRY_TAGS = ('item', '{http://purl.org/rss/1.0/}item', f'{{{_ATOM_NS}}}entry')
+# Child element local name -> entry key, mirroring the feedparser entry keys the item loop reads
+_ENTRY_FIELDS = {
+    'title': 'title',
+    'link': 'link',
+    'guid': 'id',
+    'id': 'id',
+    'pubDate': 'published_parsed',
+    'published': 'published_parsed',
+    'issued': 'published_parsed',
+    'date': 'published_parsed', # dc:date
+    'updated': 'updated_parsed',
+    'modified': 'updated_parsed',
+    'summary': 'summary',
+    'description': 'description',
+    'encoded': 'content', # content:encoded
+    'content': 'content',
+}
+_DATE_KEYS = ('published_parsed', 'updated_parsed')
+# Fields whose text may carry HTML (escaped, CDATA or Atom type="html"/"xhtml"); feedparser sanitized
+# these, and they end up in the filtering prompt and the email, so markup is stripped here instead
+_MARKUP_KEYS = ('title', 'summary', 'description', 'content')
+_SCRIPT_RE = re.compile(r'<(script|style)\b[^>]*>.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r'<[^>]+>')
+
+class _NoFeedEntries(Exception):
+    """Well-formed XML with no RSS or Atom entries _parse_feed_bytes recognizes (e.g. RSS 0.9x)."""
+
+def _strip_markup(text):
+    """Reduces an HTML fragment to its text: scripts and tags removed, entities unescaped, whitespace collapsed."""
+    if '<' in text:
+        text = _TAG_RE.sub(' ', _SCRIPT_RE.sub(' ', text))
+    if '&' in text:
+        text = html.unescape(text)
+    return ' '.join(text.split())
+
+def _parse_date(text):
+    """Parses an RFC 822 (RSS) or RFC 3339 (Atom) date into a UTC struct_time, or None."""
+    try:
+        dt = email.utils.parsedate_to_datetime(text)
+    except (TypeError, ValueError):
+        try:
+            dt = datetime.datetime.fromisoformat(text[:-1] + '+00:00' if text.endswith('Z') else text)
+        except ValueError:
+            return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return dt.utctimetuple()
+
+def _to_epoch(published_struct):
+    """Converts a UTC struct_time (as feedparser and _parse_date produce) to epoch seconds, or None."""
+    if not published_struct:
+        return None
+    try:
+        # timegm, not mktime: the struct is UTC, and timegm skips the local timezone lookup
+        return calendar.timegm(published_struct)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+def _parse_feed_bytes(body):
+    """Streams RSS/Atom entries out of a feed body with lxml, reading only the fields we use.
+
+    Yields dicts keyed like feedparser entries (title, link, id, published_parsed,
+    updated_parsed, summary, description) as each entry is parsed, so the caller can drop
+    entries it won't keep without ever holding the whole feed. Text fields come back with
+    their markup stripped. Raises etree.XMLSyntaxError (possibly after some entries were
+    yielded) for malformed feeds, and _NoFeedEntries for well-formed XML without any entry
+    tags we know; the caller hands both to feedparser's more forgiving parser instead.
+    """
+    found = False
+    for _, elem in etree.iterparse(BytesIO(body), events=('end',), tag=_ENTRY_TAGS,
+                                   resolve_entities=False, no_network=True):
+        entry = {}
+        for child in elem:
+            if not isinstance(child.tag, str): # Comments and processing instructions
+                continue
+            key = _ENTRY_FIELDS.get(etree.QName(child).localname)
+            if key is None or key in entry:
+                continue
+            if key == 'link' and child.get('href') is not None:
+                # Atom links are <link rel="alternate" href="..."/>; skip enclosures, replies, etc.
+                if child.get('rel', 'alternate') != 'alternate':
+                    continue
+                value = child.get('href')
+            else:
+                # itertext, not .text: Atom type="xhtml" content is nested elements, not text
+                value = ''.join(child.itertext()).strip()
+            if not value:
+                continue
+            if key in _DATE_KEYS:
+                value = _parse_date(value)
+                if value is None:
+                    continue
+            elif key in _MARKUP_KEYS:
+                value = _strip_markup(value)
+            entry[key] = value
+        if 'summary' not in entry and 'description' not in entry and 'content' in entry:
+            entry['summary'] = entry['content']
+        found = True
+        yield entry
+        # Free the parsed entry (and already-processed siblings) while streaming
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+    if not found:
+        raise _NoFeedEntries()
+
+def _recently_processed(item_url, processed_urls, seven_days_ago):
+    """True if item_url was processed within the last seven days (B.4 deduplication)."""
+    if item_url == 'No Link' or item_url not in processed_urls:
+        return False
+    # Assuming processed_urls stores datetime objects directly (loaded in main.py)
+    return processed_urls[item_url] >= seven_days_ago
+
+def _reselect_cached_items(items, processed_urls, spec, seven_days_ago):
+    """Drops cached items that were processed or fell behind the date cutoff since they were cached.
+
+    Cached items were selected against the processed URLs and cutoff of the run that fetched
+    them; the keyword and limit filters still hold, and _filter_items reapplies them anyway.
+    """
+    cutoff_epoch = spec.cutoff_epoch
+    return [item for item in items
+            if not _recently_processed(item.link, processed_urls, seven_days_ago)
+            and (cutoff_epoch is None or item.published_epoch is None or item.published_epoch >= cutoff_epoch)]
+
+def _select_items(entries, feed_url, processed_urls, spec, seven_days_ago):
+    """Builds FeedItems from parsed entries, keeping only those the feed's filters could return.
+
+    Entries that are already processed, older than the date cutoff or missing the required
+    keywords are dropped as they stream past, and dated items are kept in a min-heap bounded
+    by the feed's limit, so memory stays O(limit) however long the feed is. Undated items are
+    all kept (the limit filter ranks them last), which keeps _filter_items on the cached
+    result equivalent to filtering the whole feed, even once the cutoff has moved on.
+    """
+    cutoff_epoch = spec.cutoff_epoch
+    keyword_re = spec.keyword_re
+    limit = spec.limit_table[feed_url]
+    heap = [] # (published_epoch, -seq, item); the oldest kept item is heap[0], earlier entries win ties
+    undated = []
+    for seq, entry in enumerate(entries):
+        # Prioritize published_parsed, then updated_parsed
+        published_time = entry.get('published_parsed') or entry.get('updated_parsed')
+        item_url = entry.get('link', 'No Link')
+
+        # B.4: Check against processed URLs
+        if _recently_processed(item_url, processed_urls, seven_days_ago):
+            # logger.debug(f"[{feed_url}] Skipping duplicate item (seen within 7 days): {item_url}")
+            continue # Skip this entry
+
+        # Converted once here; filtering and sorting compare plain floats
+        published_epoch = _to_epoch(published_time)
+        if published_epoch is not None:
+            if cutoff_epoch is not None and published_epoch < cutoff_epoch:
+                continue
+            # Older than everything already kept in a full heap: can never make the limit
+            if len(heap) >= limit and (not heap or published_epoch <= heap[0][0]):
+                continue
+
+        item = FeedItem(
+            title=entry.get('title', 'No Title'),
+            link=item_url,
+            published=published_time,
+            published_epoch=published_epoch,
+            summary=entry.get('summary') or entry.get('description', 'No Summary'), # Some feeds use description
+            source_feed=feed_url,
+            id=entry.get('id', entry.get('link')),
+        )
+        if keyword_re is not None and not keyword_re.search(item.search_text):
+            continue
+        if published_epoch is None:
+            undated.append(item)
+        elif len(heap) < limit:
+            heapq.heappush(heap, (published_epoch, -seq, item))
+        else:
+            heapq.heapreplace(heap, (published_epoch, -seq, item))
+    # Back in feed order, so ties rank exactly as they would have without the heap
+    heap.sort(key=lambda kept: kept[1], reverse=True)
+    return [item for _, _, item in heap] + undated
+
+def _fetch_single_feed(feed_url, processed_urls, filter_spec):
+    """Fetches and parses a single RSS feed with basic error handling and deduplication check.
+
+    Only items that can pass filter_spec for this feed are built and cached.
+    """
     current_time = time.time()
     now_dt = datetime.datetime.now()
     seven_days_ago = now_dt - datetime.timedelta(days=7)
 
     # Check cache
-    if feed_url in _fetch_cache:
-        last_fetch_time, cached_data = _fetch_cache[feed_url]
+    cached = _fetch_cache.get(feed_url)
+    if cached is not None:
+        last_fetch_time, cached_data = cached
         if current_time - last_fetch_time < _CACHE_EXPIRY_SECONDS:
             logger.debug(f"Using cached data for {feed_url}")
-            # Return items and etag separately from cache if needed
-            cached_items = cached_data.get('items', [])
-            return cached_items, feed_url
+            return _reselect_cached_items(cached_data.get('items', []), processed_urls, filter_spec, seven_days_ago), feed_url
 
     logger.info(f"Fetching feed: {feed_url}")
-    items = []
-    feed_etag = _fetch_cache.get(feed_url, (0, {}))[1].get('etag') if feed_url in _fetch_cache else None
+    # Past the TTL, revalidate with a conditional GET so an unchanged feed answers 304
+    # instead of resending (and us reparsing) the whole body
+    feed_etag = cached[1].get('etag') if cached is not None else None
+    feed_modified = cached[1].get('modified') if cached is not None else None
     try:
-        # Add a user-agent to potentially avoid blocking
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-        feed_data = feedparser.parse(feed_url, request_headers=headers, etag=feed_etag)
-
-        # Check for bozo flag for malformed feeds
-        if feed_data.bozo:
-            logger.warning(f"Feed at {feed_url} may be malformed: {feed_data.bozo_exception}")
-            # Still try to process entries if possible
+        headers = {}
+        if feed_etag:
+            headers['If-None-Match'] = feed_etag
+        if feed_modified:
+            headers['If-Modified-Since'] = feed_modified
+        response = _http_get(feed_url, headers)
 
         # Check for HTTP status
-        status = feed_data.get('status')
+        status = response.status_code
         if status == 304: # Not Modified
             logger.info(f"Feed not modified (304): {feed_url}")
             # Return previously cached items
-            if feed_url in _fetch_cache:
-                 return _fetch_cache[feed_url][1].get('items', []), feed_url
+            if cached is not None:
+                # Restart the TTL so the feed isn't revalidated again on every call
+                _fetch_cache.put(feed_url, current_time, cached[1])
+                # The cached items may have been processed on an earlier run
+                return _reselect_cached_items(cached[1].get('items', []), processed_urls, filter_spec, seven_days_ago), feed_url
             else:
-                 return [], feed_url # No previous cache, return empty
+                return [], feed_url # No previous cache, return empty
         # Allow other 2xx status codes as potentially successful
         elif not (status and 200 <= status < 300):
             logger.error(f"Failed to fetch feed {feed_url}. Status code: {status}")
             # Remove from cache if it failed
-            if feed_url in _fetch_cache: del _fetch_cache[feed_url]
+            _fetch_cache.delete(feed_url)
             return None, feed_url # Indicate failure
 
-        for entry in feed_data.entries:
-            # Prioritize published_parsed, then updated_parsed
-            published_time = entry.get('published_parsed') or entry.get('updated_parsed')
-            item_url = entry.get('link', 'No Link')
-
-            # B.4: Check against processed URLs
-            if item_url != 'No Link' and item_url in processed_urls:
-                processed_timestamp = processed_urls[item_url]
-                # Ensure comparison happens between aware datetime objects if possible
-                # Assuming processed_urls stores datetime objects directly (loaded in main.py)
-                if processed_timestamp >= seven_days_ago:
-                    # logger.debug(f"[{feed_url}] Skipping duplicate item (seen within 7 days): {item_url}")
-                    continue # Skip this entry
-
-            item = {
-                'title': entry.get('title', 'No Title'),
-                'link': item_url,
-                 # Keep published as struct_time for now, handle conversion in filtering
-                'published': published_time,
-                'summary': entry.get('summary') or entry.get('description', 'No Summary'), # Some feeds use description
-                'source_feed': feed_url,
-                'id': entry.get('id', entry.get('link')) # Unique ID for deduplication
-            }
-            items.append(item)
+        # Parse the body we already downloaded; feedparser doesn't open its own connection
+        try:
+            items = _select_items(_parse_feed_bytes(response.content), feed_url, processed_urls,
+                                  filter_spec, seven_days_ago)
+        except (etree.XMLSyntaxError, _NoFeedEntries) as e:
+            # Malformed XML or a feed format lxml parsing doesn't cover (an empty feed ends up here
+            # too): fall back to feedparser, which recovers what it can
+            logger.debug(f"lxml found no usable entries in {feed_url} ({e!r}), falling back to feedparser")
+            # Hand over the HTTP headers so feedparser takes the charset from Content-Type rather
+            # than sniffing the body for it. Its lookups are lowercase-only, unlike requests' headers
+            feed_data = feedparser.parse(response.content,
+                                         response_headers={k.lower(): v for k, v in response.headers.items()})
+
+            # Check for bozo flag for malformed feeds
+            if feed_data.bozo:
+                logger.warning(f"Feed at {feed_url} may be malformed: {feed_data.bozo_exception}")
+                # Still try to process entries if possible
+            items = _select_items(feed_data.entries, feed_url, processed_urls, filter_spec, seven_days_ago)
 
         # Update cache
-        new_etag = feed_data.get('etag')
-        cache_data = {'items': items, 'etag': new_etag}
-        _fetch_cache[feed_url] = (current_time, cache_data)
+        cache_data = {'items': items, 'etag': response.headers.get('ETag'), 'modified': response.headers.get('Last-Modified')}
+        _fetch_cache.put(feed_url, current_time, cache_data)
         logger.info(f"Successfully fetched and parsed {len(items)} items from {feed_url}")
         return items, feed_url
 
     except Exception as e:
         logger.error(f"Error fetching or parsing feed {feed_url}: {e}", exc_info=True)
         # Remove from cache on error
-        if feed_url in _fetch_cache: del _fetch_cache[feed_url]
+        _fetch_cache.delete(feed_url)
         return None, feed_url # Indicate failure
 
 
-def _filter_items(items, feed_url, ingestion_config):
-    """Applies filtering rules (date, keyword, limit) to items from a single feed."""
-    if not items:
-        return []
-
-    now_utc = datetime.datetime.now(datetime.timezone.utc)
+@functools.lru_cache(maxsize=8)
+def _compile_keywords(keywords):
+    """Compiles the required keywords into one case-insensitive regex (None if there are none).
+
+    One C-level scan per field replaces a lowercased copy plus a substring check per keyword.
+    Matching stays substring-based, as before, so e.g. 'LLM' still matches 'LLMs'.
+    """
+    if not keywords:
+        return None
+    return re.compile('|'.join(map(re.escape, keywords)), re.IGNORECASE)
+
+def _sort_key(item):
+    """Newest-first sort key; items without a usable date sort last."""
+    epoch = item.published_epoch
+    return float('-inf') if epoch is None else epoch
+
+def _fetch_host_group(feed_urls, processed_urls, filter_spec):
+    """Fetches and filters feeds that share a host one after another, so they reuse one pooled connection.
+
+    Filtering happens here on the worker, overlapping with other hosts' network I/O. Returns
+    (feed_url, fetched_count, filtered_items) per feed; filtered_items is None if the fetch failed.
+    """
+    results = []
+    for url in feed_urls:
+        # items will be None if _fetch_single_feed failed
+        items, fetched_url = _fetch_single_feed(url, processed_urls, filter_spec)
+        if items is None:
+            results.append((fetched_url, 0, None))
+            continue
+        try:
+            # Apply Filters (Date, Keyword, Limit) using the helper function
+            filtered_items = _filter_items(items, fetched_url, filter_spec)
+        except Exception as exc:
+            logger.error(f'{fetched_url} generated an exception during filtering: {exc}', exc_info=True)
+            filtered_items = None
+        results.append((fetched_url, len(items), filtered_items))
+    return results
+
+@dataclass(frozen=True, slots=True)
+class FilterSpec:
+    """Filter settings derived from the ingestion config once per run and shared by every feed."""
+    max_hours: float | None
+    cutoff_epoch: float | None # None disables the date filter
+    keyword_re: re.Pattern | None # None disables the keyword filter
+    default_limit: int
+    limit_table: Mapping # feed URL -> validated item limit; default_limit for unlisted feeds
+
+def _build_filter_spec(ingestion_config):
+    """Builds the FilterSpec for this run from the 'ingestion' config section."""
     max_hours = ingestion_config.get('max_hours_since_published', 48)
     feed_limits = ingestion_config.get('feed_limits', {})
-    default_limit = feed_limits.get('default', 25)
-    # Ensure keywords are lowercase for case-insensitive comparison
-    keywords = [k.lower() for k in ingestion_config.get('required_keywords', [])]
+    cutoff_epoch = None
+    if max_hours is not None:
+        try:
+            if float(max_hours) > 0:
+                cutoff_epoch = time.time() - float(max_hours) * 3600
+        except (TypeError, ValueError) as e:
+            logger.error(f"Invalid max_hours_since_published ({max_hours!r}): {e}. Skipping date filter.")
+    # Validate the per-feed limits once here, so filtering each feed is a single lookup
+    try:
+        default_limit = int(feed_limits.get('default', 25))
+    except (ValueError, TypeError):
+        default_limit = -1
+    if default_limit < 0:
+        logger.warning(f"Invalid default feed limit ('{feed_limits.get('default')}'), using 25.")
+        default_limit = 25
+    limit_table = defaultdict(lambda: default_limit)
+    # Simple approach: direct URL match in config keys
+    # More robust: could normalize URLs or use feed titles if available/consistent
+    for feed_url, limit in feed_limits.items():
+        if feed_url == 'default':
+            continue
+        # Ensure limit is a non-negative integer
+        try:
+            limit = int(limit)
+        except (ValueError, TypeError):
+            logger.warning(f"[{feed_url}] Invalid limit specified ('{limit}'), using default {default_limit}.")
+            continue
+        if limit < 0:
+            logger.warning(f"[{feed_url}] Negative limit specified ({limit}), using default {default_limit}.")
+            continue
+        limit_table[feed_url] = limit
+    return FilterSpec(
+        max_hours=max_hours,
+        cutoff_epoch=cutoff_epoch,
+        keyword_re=_compile_keywords(tuple(ingestion_config.get('required_keywords') or ())),
+        default_limit=default_limit,
+        limit_table=limit_table,
+    )
+
+def _filter_items(items, feed_url, spec):
+    """Applies filtering rules (date, keyword, limit) from a FilterSpec to items from a single feed."""
+    if not items:
+        return []
 
     initial_count = len(items)
     filtered_items = items
@@ -113,91 +478,36 @@ def _filter_items(items, feed_url, ingestion_config):
     skipped_limit = 0
 
     # 1. Date Filter
-    if max_hours is not None and max_hours > 0:
-        try:
-            cutoff_time_utc = now_utc - datetime.timedelta(hours=float(max_hours))
-            items_after_date_filter = []
-            for item in filtered_items:
-                published_struct = item.get('published')
-                if published_struct:
-                    try:
-                        # Convert struct_time to timezone-aware UTC datetime
-                        published_dt_utc = datetime.datetime.fromtimestamp(time.mktime(published_struct), datetime.timezone.utc)
-                        if published_dt_utc >= cutoff_time_utc:
-                            items_after_date_filter.append(item)
-                        else:
-                            skipped_date += 1
-                    except OverflowError: # Handle potential mktime errors for very old dates
-                        logger.debug(f"[{feed_url}] Skipping item due to OverflowError converting date: {item.get('title')}")
-                        skipped_date += 1
-                    except Exception as e: # Catch other potential time conversion issues
-                        logger.warning(f"[{feed_url}] Could not parse/convert date for item '{item.get('title')}': {e}. Keeping item.", exc_info=False)
-                        items_after_date_filter.append(item) # Keep if date parse fails
-                else:
-                    # Keep items with no published date (treat as recent)
-                    items_after_date_filter.append(item)
-            filtered_items = items_after_date_filter
-        except Exception as e:
-            logger.error(f"[{feed_url}] Error applying date filter (max_hours={max_hours}): {e}. Skipping date filter.", exc_info=True)
-            # Don't filter if the setting itself causes an error
+    cutoff_epoch = spec.cutoff_epoch
+    if cutoff_epoch is not None:
+        # Keep items with no (or an unparseable) published date (treat as recent)
+        items_after_date_filter = [item for item in filtered_items
+                                   if (epoch := item.published_epoch) is None or epoch >= cutoff_epoch]
+        skipped_date = len(filtered_items) - len(items_after_date_filter)
+        filtered_items = items_after_date_filter
 
     if skipped_date > 0:
-        logger.info(f"[{feed_url}] Date filter: Skipped {skipped_date} items older than {max_hours} hours.")
+        logger.info(f"[{feed_url}] Date filter: Skipped {skipped_date} items older than {spec.max_hours} hours.")
 
     # 2. Keyword Filter
-    if keywords:
-        items_after_keyword_filter = []
-        for item in filtered_items:
-            title = item.get('title', '').lower()
-            summary = item.get('summary', '').lower()
-            found = False
-            for keyword in keywords:
-                # Check for whole word match might be better, but simple 'in' check for now
-                if keyword in title or keyword in summary:
-                    items_after_keyword_filter.append(item)
-                    found = True
-                    break
-            if not found:
-                skipped_keyword += 1
+    keyword_re = spec.keyword_re
+    if keyword_re is not None:
+        items_after_keyword_filter = [item for item in filtered_items if keyword_re.search(item.search_text)]
+        skipped_keyword = len(filtered_items) - len(items_after_keyword_filter)
         filtered_items = items_after_keyword_filter
     if skipped_keyword > 0:
         logger.info(f"[{feed_url}] Keyword filter: Skipped {skipped_keyword} items not matching required keywords.")
 
-    # 3. Per-Feed Limit (Apply after sorting by date)
-    # Sort by published date, newest first. Put items with no date or invalid date last.
-    def get_sort_key(item):
-        published_struct = item.get('published')
-        if published_struct:
-            try:
-                # Use epoch seconds for sorting, handle potential errors
-                return time.mktime(published_struct)
-            except (OverflowError, ValueError): # Handle invalid date tuples
-                return float('-inf') # Treat as very old/low priority
-            except Exception:
-                return float('-inf') # Treat other errors as low priority
-        return float('-inf') # Items without dates also low priority
-
-    filtered_items.sort(key=get_sort_key, reverse=True) # Newest first
-
-    # Determine limit for this specific feed
-    limit = default_limit
-    # Simple approach: direct URL match in config keys
-    if feed_url in feed_limits:
-         limit = feed_limits[feed_url]
-    # More robust: could normalize URLs or use feed titles if available/consistent
-    # Ensure limit is a non-negative integer
-    try:
-        limit = int(limit)
-        if limit < 0:
-            logger.warning(f"[{feed_url}] Negative limit specified ({limit}), using default {default_limit}.")
-            limit = default_limit
-    except (ValueError, TypeError):
-        logger.warning(f"[{feed_url}] Invalid limit specified ('{limit}'), using default {default_limit}.")
-        limit = default_limit
+    # 3. Per-Feed Limit (keep the newest items)
+    limit = spec.limit_table[feed_url]
 
+    # Newest first; items with no date or invalid date last
     if len(filtered_items) > limit:
         skipped_limit = len(filtered_items) - limit
-        filtered_items = filtered_items[:limit]
+        # Partial sort: O(n log limit) instead of sorting the whole feed and slicing
+        filtered_items = heapq.nlargest(limit, filtered_items, key=_sort_key)
+    else:
+        filtered_items = sorted(filtered_items, key=_sort_key, reverse=True)
     if skipped_limit > 0:
         logger.info(f"[{feed_url}] Limit filter: Kept newest {limit} items, skipped {skipped_limit}.")
 
@@ -208,84 +518,85 @@ def _filter_items(items, feed_url, ingestion_config):
     return filtered_items
 
 # Modified function signature to accept config and processed_urls
-def fetch_all_feeds(feed_list, config, processed_urls, max_workers=5):
+def fetch_all_feeds(feed_list, config, processed_urls, max_workers=None):
     """Fetches all feeds, applies pre-filtering, checks deduplication, and returns unique items."""
-    all_items = []
     processed_ids = set() # For basic intra-run deduplication across feeds
     ingestion_config = config.get('ingestion', {}) # Get ingestion settings
     skip_feeds = ingestion_config.get('skip_feeds', [])
+    # Derive the filter settings once; every feed is filtered against the same cutoff
+    filter_spec = _build_filter_spec(ingestion_config)
 
     logger.info(f"Starting feed ingestion. Max hours: {ingestion_config.get('max_hours_since_published')}, Keywords: {ingestion_config.get('required_keywords')}, Default Limit: {ingestion_config.get('feed_limits', {}).get('default')}")
 
+    # Work out which feeds to fetch, skipping those in the skip list
+    skipped_count = 0
+    valid_feed_urls = []
+    for url in feed_list:
+        if url in skip_feeds:
+            logger.warning(f"Skipping feed URL explicitly listed in config skip_feeds: {url}")
+            skipped_count += 1
+            continue
+        # Rudimentary check for placeholder/invalid YouTube URLs if no channel ID
+        # You might want a more robust check or rely on fetch errors / skip_feeds
+        if "youtube.com/feeds/videos.xml?channel_id=PLACEHOLDER" in url:
+             logger.warning(f"Skipping placeholder YouTube URL: {url}. Add to skip_feeds or provide valid ID.")
+             skipped_count += 1
+             continue
+        valid_feed_urls.append(url)
+
+    if skipped_count > 0:
+        logger.info(f"Skipped {skipped_count} feeds based on config 'skip_feeds' or placeholder patterns.")
+
+    if not valid_feed_urls:
+        logger.warning("No valid feed URLs remaining after checking skip_feeds.")
+        return []
+
+    # Group feeds by host: each group is fetched serially by one worker so its requests reuse one
+    # keep-alive connection, while different hosts are fetched in parallel. Over HTTP/2 the
+    # requests to a host are multiplexed on one connection anyway, so every feed gets its own worker
+    host_groups = defaultdict(list)
+    for url in valid_feed_urls:
+        host_groups[url if _HTTP2_CLIENT is not None else urlparse(url).netloc].append(url)
+
+    # Fetching is network-bound and the workers mostly wait on sockets, so size the pool to the
+    # host count (capped at the HTTP connection pool size) rather than a fixed handful of threads
+    if max_workers is None:
+        max_workers = min(_MAX_FETCH_WORKERS, len(host_groups))
+
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all feed fetch tasks, skipping those in the skip list
-        future_to_url = {}
-        skipped_count = 0
-        valid_feed_urls = []
-        for url in feed_list:
-            if url in skip_feeds:
-                logger.warning(f"Skipping feed URL explicitly listed in config skip_feeds: {url}")
-                skipped_count += 1
-                continue
-            # Rudimentary check for placeholder/invalid YouTube URLs if no channel ID
-            # You might want a more robust check or rely on fetch errors / skip_feeds
-            if "youtube.com/feeds/videos.xml?channel_id=PLACEHOLDER" in url:
-                 logger.warning(f"Skipping placeholder YouTube URL: {url}. Add to skip_feeds or provide valid ID.")
-                 skipped_count += 1
-                 continue
-            valid_feed_urls.append(url)
-
-        if skipped_count > 0:
-            logger.info(f"Skipped {skipped_count} feeds based on config 'skip_feeds' or placeholder patterns.")
-
-        if not valid_feed_urls:
-            logger.warning("No valid feed URLs remaining after checking skip_feeds.")
-            return []
-
-        # Pass processed_urls to the worker function (B.4)
-        future_to_url = {executor.submit(_fetch_single_feed, url, processed_urls): url for url in valid_feed_urls}
-
-        items_processed_before_dedup = 0
-        for future in as_completed(future_to_url):
-            url = future_to_url[future]
+        # Pass processed_urls (B.4) and the shared, read-only filter settings to the workers
+        future_to_urls = {executor.submit(_fetch_host_group, urls, processed_urls, filter_spec): urls
+                          for urls in host_groups.values()}
+
+        filtered_results = [] # Per-feed filtered item lists, in completion order
+        for future in as_completed(future_to_urls):
             try:
-                # items will be None if _fetch_single_feed failed
-                items, fetched_url = future.result()
+                group_results = future.result()
+            except Exception as exc:
+                logger.error(f"{', '.join(future_to_urls[future])} generated an exception during fetching: {exc}", exc_info=True)
+                continue
 
-                if items is None:
-                    logger.warning(f"Fetching failed for URL (result was None): {url}")
+            for fetched_url, fetched_count, filtered_single_feed_items in group_results:
+                if filtered_single_feed_items is None:
+                    logger.warning(f"Fetching or filtering failed for URL (result was None): {fetched_url}")
                     # Consider adding to a dynamic skip list for future runs?
                     continue # Skip processing for this failed feed
 
-                # Apply Filters (Date, Keyword, Limit) using the helper function
-                filtered_single_feed_items = _filter_items(items, fetched_url, ingestion_config)
-                items_processed_before_dedup += len(filtered_single_feed_items)
-
-                # Add filtered items to the main list, handling deduplication
-                added_count = 0
-                for item in filtered_single_feed_items:
-                    item_id = item.get('id') or item.get('link') # Use ID or link for dedup
-                    if item_id and item_id not in processed_ids:
-                        all_items.append(item)
-                        processed_ids.add(item_id)
-                        added_count += 1
-                    elif not item_id:
-                         # Add if no ID available, might be duplicate but can't tell
-                         logger.debug(f"Adding item without unique ID from {fetched_url}: {item.get('title')}")
-                         all_items.append(item)
-                         added_count += 1
-                    # else: skip duplicate based on ID/link
-
-                if added_count > 0:
-                    logger.debug(f"Added {added_count} new, unique, filtered items from {fetched_url}")
-                elif len(items) > 0 and len(filtered_single_feed_items) == 0:
-                    logger.info(f"All {len(items)} fetched items from {fetched_url} were filtered out.")
-                elif len(items) == 0:
-                     logger.debug(f"No items returned from fetch for {fetched_url}")
-
-
-            except Exception as exc:
-                logger.error(f'{url} generated an exception during processing/filtering: {exc}', exc_info=True)
+                filtered_results.append(filtered_single_feed_items)
+                if fetched_count and not filtered_single_feed_items:
+                    logger.info(f"All {fetched_count} fetched items from {fetched_url} were filtered out.")
+                elif not fetched_count and logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"No items returned from fetch for {fetched_url}")
+
+    # Deduplicate across feeds by ID (or link) in one pass; items without either are kept,
+    # since there's no way to tell whether they are duplicates
+    items_processed_before_dedup = sum(map(len, filtered_results))
+    all_items = [item for item in chain.from_iterable(filtered_results)
+                 if not (item_id := item.id or item.link)
+                 or (item_id not in processed_ids and not processed_ids.add(item_id))]
+    duplicates_skipped = items_processed_before_dedup - len(all_items)
+    if duplicates_skipped:
+        logger.info(f"Skipped {duplicates_skipped} duplicate items found in more than one feed.")
 
     # Log final counts
     logger.info(f"Total items collected after filtering & pre-deduplication: {items_processed_before_dedup}")
@@ -297,18 +608,20 @@ def fetch_all_feeds(feed_list, config, processed_urls, max_workers=5):
         "https://openai.com/blog/rss.xml", # Check logs for this if not skipped
         # Add others like Facebook, DeepMind, SyncedReview, WandB if they were in the original list
     ]
-    for feed_url in feed_list:
-        if feed_url in feeds_to_monitor and feed_url not in skip_feeds:
+    # Sources that made it through, collected once instead of rescanning all_items per monitored feed
+    present_sources = {item.source_feed for item in all_items}
+    for feed_url in feeds_to_monitor:
+        if feed_url in feed_list and feed_url not in skip_feeds:
             # Check if any items from this feed made it through
-            has_items = any(item['source_feed'] == feed_url for item in all_items)
-            if not has_items:
+            if feed_url not in present_sources:
                 logger.warning(f"Monitored feed {feed_url} had 0 items in the final list. Check fetch logs or consider adding to 'skip_feeds' if it consistently fails or returns irrelevant content.")
 
     # Remove YouTube placeholder - redundant if check above is done
     # all_items = [item for item in all_items if "youtube.com/feeds/videos.xml?channel_id=PLACEHOLDER" not in item.get('source_feed','')]
 
 
-    return all_items
+    # The rest of the pipeline works with plain dicts
+    return [item.as_dict() for item in all_items]
 
 if __name__ == '__main__':
     # Example Usage - Update to pass a dummy config
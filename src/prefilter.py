@@ -0,0 +1,36 @@
+import heapq
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _source_weights(config, prefilter_config):
+    """Maps feed URL -> priority weight: explicit source_weights, else 0..1 by position in rss_feeds."""
+    feeds = config.get('rss_feeds', ())
+    weights = {feed: (len(feeds) - position) / len(feeds) for position, feed in enumerate(feeds)}
+    weights.update(prefilter_config.get('source_weights') or {})
+    return weights
+
+def prefilter(items, config):
+    """Keeps the highest-scoring items before they are sent to Gemini for filtering.
+
+    An item's score is its source feed's weight plus the number of configured priority keywords
+    found in its title and summary. At most prefilter.keep items are kept, in their original order.
+    Without prefilter.keep in the config (or with keep set to 0), every item is kept.
+    """
+    prefilter_config = config.get('prefilter') or {}
+    keep = prefilter_config.get('keep')
+    if not keep or len(items) <= keep:
+        return items
+
+    keywords = [keyword.lower() for keyword in prefilter_config.get('priority_keywords') or ()]
+    weights = _source_weights(config, prefilter_config)
+
+    def score(position):
+        item = items[position]
+        text = f"{item.get('title') or ''}\n{item.get('summary') or ''}".lower()
+        return weights.get(item.get('source_feed'), 0) + sum(keyword in text for keyword in keywords)
+
+    # nlargest is stable, so equal scores keep the earlier item
+    kept = sorted(heapq.nlargest(keep, range(len(items)), key=score))
+    logger.info(f"Pre-filter kept {len(kept)} of {len(items)} items for Gemini filtering.")
+    return [items[position] for position in kept]
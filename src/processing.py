@@ -1,16 +1,50 @@
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 import logging
 import json
+import functools
+import itertools
 from textwrap import dedent
+from typing import Literal
+from typing_extensions import TypedDict # typing.TypedDict isn't accepted as a response schema before 3.12
 import time
+import random
+import asyncio
+import threading
 from collections import defaultdict # Import defaultdict
 import os
+import hashlib
+from concurrent.futures import Future
+from urllib.parse import urlsplit, urlunsplit
+from src.prefilter import prefilter
+from src.response_cache import ResponseCache, DEFAULT_PATH, DEFAULT_TTL_HOURS
+from src.rate_limiter import TokenBucket
+try:
+    import orjson # Optional: several times faster than json on large responses
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
-# --- Global Variables for Model Cache and Token Tracking ---
-_gemini_models = {} # Cache for initialized models {model_name: model_instance}
+# --- Global Variables for Token Tracking ---
 _token_counts = defaultdict(int) # { 'prompt_tokens': 0, 'candidates_tokens': 0, 'total_tokens': 0 }
+# Guards _token_counts: summarization and tutorial calls update it from worker threads
+_token_lock = threading.Lock()
+# Responses to identical (model, prompt) calls; off until configure_response_cache() turns it on
+_response_cache = ResponseCache(enabled=False)
+# Identical calls currently waiting on the API (request key -> Future), so a duplicate waits
+# for the first one's response instead of calling Gemini again. Separate maps for the sync
+# (thread) and async (event loop) call paths
+_inflight = {}
+_inflight_lock = threading.Lock()
+_inflight_async = {}
+# Per-model rate limiters (model name -> TokenBucket), set by configure_rate_limits(); models without one aren't limited
+_rate_limiters = {}
+# Limits ({rpm, tpm}) for models not listed in rate_limits, from its 'default' entry; None = unlimited
+_default_rate_limits = None
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers catch the same exception either way
+_json_loads = orjson.loads if orjson is not None else json.loads
 
 # --- Gemini API Initialization and Model Management ---
 def configure_gemini(api_key=None, credentials_path=None):
@@ -43,113 +77,408 @@ def configure_gemini(api_key=None, credentials_path=None):
         logger.error(f"Failed to configure or test Gemini connection: {e}", exc_info=True)
         return False
 
+def configure_response_cache(cache_config):
+    """Sets up the Gemini response cache from the config's 'response_cache' section."""
+    global _response_cache
+    enabled = bool(cache_config.get('cache_enabled', True))
+    ttl_hours = cache_config.get('cache_ttl_hours', DEFAULT_TTL_HOURS)
+    _response_cache = ResponseCache(path=cache_config.get('cache_path', DEFAULT_PATH), ttl_hours=ttl_hours, enabled=enabled)
+    if enabled:
+        logger.info(f"Gemini response cache enabled (TTL {ttl_hours} hours).")
+
+def configure_rate_limits(rate_limits_config):
+    """Sets up a rate limiter per model from the config's 'rate_limits' section ({model: {rpm, tpm}}).
+
+    A 'default' entry applies to every other model, each getting its own limiter on first use.
+    """
+    global _default_rate_limits
+    _rate_limiters.clear()
+    _default_rate_limits = None
+    for model_name, limits in (rate_limits_config or {}).items():
+        limits = {key: _parse_rate_limit(model_name, key, (limits or {}).get(key)) for key in ('rpm', 'tpm')}
+        if limits['rpm'] is None and limits['tpm'] is None:
+            logger.info(f"No rate limit set for Gemini model '{model_name}'.")
+            continue
+        if model_name == 'default':
+            _default_rate_limits = limits
+        else:
+            _rate_limiters[model_name] = TokenBucket(rpm=limits['rpm'], tpm=limits['tpm'])
+        logger.info(f"Rate limiting Gemini model '{model_name}' to {limits['rpm']} RPM / {limits['tpm']} TPM.")
+
+def _parse_rate_limit(model_name, key, value):
+    """Returns a rate_limits value as a positive int, or None (no limit) if it is unset, zero or invalid."""
+    if value is None:
+        return None
+    try:
+        value = int(value)
+    except (ValueError, TypeError):
+        logger.warning(f"Invalid {key} ({value!r}) in rate_limits for '{model_name}', not limiting it.")
+        return None
+    return value if value > 0 else None
+
+def _get_rate_limiter(model_name):
+    """Returns the model's TokenBucket, creating one from the default limits if needed; None if unlimited."""
+    limiter = _rate_limiters.get(model_name)
+    if limiter is None and _default_rate_limits is not None:
+        # setdefault keeps one bucket per model even when two threads get here at once
+        limiter = _rate_limiters.setdefault(model_name, TokenBucket(rpm=_default_rate_limits['rpm'],
+                                                                    tpm=_default_rate_limits['tpm']))
+    return limiter
+
+@functools.lru_cache(maxsize=8)
+def _build_model(model_name):
+    """Creates a model instance. Memoized; errors aren't cached, so a failed init is retried next call."""
+    logger.info("Initializing Gemini model: %s", model_name)
+    return genai.GenerativeModel(model_name)
+
 def get_gemini_model(model_name):
     """Returns an instance of the specified Gemini model, using a cache."""
-    if model_name in _gemini_models:
-        logger.debug(f"Using cached Gemini model: {model_name}")
-        return _gemini_models[model_name]
-    else:
-        try:
-            logger.info(f"Initializing Gemini model: {model_name}")
-            model = genai.GenerativeModel(model_name)
-            _gemini_models[model_name] = model
-            return model
-        except Exception as e:
-            logger.error(f"Failed to initialize Gemini model '{model_name}': {e}", exc_info=True)
-            return None
+    try:
+        return _build_model(model_name)
+    except Exception as e:
+        logger.error("Failed to initialize Gemini model '%s': %s", model_name, e, exc_info=True)
+        return None
 
 # --- Token Count Management ---
 def reset_token_counts():
     """Resets the global token counters for a new pipeline run."""
-    global _token_counts
-    _token_counts = defaultdict(int)
+    # Cleared in place, so any reference to the dict held elsewhere stays current
+    with _token_lock:
+        _token_counts.clear()
     logger.info("Token counts reset.")
 
 def get_token_counts():
     """Returns the current aggregated token counts."""
-    return dict(_token_counts) # Return a copy
+    with _token_lock:
+        return dict(_token_counts) # Return a copy
 
 # --- Core Gemini Call Function with Tracking and Retries ---
-def _make_gemini_call_with_tracking(model_name, prompt, task_description, retries=3, delay=5):
-    """Makes a call to the Gemini API, tracks token usage, and handles retries."""
-    global _token_counts
+def _record_token_usage(response, task_description, model_name):
+    """Adds a response's usage metadata to the global token counts and logs it."""
+    try:
+        if response.usage_metadata:
+            prompt_tokens = response.usage_metadata.prompt_token_count
+            candidates_tokens = response.usage_metadata.candidates_token_count
+            total_tokens = response.usage_metadata.total_token_count
+
+            with _token_lock:
+                _token_counts['prompt_tokens'] += prompt_tokens
+                _token_counts['candidates_tokens'] += candidates_tokens
+                _token_counts['total_tokens'] += total_tokens
+                cumulative_tokens = _token_counts['total_tokens']
+
+            logger.info("Token Usage for %s (%s): Prompt=%d, Candidates=%d, Total=%d", task_description, model_name, prompt_tokens, candidates_tokens, total_tokens)
+            logger.info("Cumulative Tokens: %d", cumulative_tokens)
+        else:
+            logger.warning("No usage metadata found in response for %s.", task_description)
+    except Exception as usage_e:
+        logger.error("Error processing usage metadata for %s: %s", task_description, usage_e)
+
+def _use_cached_response(model_name, prompt, task_description, generation_config=None):
+    """Returns a cached response for the call, counting its tokens as cached, or None."""
+    cached = _response_cache.get(model_name, prompt, generation_config)
+    if cached is not None:
+        # Kept apart from prompt/candidates tokens, which are what the run is billed for
+        with _token_lock:
+            _token_counts['cached_tokens'] += cached.usage_metadata.total_token_count
+        logger.info("Using cached Gemini response for %s (%s).", task_description, model_name)
+    return cached
+
+# --- Rate Limiting ---
+def _estimate_tokens(prompt):
+    """Rough input token count for a rate limit reservation (~4 characters per token)."""
+    return len(prompt) // 4
+
+def _settle_rate_limit(limiter, entry, response):
+    """Corrects a reservation with the response's actual token count, when both are known."""
+    if limiter is None:
+        return
+    total_tokens = getattr(response.usage_metadata, 'total_token_count', None) if response.usage_metadata else None
+    if total_tokens:
+        limiter.settle(entry, total_tokens)
+
+# Longest wait between two attempts of a Gemini call (seconds)
+_MAX_BACKOFF_SECONDS = 60
+
+def _server_retry_delay(error):
+    """Returns the retry delay (seconds) a ResourceExhausted (429) error suggests, or None."""
+    if not isinstance(error, google_exceptions.ResourceExhausted):
+        return None
+    for detail in error.details or ():
+        retry_delay = getattr(detail, 'retry_delay', None) # google.rpc.RetryInfo
+        if retry_delay is not None:
+            return retry_delay.seconds + retry_delay.nanos / 1e9
+    return None
+
+# Errors that fail the same way on every attempt (bad request, auth, unknown model): never retried
+_PERMANENT_ERRORS = (
+    google_exceptions.InvalidArgument,
+    google_exceptions.PermissionDenied,
+    google_exceptions.Unauthenticated,
+    google_exceptions.NotFound,
+)
+# Server-side hiccups that usually clear within seconds: retried with a linear backoff
+_TRANSIENT_ERRORS = (
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+)
+# Wait before retrying an empty (but not blocked) response; nothing to back off from
+_EMPTY_RESPONSE_RETRY_SECONDS = 1
+# Rate-limited (429) calls keep retrying past `retries` until this long after the first attempt
+_RATE_LIMIT_WALL_SECONDS = 120
+
+def _should_retry(error, attempt, retries, started):
+    """Decides whether a failed API call is worth another attempt."""
+    if isinstance(error, _PERMANENT_ERRORS):
+        return False
+    if attempt < retries - 1:
+        return True
+    # A quota blip clears on its own; keep going while the wall-clock budget lasts
+    return (isinstance(error, google_exceptions.ResourceExhausted)
+            and time.monotonic() - started < _RATE_LIMIT_WALL_SECONDS)
+
+def _backoff_delay(attempt, delay, error=None):
+    """Seconds to wait before retrying a Gemini call after an API error.
+
+    When a rate-limit error says how long to wait (RetryInfo), that delay is used as is (capped
+    at 60s): waiting less only earns another 429, waiting more wastes time. Transient server
+    errors (503, 504, 500) back off linearly, delay * (attempt + 1). Anything else, 429s
+    included, gets exponential backoff with full jitter, a random 0..min(60, delay * 2**attempt),
+    so concurrent callers don't retry in lockstep.
+    """
+    server_delay = _server_retry_delay(error) if error is not None else None
+    if server_delay is not None:
+        wait = min(server_delay, _MAX_BACKOFF_SECONDS)
+        logger.debug("Retrying in %.2fs (server-suggested delay)", wait)
+    elif isinstance(error, _TRANSIENT_ERRORS):
+        wait = min(_MAX_BACKOFF_SECONDS, delay * (attempt + 1))
+        logger.debug("Retrying in %.2fs (linear backoff)", wait)
+    else:
+        wait = random.uniform(0, min(_MAX_BACKOFF_SECONDS, delay * (2 ** attempt)))
+        logger.debug("Retrying in %.2fs (computed backoff)", wait)
+    return wait
+
+def _log_empty_response(response, task_description, attempt, retries):
+    """Logs why a Gemini response came back without parts (safety block or empty).
+
+    Returns True if the prompt was blocked: the same prompt is blocked again, so it isn't retried.
+    """
+    feedback = response.prompt_feedback
+    block_reason = feedback.block_reason if feedback else 'N/A'
+    safety_ratings = feedback.safety_ratings if feedback else []
+    logger.warning("Gemini response has no parts (attempt %d/%d) for %s. Block Reason: %s. Safety Ratings: %s", attempt + 1, retries, task_description, block_reason, safety_ratings)
+    return bool(feedback and feedback.block_reason)
+
+def _request_key(model_name, prompt, generation_config):
+    return hashlib.sha1(f"{model_name}|{generation_config!r}|{prompt}".encode('utf-8')).hexdigest()
+
+def _make_gemini_call_with_tracking(model_name, prompt, task_description, retries=3, delay=5, generation_config=None, use_cache=True):
+    """Makes a call to the Gemini API, tracks token usage, and handles retries.
+
+    generation_config (e.g. a genai.GenerationConfig with temperature or a response schema) is
+    passed through to generate_content as is. A call identical to one already in flight (same
+    model, prompt and config) shares that call's response. use_cache=False bypasses the response
+    cache, for callers that keep their own cache of the result.
+    """
+    key = _request_key(model_name, prompt, generation_config)
+    with _inflight_lock:
+        future = _inflight.get(key)
+        owner = future is None
+        if owner:
+            future = _inflight[key] = Future()
+    if not owner:
+        logger.info("Waiting for an identical in-flight Gemini call for %s.", task_description)
+        return future.result()
+    try:
+        future.set_result(_call_gemini(model_name, prompt, task_description, retries, delay, generation_config, use_cache))
+    except Exception as e:
+        future.set_exception(e)
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+    return future.result()
+
+def _call_gemini(model_name, prompt, task_description, retries, delay, generation_config, use_cache=True):
+    """Body of _make_gemini_call_with_tracking: cache lookup, then the API call with retries."""
     model = get_gemini_model(model_name)
     if not model:
-        logger.error(f"Cannot make Gemini call for {task_description}: Model '{model_name}' not initialized.")
+        logger.error("Cannot make Gemini call for %s: Model '%s' not initialized.", task_description, model_name)
         return None
 
-    logger.info(f"Calling Gemini model '{model_name}' for task: {task_description}...")
+    cached = _use_cached_response(model_name, prompt, task_description, generation_config) if use_cache else None
+    if cached is not None:
+        return cached
+
+    logger.info("Calling Gemini model '%s' for task: %s...", model_name, task_description)
     # Consider logging prompt length or a snippet for debugging large inputs
     # logger.debug(f"Prompt (first 500 chars): {prompt[:500]}...")
 
-    for attempt in range(retries):
+    limiter = _get_rate_limiter(model_name)
+    started = time.monotonic()
+    for attempt in itertools.count():
+        # Wait here rather than send a request the model's quota would reject with a 429
+        entry = limiter.acquire(_estimate_tokens(prompt)) if limiter else None
+        start_time = time.time()
+        # Only the API call itself is retried on an exception; a bug in the bookkeeping below
+        # must not trigger another (billed) call
         try:
-            start_time = time.time()
-            # TODO: Add GenerationConfig here if needed (temperature, max_output_tokens, etc.)
-            # generation_config = genai.types.GenerationConfig(temperature=0.7)
-            response = model.generate_content(prompt) #, generation_config=generation_config)
-            end_time = time.time()
-            logger.info(f"Gemini call for {task_description} completed in {end_time - start_time:.2f} seconds.")
-
-            # --- Token Tracking --- START
-            try:
-                if response.usage_metadata:
-                    prompt_tokens = response.usage_metadata.prompt_token_count
-                    candidates_tokens = response.usage_metadata.candidates_token_count
-                    total_tokens = response.usage_metadata.total_token_count
-
-                    _token_counts['prompt_tokens'] += prompt_tokens
-                    _token_counts['candidates_tokens'] += candidates_tokens
-                    _token_counts['total_tokens'] += total_tokens
-
-                    logger.info(f"Token Usage for {task_description} ({model_name}): Prompt={prompt_tokens}, Candidates={candidates_tokens}, Total={total_tokens}")
-                    logger.info(f"Cumulative Tokens: {_token_counts['total_tokens']}")
-                else:
-                    logger.warning(f"No usage metadata found in response for {task_description}.")
-            except Exception as usage_e:
-                logger.error(f"Error processing usage metadata for {task_description}: {usage_e}")
-            # --- Token Tracking --- END
-
-            # Handle potential safety blocks or empty responses AFTER tracking potential tokens
-            if not response.parts:
-                feedback = response.prompt_feedback
-                block_reason = feedback.block_reason if feedback else 'N/A'
-                safety_ratings = feedback.safety_ratings if feedback else []
-                logger.warning(f"Gemini response has no parts (attempt {attempt + 1}/{retries}) for {task_description}. Block Reason: {block_reason}. Safety Ratings: {safety_ratings}")
-                if attempt < retries - 1:
-                    logger.info(f"Retrying after empty/blocked response for {task_description}...")
-                    time.sleep(delay * (attempt + 1)) # Exponential backoff
-                    continue
-                else:
-                    logger.error(f"Gemini call for {task_description} failed after multiple attempts due to empty/blocked response.")
-                    return None # Return None to indicate final failure
-
-            # If successful, return the full response object
-            return response
-
+            response = model.generate_content(prompt, generation_config=generation_config)
         except Exception as e:
             # Catch other potential API errors (rate limits, connection issues, invalid requests etc.)
-            logger.error(f"An error occurred during Gemini API call for {task_description} (attempt {attempt + 1}/{retries}): {e}", exc_info=False) # Set exc_info=True for full traceback if needed
-            if attempt < retries - 1:
-                logger.info(f"Retrying after API error for {task_description}...")
-                time.sleep(delay * (attempt + 1)) # Exponential backoff
+            logger.error("An error occurred during Gemini API call for %s (attempt %d/%d): %s", task_description, attempt + 1, retries, e, exc_info=False) # Set exc_info=True for full traceback if needed
+            if _should_retry(e, attempt, retries, started):
+                logger.info("Retrying after API error for %s...", task_description)
+                time.sleep(_backoff_delay(attempt, delay, e))
+                continue
+            logger.error("Failed Gemini call for %s after multiple API errors.", task_description)
+            return None # Return None to indicate final failure
+
+        end_time = time.time()
+        logger.info("Gemini call for %s completed in %.2f seconds.", task_description, end_time - start_time)
+
+        _record_token_usage(response, task_description, model_name)
+        _settle_rate_limit(limiter, entry, response)
+
+        # Handle potential safety blocks or empty responses AFTER tracking potential tokens
+        if not response.parts:
+            blocked = _log_empty_response(response, task_description, attempt, retries)
+            if not blocked and attempt < retries - 1:
+                logger.info("Retrying after empty response for %s...", task_description)
+                time.sleep(_EMPTY_RESPONSE_RETRY_SECONDS)
+                continue
             else:
-                logger.error(f"Failed Gemini call for {task_description} after multiple API errors.")
+                logger.error("Gemini call for %s failed: response blocked or empty after %d attempt(s).", task_description, attempt + 1)
                 return None # Return None to indicate final failure
 
-    logger.error(f"Gemini call for {task_description} failed after exhausting retries.")
-    return None # Should be reached if retries are exhausted
+        # If successful, cache and return the full response object
+        if use_cache:
+            _response_cache.put(model_name, prompt, response, generation_config)
+        return response
+
+async def _make_gemini_call_with_tracking_async(model_name, prompt, task_description, retries=3, delay=5, generation_config=None, concurrency=None):
+    """Async version of _make_gemini_call_with_tracking, so many calls can wait on the API at once.
+
+    concurrency, if given, is the caller's AdaptiveSemaphore: it is told about each 429 and
+    each successful call so it can adjust how many calls the caller runs at once. Identical
+    in-flight calls are shared as in the sync version.
+    """
+    key = _request_key(model_name, prompt, generation_config)
+    future = _inflight_async.get(key)
+    if future is not None:
+        logger.info("Waiting for an identical in-flight Gemini call for %s.", task_description)
+        # Shielded so cancelling this waiter doesn't cancel the call other callers wait on
+        return await asyncio.shield(future)
+    future = _inflight_async[key] = asyncio.ensure_future(
+        _call_gemini_async(model_name, prompt, task_description, retries, delay, generation_config, concurrency))
+    try:
+        return await asyncio.shield(future)
+    finally:
+        if future.done():
+            _inflight_async.pop(key, None)
+        else:
+            future.add_done_callback(lambda _: _inflight_async.pop(key, None))
+
+async def _call_gemini_async(model_name, prompt, task_description, retries, delay, generation_config, concurrency):
+    """Body of _make_gemini_call_with_tracking_async."""
+    model = get_gemini_model(model_name)
+    if not model:
+        logger.error("Cannot make Gemini call for %s: Model '%s' not initialized.", task_description, model_name)
+        return None
+
+    cached = _use_cached_response(model_name, prompt, task_description, generation_config)
+    if cached is not None:
+        return cached
+
+    logger.info("Calling Gemini model '%s' for task: %s...", model_name, task_description)
+
+    limiter = _get_rate_limiter(model_name)
+    started = time.monotonic()
+    for attempt in itertools.count():
+        entry = None
+        while limiter:
+            entry, wait = limiter.reserve(_estimate_tokens(prompt))
+            if entry is not None:
+                break
+            await asyncio.sleep(wait)
+        start_time = time.time()
+        # Only the API call itself is retried on an exception; a bug in the bookkeeping below
+        # must not trigger another (billed) call
+        try:
+            response = await model.generate_content_async(prompt, generation_config=generation_config)
+        except Exception as e:
+            logger.error("An error occurred during Gemini API call for %s (attempt %d/%d): %s", task_description, attempt + 1, retries, e, exc_info=False)
+            if concurrency is not None and isinstance(e, google_exceptions.ResourceExhausted):
+                concurrency.on_failure()
+            if _should_retry(e, attempt, retries, started):
+                logger.info("Retrying after API error for %s...", task_description)
+                await asyncio.sleep(_backoff_delay(attempt, delay, e))
+                continue
+            logger.error("Failed Gemini call for %s after multiple API errors.", task_description)
+            return None # Return None to indicate final failure
+
+        end_time = time.time()
+        logger.info("Gemini call for %s completed in %.2f seconds.", task_description, end_time - start_time)
+
+        _record_token_usage(response, task_description, model_name)
+        _settle_rate_limit(limiter, entry, response)
+
+        if not response.parts:
+            blocked = _log_empty_response(response, task_description, attempt, retries)
+            if not blocked and attempt < retries - 1:
+                logger.info("Retrying after empty response for %s...", task_description)
+                await asyncio.sleep(_EMPTY_RESPONSE_RETRY_SECONDS)
+                continue
+            else:
+                logger.error("Gemini call for %s failed: response blocked or empty after %d attempt(s).", task_description, attempt + 1)
+                return None
+
+        if concurrency is not None:
+            concurrency.on_success()
+        _response_cache.put(model_name, prompt, response, generation_config)
+        return response
+
+async def gather_gemini_calls(calls, max_concurrency=64):
+    """Runs (model_name, prompt, task_description) calls concurrently, at most max_concurrency at a time.
+
+    Returns the responses in the order of calls; a call that failed or raised gives None.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _limited(model_name, prompt, task_description):
+        async with semaphore:
+            return await _make_gemini_call_with_tracking_async(model_name, prompt, task_description)
+
+    results = await asyncio.gather(*(_limited(*call) for call in calls), return_exceptions=True)
+    responses = []
+    for call, result in zip(calls, results):
+        if isinstance(result, BaseException):
+            logger.error(f"Gemini call for {call[2]} raised an exception: {result}")
+            result = None
+        responses.append(result)
+    return responses
+
+# The SDK's async gRPC client is bound to the event loop it is first used on, so every
+# run_gemini_coroutine() call (e.g. one per scheduled pipeline run) reuses this one loop
+_gemini_loop = None
+
+def run_gemini_coroutine(coro):
+    """Runs a coroutine making async Gemini calls to completion from synchronous code."""
+    global _gemini_loop
+    if _gemini_loop is None or _gemini_loop.is_closed():
+        _gemini_loop = asyncio.new_event_loop()
+    return _gemini_loop.run_until_complete(coro)
 
 # --- Prompt Definition (Keeping Filter/Tag Prompt Here) ---
+# Everything before {items_text} is identical on every call, so the items go last: Gemini's
+# implicit context caching only reuses an unchanged prompt prefix. Don't edit it per call.
 FILTERING_TAGGING_PROMPT_TEMPLATE = dedent("""
     You are an AI expert assistant analyzing news items for a highly technical CTO. Their priorities are: Google AI (Gemini, Vertex AI), LLMs, Prompt Engineering, MLOps, practical applications, market shifts (vs OpenAI/Anthropic/etc.), and actionable insights for their AI startup. They have a strong coding background but weaker theory.
 
-    Analyze the following items fetched from RSS feeds (provided as Title, URL, Snippet, Source Feed). Prioritize based on the CTO's interests AND the source feed's priority (assume feeds provided earlier in the input list are higher priority).
+    Analyze the following items fetched from RSS feeds (provided as tab-separated rows: idx, title, url, snippet, source feed). Prioritize based on the CTO's interests AND the source feed's priority (assume feeds provided earlier in the input list are higher priority).
 
     For the TOP ~15-20 most relevant items, provide a JSON list of objects, each containing:
-    - "url": Original URL
-    - "title": Original Title
-    - "source": Source Feed URL
+    - "idx": The item's idx from the input
     - "relevance_score": (1-10, 10=highest relevance to CTO)
     - "justification": (Briefly why it's relevant)
     - "content_type": (Tag: "News", "Research Paper Abstract", "Tutorial/Guide", "Opinion", "Market/Competitor Info", "Company Update", "Other")
@@ -157,26 +486,208 @@ FILTERING_TAGGING_PROMPT_TEMPLATE = dedent("""
 
     Filter out low-signal noise, marketing fluff, and duplicates aggressively. Focus on substantial updates, technical insights, and practical guides.
 
-    Input Items (Title, URL, Snippet, Source Feed):
+    Input Items:
     {items_text}
-
-    Output ONLY the JSON list.
 """)
 
-def format_items_for_prompt(items):
-    """Formats the list of item dictionaries into a string for the prompt."""
-    lines = []
+# Split once at import; building the prompt is then plain concatenation, with the prefix bytes
+# guaranteed identical on every call
+_PROMPT_PREFIX, _PROMPT_SUFFIX = FILTERING_TAGGING_PROMPT_TEMPLATE.split("{items_text}")
+
+class FilteredItem(TypedDict):
+    """One object of the filtering response's JSON list, mirroring the fields the prompt asks for."""
+    idx: int
+    relevance_score: int
+    justification: str
+    content_type: Literal["News", "Research Paper Abstract", "Tutorial/Guide", "Opinion",
+                          "Market/Competitor Info", "Company Update", "Other"]
+    keywords: list[str]
+
+# JSON mode: the model returns a bare JSON list matching FilteredItem, never a markdown-wrapped one
+_FILTER_GENERATION_CONFIG = genai.GenerationConfig(
+    response_mime_type="application/json",
+    response_schema=list[FilteredItem],
+    temperature=0.2,
+)
+
+# Snippet length limits for the filtering prompt (characters)
+_MAX_SNIPPET_CHARS = 500
+_MIN_SNIPPET_CHARS = 120
+_PROMPT_SNIPPET_CHARS = 400_000
+
+# Tabs and line breaks inside a field would break the one-row-per-item layout
+_TSV_FIELD_TABLE = str.maketrans({'\t': ' ', '\n': ' ', '\r': ' '})
+
+def _prompt_url(url):
+    """Drops the query string and fragment (tracking parameters, mostly) from a URL shown in the prompt."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path}" if parts.netloc else url
+
+def _canonical_url(url):
+    """Normalizes a URL for duplicate detection: lowercase host, no utm_* parameters, no trailing slash."""
+    parts = urlsplit(url)
+    query = '&'.join(param for param in parts.query.split('&') if param and not param.lower().startswith('utm_'))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/'), query, ''))
+
+def _dedupe_items(items):
+    """Drops items whose URL, or whose title's first six words, repeat an earlier item's.
+
+    The same story often arrives through several feeds; removing the copies locally is free,
+    while sending them costs prompt tokens for the model to discard anyway.
+    """
+    seen_urls = set()
+    seen_titles = set()
+    unique_items = []
     for item in items:
+        url = item.get('link')
+        url_key = _canonical_url(url) if url else None
+        if url_key is not None and url_key in seen_urls:
+            continue
+        words = str(item.get('title') or '').lower().split()
+        # Titles this short (e.g. 'No Title') say too little to call two items the same
+        title_key = ' '.join(words[:6]) if len(words) >= 4 else None
+        if title_key is not None and title_key in seen_titles:
+            continue
+        if url_key is not None:
+            seen_urls.add(url_key)
+        if title_key is not None:
+            seen_titles.add(title_key)
+        unique_items.append(item)
+    if len(unique_items) < len(items):
+        logger.info(f"Dropped {len(items) - len(unique_items)} duplicate items before filtering.")
+    return unique_items
+
+def format_items_for_prompt(items):
+    """Formats the list of item dictionaries into tab-separated rows for the prompt.
+
+    Rows are numbered; the model answers with those numbers (idx) and the originals are
+    looked up again locally, so URLs can be shortened here without losing anything.
+    """
+    # Snippet budget per item: up to 500 chars, shrinking on busy days so the whole prompt stays
+    # around _PROMPT_SNIPPET_CHARS (roughly 100k tokens at ~4 chars per token)
+    budget = max(_MIN_SNIPPET_CHARS, min(_MAX_SNIPPET_CHARS, _PROMPT_SNIPPET_CHARS // max(1, len(items))))
+    # One flat list of pieces joined once at the end, rather than a string per field and per row
+    buf = ["idx\ttitle\turl\tsnippet\tsource"]
+    append = buf.append
+    table = _TSV_FIELD_TABLE
+    for idx, item in enumerate(items):
+        get = item.get
         # Truncate long summaries to keep the prompt size reasonable
-        summary = item.get('summary', '')
-        if summary and len(summary) > 500:
-             summary = summary[:497] + '...'
+        summary = get('summary', '')
+        if summary and len(summary) > budget:
+             summary = summary[:budget - 3] + '...'
         # Include published date if available for context? Might add tokens.
         # pub_date = item.get('published')
         # pub_str = time.strftime('%Y-%m-%d', pub_date) if pub_date else 'N/A'
-        line = f"- Title: {item.get('title', 'N/A')}\n  URL: {item.get('link', 'N/A')}\n  Snippet: {summary}\n  Source Feed: {item.get('source_feed', 'N/A')}"
-        lines.append(line)
-    return "\n".join(lines)
+        append(f"\n{idx}\t")
+        append(str(get('title', 'N/A')).translate(table))
+        append("\t")
+        append(_prompt_url(get('link', 'N/A')).translate(table))
+        append("\t")
+        append(str(summary).translate(table))
+        append("\t")
+        append(str(get('source_feed', 'N/A')).translate(table))
+    return "".join(buf)
+
+def _build_filter_prompt(items, config):
+    """Returns the (model_name, prompt) pair for filtering and tagging items."""
+    # Get the model name from config
+    model_name = config.get('gemini_models', {}).get('FILTERING_MODEL', 'gemini-2.0-flash-lite') # Default fallback updated
+
+    items_text = format_items_for_prompt(items)
+    prompt = _PROMPT_PREFIX + items_text + _PROMPT_SUFFIX
+    return model_name, prompt
+
+def _resolve_filtered_items(selected, items):
+    """Turns the model's idx-based selections back into items with their original url, title and source."""
+    filtered_items = []
+    seen = set()
+    for selection in selected:
+        idx = selection.pop('idx', None)
+        if not isinstance(idx, int) or not 0 <= idx < len(items) or idx in seen:
+            logger.warning(f"Ignoring filtered item with an invalid or repeated idx: {idx!r}")
+            continue
+        seen.add(idx)
+        item = items[idx]
+        filtered_items.append({
+            'url': item.get('link'),
+            'title': item.get('title'),
+            'source': item.get('source_feed'),
+            **selection,
+        })
+    return filtered_items
+
+def _parse_filter_response(response, model_name, items):
+    """Parses the filtered item list out of a filtering response, or returns None if failed."""
+    if not response:
+        logger.error("Gemini call for filtering/tagging failed after retries.")
+        return None
+
+    try:
+        # JSON mode guarantees a bare JSON list, so parse the response text directly
+        filtered_items = _resolve_filtered_items(_json_loads(response.text), items)
+        logger.info(f"Successfully received and parsed {len(filtered_items)} filtered items from Gemini ({model_name}).")
+        return filtered_items
+
+    except json.JSONDecodeError as e:
+        logger.error(f"Failed to decode JSON response from Gemini for filtering ({model_name}): {e}")
+        logger.error(f"Problematic response snippet: {response.text[:500]}...") # Log snippet of bad response
+        return None
+    except Exception as e:
+        # Catch unexpected errors during response processing
+        logger.error(f"An error occurred processing the Gemini response for filtering ({model_name}): {e}", exc_info=True)
+        return None
+
+# Prompts above this many tokens are split in half and filtered in two calls (config: max_prompt_tokens)
+DEFAULT_MAX_PROMPT_TOKENS = 300_000
+# Rough characters per token for English text. Prompts whose estimate is under half the budget skip
+# the count_tokens round trip; the margin covers text that tokenizes denser than the average.
+_CHARS_PER_TOKEN_ESTIMATE = 4
+
+def _prompt_token_budget(prompt, config):
+    """Returns max_prompt_tokens, or None when the prompt is clearly under it and needs no exact count."""
+    max_tokens = config.get('max_prompt_tokens', DEFAULT_MAX_PROMPT_TOKENS)
+    if len(prompt) // _CHARS_PER_TOKEN_ESTIMATE <= max_tokens // 2:
+        return None
+    return max_tokens
+
+def _log_prompt_tokens(prompt_tokens, max_tokens, item_count):
+    """Returns True (and logs it) when a counted prompt is over the token budget."""
+    if prompt_tokens <= max_tokens:
+        return False
+    logger.info(f"Filtering prompt for {item_count} items is {prompt_tokens} tokens (limit {max_tokens}); splitting it in two.")
+    return True
+
+def _prompt_over_budget(model_name, prompt, config, item_count):
+    """True if the prompt is over max_prompt_tokens. Only prompts near the budget are counted with the
+    model; counting errors count as fitting."""
+    max_tokens = _prompt_token_budget(prompt, config)
+    if max_tokens is None:
+        return False
+    model = get_gemini_model(model_name)
+    if not model:
+        return False
+    try:
+        prompt_tokens = model.count_tokens(prompt).total_tokens
+    except Exception as e:
+        logger.warning(f"Could not count prompt tokens for filtering ({model_name}): {e}")
+        return False
+    return _log_prompt_tokens(prompt_tokens, max_tokens, item_count)
+
+async def _prompt_over_budget_async(model_name, prompt, config, item_count):
+    """Async version of _prompt_over_budget."""
+    max_tokens = _prompt_token_budget(prompt, config)
+    if max_tokens is None:
+        return False
+    model = get_gemini_model(model_name)
+    if not model:
+        return False
+    try:
+        prompt_tokens = (await model.count_tokens_async(prompt)).total_tokens
+    except Exception as e:
+        logger.warning(f"Could not count prompt tokens for filtering ({model_name}): {e}")
+        return False
+    return _log_prompt_tokens(prompt_tokens, max_tokens, item_count)
 
 # Modified function signature to accept config
 def filter_and_tag_items(items, config):
@@ -193,47 +704,57 @@ def filter_and_tag_items(items, config):
         logger.warning("No items provided for filtering and tagging.")
         return []
 
-    # Get the model name from config
-    model_name = config.get('gemini_models', {}).get('FILTERING_MODEL', 'gemini-2.0-flash-lite') # Default fallback updated
-
-    items_text = format_items_for_prompt(items)
-    prompt = FILTERING_TAGGING_PROMPT_TEMPLATE.format(items_text=items_text)
-
+    return _filter_and_tag(prefilter(_dedupe_items(items), config), config)
+
+def _filter_and_tag(items, config):
+    """Filters already deduplicated and pre-filtered items, splitting prompts that are over budget."""
+    model_name, prompt = _build_filter_prompt(items, config)
+    # An oversized prompt would fail (or cost more than allowed) at full price; filter each half instead
+    if len(items) > 1 and _prompt_over_budget(model_name, prompt, config, len(items)):
+        half = len(items) // 2
+        first = _filter_and_tag(items[:half], config)
+        second = _filter_and_tag(items[half:], config)
+        if first is None or second is None:
+            return None
+        return first + second
     logger.info(f"Sending {len(items)} items to Gemini model '{model_name}' for filtering/tagging...")
 
     # Use the centralized call function
     response = _make_gemini_call_with_tracking(
         model_name=model_name,
         prompt=prompt,
-        task_description="Filtering and Tagging"
+        task_description="Filtering and Tagging",
+        generation_config=_FILTER_GENERATION_CONFIG,
     )
+    return _parse_filter_response(response, model_name, items)
 
-    if not response:
-        logger.error("Gemini call for filtering/tagging failed after retries.")
-        return None
-
-    try:
-        raw_json = response.text
-        # logger.debug(f"Raw JSON response from Gemini for filtering:\n{raw_json}")
+async def filter_and_tag_items_async(items, config):
+    """Async version of filter_and_tag_items, for callers already running an event loop."""
+    if not items:
+        logger.warning("No items provided for filtering and tagging.")
+        return []
 
-        # Clean the response - Gemini might add markdown backticks or prefix
-        cleaned_json = raw_json.strip().strip('`').strip()
-        if cleaned_json.lower().startswith('json'):
-            cleaned_json = cleaned_json[4:].strip() # Remove potential leading 'json' prefix (case-insensitive)
+    return await _filter_and_tag_async(prefilter(_dedupe_items(items), config), config)
 
-        # Parse the JSON response
-        filtered_items = json.loads(cleaned_json)
-        logger.info(f"Successfully received and parsed {len(filtered_items)} filtered items from Gemini ({model_name}).")
-        return filtered_items
+async def _filter_and_tag_async(items, config):
+    """Async version of _filter_and_tag."""
+    model_name, prompt = _build_filter_prompt(items, config)
+    if len(items) > 1 and await _prompt_over_budget_async(model_name, prompt, config, len(items)):
+        half = len(items) // 2
+        first, second = await asyncio.gather(_filter_and_tag_async(items[:half], config),
+                                             _filter_and_tag_async(items[half:], config))
+        if first is None or second is None:
+            return None
+        return first + second
+    logger.info(f"Sending {len(items)} items to Gemini model '{model_name}' for filtering/tagging...")
 
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to decode JSON response from Gemini for filtering ({model_name}): {e}")
-        logger.error(f"Problematic response snippet: {response.text[:500]}...") # Log snippet of bad response
-        return None
-    except Exception as e:
-        # Catch unexpected errors during response processing
-        logger.error(f"An error occurred processing the Gemini response for filtering ({model_name}): {e}", exc_info=True)
-        return None
+    response = await _make_gemini_call_with_tracking_async(
+        model_name=model_name,
+        prompt=prompt,
+        task_description="Filtering and Tagging",
+        generation_config=_FILTER_GENERATION_CONFIG,
+    )
+    return _parse_filter_response(response, model_name, items)
 
 # --- Example Usage (for testing) - Needs Update ---
 if __name__ == '__main__':
@@ -0,0 +1,135 @@
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+WINDOW_SECONDS = 60
+
+class TokenBucket:
+    """Rolling one-minute request (rpm) and token (tpm) limiter for one model's quota.
+
+    Callers reserve a slot before each API call, waiting while the last minute's requests or
+    tokens are at the limit, so a burst of worker threads queues up here instead of getting
+    429s back from the API. Token counts are estimates at reservation time and can be
+    corrected with settle() once the response's usage is known. A limit that is None or not
+    positive is not enforced. Thread-safe.
+    """
+
+    def __init__(self, rpm=None, tpm=None):
+        self._rpm = rpm if rpm is not None and rpm > 0 else None
+        self._tpm = tpm if tpm is not None and tpm > 0 else None
+        self._window = deque() # [timestamp, tokens] per request in the last minute, oldest first
+        self._tokens = 0
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        while self._window and self._window[0][0] <= now - WINDOW_SECONDS:
+            self._tokens -= self._window.popleft()[1]
+
+    def reserve(self, tokens):
+        """Tries to reserve a request of `tokens` tokens now.
+
+        Returns (entry, 0) on success, or (None, seconds) to wait before trying again.
+        """
+        if self._rpm is None and self._tpm is None:
+            return [time.monotonic(), tokens], 0
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            over_rpm = self._rpm is not None and len(self._window) >= self._rpm
+            # A single request larger than the whole budget still goes through once the window is empty
+            over_tpm = self._tpm is not None and self._window and self._tokens + tokens > self._tpm
+            if over_rpm or over_tpm:
+                return None, max(0.0, self._window[0][0] + WINDOW_SECONDS - now)
+            entry = [now, tokens]
+            self._window.append(entry)
+            self._tokens += tokens
+            return entry, 0
+
+    def acquire(self, tokens):
+        """Blocks until a request of `tokens` tokens fits within the limits; returns its entry for settle()."""
+        while True:
+            entry, wait = self.reserve(tokens)
+            if entry is not None:
+                return entry
+            logger.debug("Rate limit reached, waiting %.2fs", wait)
+            time.sleep(wait)
+
+    def settle(self, entry, actual_tokens):
+        """Replaces a reservation's estimated token count with the actual one."""
+        with self._lock:
+            # Entries that already left the window no longer count towards the total
+            if self._window and entry[0] > time.monotonic() - WINDOW_SECONDS:
+                self._tokens += actual_tokens - entry[1]
+            entry[1] = actual_tokens
+
+class AdaptiveSemaphore:
+    """Asyncio semaphore whose limit backs off on rate limit errors and recovers on successes (AIMD).
+
+    Starts at max_permits. on_failure() halves the limit (never below 1), at most once per
+    cooldown seconds so a burst of concurrent 429s counts as one; on_success() raises it by
+    one after success_streak successes in a row, up to max_permits again. Lowering the limit
+    doesn't interrupt holders, it only delays new acquisitions. Use from a single event loop.
+    """
+
+    def __init__(self, max_permits, success_streak=20, cooldown=5.0):
+        self._max = max_permits
+        self._limit = max_permits
+        self._in_use = 0
+        self._waiters = deque()
+        self._streak = 0
+        self._success_streak = success_streak
+        self._cooldown = cooldown
+        self._last_decrease = float('-inf')
+
+    @property
+    def limit(self):
+        return self._limit
+
+    async def __aenter__(self):
+        while self._in_use >= self._limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                raise
+        self._in_use += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._in_use -= 1
+        self._wake()
+
+    def _wake(self):
+        """Wakes as many waiters as there are free permits; they re-check the limit themselves."""
+        free = self._limit - self._in_use
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def on_failure(self):
+        """Records a rate limit error: halves the limit unless it was just lowered."""
+        self._streak = 0
+        now = time.monotonic()
+        if now - self._last_decrease < self._cooldown or self._limit == 1:
+            return
+        self._limit = max(1, self._limit // 2)
+        self._last_decrease = now
+        logger.warning("Rate limited by Gemini, lowering concurrency to %d", self._limit)
+
+    def on_success(self):
+        """Records a successful call: raises the limit by one after a streak of successes."""
+        self._streak += 1
+        if self._streak >= self._success_streak and self._limit < self._max:
+            self._streak = 0
+            self._limit += 1
+            logger.info("Raising Gemini concurrency back to %d", self._limit)
+            self._wake()
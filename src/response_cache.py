@@ -0,0 +1,124 @@
+import json
+import zlib
+import sqlite3
+import hashlib
+import logging
+import threading
+import time
+from collections.abc import Mapping
+from dataclasses import asdict, dataclass, is_dataclass
+from types import SimpleNamespace
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = "gemini_response_cache.sqlite3"
+DEFAULT_TTL_HOURS = 24
+
+@dataclass(frozen=True, slots=True)
+class CachedResponse:
+    """Stands in for a Gemini response served from the cache.
+
+    Exposes the attributes the pipeline reads from a live response (text, parts,
+    usage_metadata, prompt_feedback), so callers don't need to know where it came from.
+    """
+    text: str
+    usage_metadata: SimpleNamespace
+
+    @property
+    def parts(self):
+        return (self.text,)
+
+    @property
+    def prompt_feedback(self):
+        return None
+
+def _canonical_generation_config(generation_config):
+    """Serializes a generation config (GenerationConfig dataclass, dict or None) the same way every run."""
+    if generation_config is None:
+        return ''
+    if is_dataclass(generation_config):
+        generation_config = asdict(generation_config)
+    if isinstance(generation_config, Mapping):
+        # Types (e.g. a response_schema) have no JSON form; their repr names them stably
+        return json.dumps(generation_config, sort_keys=True, default=repr)
+    return repr(generation_config)
+
+class ResponseCache:
+    """SQLite cache of successful Gemini responses, keyed by sha256 of (model name, generation config, prompt).
+
+    Entries older than ttl_hours are ignored and purged on open. Response bodies are
+    zlib-compressed. A cache that can't be opened or written disables itself with a
+    warning rather than failing the Gemini call.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, ttl_hours=DEFAULT_TTL_HOURS, enabled=True):
+        self._path = path
+        self._ttl = ttl_hours * 3600
+        self._enabled = enabled
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(model_name, prompt, generation_config):
+        config = _canonical_generation_config(generation_config)
+        return hashlib.sha256(f"{model_name}\x00{config}\x00{prompt}".encode()).hexdigest()
+
+    def _connection(self):
+        """Opens the database on first use; returns None when the cache is disabled. Call with the lock held."""
+        if self._conn is None and self._enabled:
+            try:
+                conn = sqlite3.connect(self._path, check_same_thread=False)
+                conn.execute("CREATE TABLE IF NOT EXISTS responses ("
+                             "key TEXT PRIMARY KEY, response BLOB, tokens_json TEXT, created_at INTEGER)")
+                conn.execute("DELETE FROM responses WHERE created_at < ?", (int(time.time() - self._ttl),))
+                conn.commit()
+                self._conn = conn
+            except sqlite3.Error as e:
+                self._disable(e)
+        return self._conn
+
+    def _disable(self, error):
+        logger.warning(f"Gemini response cache error ({error}). Disabling the response cache for this run.")
+        self._enabled = False
+        self._conn = None
+
+    def get(self, model_name, prompt, generation_config=None):
+        """Returns a CachedResponse for (model_name, prompt, generation_config) if a fresh one is stored, else None."""
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute("SELECT response, tokens_json FROM responses WHERE key = ? AND created_at >= ?",
+                                   (self._key(model_name, prompt, generation_config), int(time.time() - self._ttl))).fetchone()
+            except sqlite3.Error as e:
+                self._disable(e)
+                return None
+        if row is None:
+            return None
+        return CachedResponse(text=zlib.decompress(row[0]).decode('utf-8'),
+                              usage_metadata=SimpleNamespace(**json.loads(row[1])))
+
+    def put(self, model_name, prompt, response, generation_config=None):
+        """Stores the text and token usage of a successful response."""
+        try:
+            text = response.text
+        except ValueError: # No single text part (e.g. multiple candidates); nothing worth caching
+            return
+        usage = response.usage_metadata
+        tokens = {
+            'prompt_token_count': getattr(usage, 'prompt_token_count', 0) or 0,
+            'candidates_token_count': getattr(usage, 'candidates_token_count', 0) or 0,
+            'total_token_count': getattr(usage, 'total_token_count', 0) or 0,
+        }
+        body = zlib.compress(text.encode('utf-8'))
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return
+            try:
+                conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                             (self._key(model_name, prompt, generation_config), body, json.dumps(tokens), int(time.time())))
+                conn.commit()
+            except sqlite3.Error as e:
+                self._disable(e)
@@ -1,142 +1,239 @@
 import google.generativeai as genai
 import logging
-from textwrap import dedent
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
+import threading
 import json
 import re
+import math
 import html # For escaping
+from typing_extensions import TypedDict # typing.TypedDict isn't accepted as a response schema before 3.12
 
 # Import the centralized Gemini call function and token tracking
-from src.processing import _make_gemini_call_with_tracking
+from src.processing import _make_gemini_call_with_tracking_async, run_gemini_coroutine, _json_loads
+from src.rate_limiter import AdaptiveSemaphore
+from src.summary_cache import SummaryCache, summary_key, DEFAULT_TTL_DAYS
 
 logger = logging.getLogger(__name__)
 
-# Prompt for the lightweight summarization model
-SUMMARIZATION_LITE_PROMPT_TEMPLATE = dedent("""
-    Concisely summarize the core news or concept from the following AI-related item (Title, URL, Content Snippet) in 3-4 sentences.
-    Focus on the main takeaway.
-
-    Title: {title}
-    URL: {url}
-    Content Snippet: {content_snippet}
-
-    Output ONLY the summary text, with no additional formatting or labels.
-""")
-
-# Prompt for the deeper analysis model, requesting specific fields
-# Updated to reinforce clean output for each field and include project context (B.3)
-ANALYSIS_PROMPT_TEMPLATE = dedent("""
-    Analyze the following AI news item for a technical CTO, based on the provided snippet and its initial summary.
-    Focus ONLY on information derivable from the text provided.
-
-    Title: {title}
-    URL: {url}
-    Content Snippet: {content_snippet}
-    Basic Summary: {basic_summary}
-
-    --- User's Project Context --- START
-    {project_context}
-    --- User's Project Context --- END
-
-    Provide the following analysis points. Output ONLY the text content for each point, prefixed with the specific label EXACTLY as shown below:
-    💡 Key Technical Insight: [Text content derived *only* from the item itself]
-    📊 The Competitive Angle: [Text content derived *only* from the item itself]
-    🚀 Your Potential Move: Analyze this item's relevance considering the user's current projects (context provided above). If there's a *clear, high-ROI, specific, and sensible* application, improvement, or experiment related to these projects, suggest a *concrete* next step. Otherwise, output 'No specific project application identified for this item.'
-
-    Ensure each point starts on a new line. Do NOT include any HTML tags, markdown formatting, or extra explanations.
-""")
-
-def _extract_analysis_field(text, label):
-    """Extracts text following a specific label on a new line."""
-    # Refined Regex:
-    # - ^ asserts position at the start of a line (due to re.MULTILINE).
-    # - re.escape(label) matches the literal label string.
-    # - \\s* matches optional whitespace after the label.
-    # - (.*?) non-greedily captures the content.
-    # - (?=...) is a positive lookahead, ensuring the capture stops when it sees:
-    #   - \\n(?:💡|📊|🚀) - a newline followed by one of the known labels OR
-    #   - \\Z - the end of the string.
-    # This prevents reading past the intended section.
-    pattern = re.compile(rf"^{re.escape(label)}\\s*(.*?)(?=\\n(?:💡|📊|🚀)|\\Z)", re.MULTILINE | re.DOTALL)
-    match = pattern.search(text)
-    if match:
-        # Clean up the captured text: strip whitespace, remove potential code blocks/extra notes
-        content = match.group(1).strip()
-        # Remove potential markdown code blocks or html blocks incorrectly added by LLM
-        content = re.sub(r"```[a-zA-Z]*\n.*?\n```", "", content, flags=re.DOTALL)
-        content = re.sub(r"<[^>]+>", "", content) # Basic HTML tag stripping
-        # Remove common non-committal phrases if they are the *only* content
-        non_committal_patterns = [
-            r"\[analysis generation failed\]",
-            r"none",
-            r"n/a",
-            r"none is clear",
-            r"none clear",
-            r"no actionable idea"
-        ]
-        if any(re.fullmatch(pattern, content, re.IGNORECASE) for pattern in non_committal_patterns):
-            return None # Treat non-committal as empty
-
-        return html.unescape(content).strip() # Unescape HTML entities like &amp;
-    return None
-
-def _process_single_item(item, config, project_context):
-    """Generates summary & analysis for a single item, returning structured data."""
-    gemini_config = config.get('gemini_models', {})
-    # Use 2.0 models as defaults, matching user preference and config (Model Reminder)
-    lite_model_name = gemini_config.get('FILTERING_MODEL', 'gemini-2.0-flash-lite') # Changed key name based on likely intent
-    analysis_model_name = gemini_config.get('ANALYSIS_MODEL', 'gemini-2.0-flash') # Changed key name based on likely intent
+NO_SNIPPET = 'No content snippet available.'
+# Snippets shorter than this (min_snippet_chars_for_analysis) only get a basic summary. The
+# snippet is usually the filter's one-sentence justification, so keep it well below that
+DEFAULT_MIN_SNIPPET_CHARS_FOR_ANALYSIS = 40
 
-    item_title = item.get('title', 'N/A')
-    item_url = item.get('url', 'N/A')
-    # B.4 - Capture source name if available for market pulse later
-    item_type = item.get('content_type', 'News') # Default to News
-    source_name = item.get('source_name', item_title) # Use title as fallback for source
+# Kept across summarize_and_analyze calls, so a scheduled (long-running) process opens the
+# summary cache database once rather than on every run
+_summary_cache = None
+_summary_cache_ttl = None
+_summary_cache_lock = threading.Lock()
 
-    # Prepare the snippet
-    content_snippet = item.get('justification', item.get('summary', 'No content snippet available.'))
-    if len(content_snippet) > 2000: # Keep snippet reasonable for both models
-        content_snippet = content_snippet[:1997] + '...'
+# --- Prompts ---
+# Built with f-strings rather than str.format templates: each is built once or twice per item,
+# and the snippet and context are substituted without re-parsing a template
 
-    # --- 1. Generate Basic Summary (Lite Model) ---
+def _build_summary_prompt(title, url, content_snippet):
+    """Prompt for the lightweight summarization model."""
+    return f"""
+Concisely summarize the core news or concept from the following AI-related item (Title, URL, Content Snippet) in 3-4 sentences.
+Focus on the main takeaway.
+
+Title: {title}
+URL: {url}
+Content Snippet: {content_snippet}
+
+Output ONLY the summary text, with no additional formatting or labels.
+"""
+
+def _build_analysis_prompt(title, url, content_snippet, basic_summary, project_context):
+    """Prompt for the deeper analysis model, requesting specific fields as JSON (AnalysisFields).
+
+    Reinforces clean output for each field and includes project context (B.3).
+    """
+    return f"""
+Analyze the following AI news item for a technical CTO, based on the provided snippet and its initial summary.
+Focus ONLY on information derivable from the text provided.
+
+Title: {title}
+URL: {url}
+Content Snippet: {content_snippet}
+Basic Summary: {basic_summary}
+
+--- User's Project Context --- START
+{project_context}
+--- User's Project Context --- END
+
+Respond with ONLY a JSON object with these fields, each plain text without HTML tags or markdown formatting:
+- "insight": The key technical insight, derived *only* from the item itself.
+- "angle": The competitive angle, derived *only* from the item itself.
+- "move": Analyze this item's relevance considering the user's current projects (context provided above). If there's a *clear, high-ROI, specific, and sensible* application, improvement, or experiment related to these projects, suggest a *concrete* next step. Otherwise, output 'No specific project application identified for this item.'
+"""
+
+def _build_combined_prompt(title, url, content_snippet, project_context):
+    """Prompt for the analysis model when the summary and analysis are fused into one call
+    (gemini_models.fused), answered as JSON matching ItemAnalysis."""
+    return f"""
+Summarize and analyze the following AI news item for a technical CTO, based on the provided snippet.
+Focus ONLY on information derivable from the text provided.
+
+Title: {title}
+URL: {url}
+Content Snippet: {content_snippet}
+
+--- User's Project Context --- START
+{project_context}
+--- User's Project Context --- END
+
+Respond with a JSON object with these fields, each plain text without HTML tags or markdown formatting:
+- "summary": The core news or concept of the item in 3-4 sentences, focused on the main takeaway.
+- "insight": The key technical insight, derived *only* from the item itself.
+- "angle": The competitive angle, derived *only* from the item itself.
+- "move": Analyze this item's relevance considering the user's current projects (context provided above). If there's a *clear, high-ROI, specific, and sensible* application, improvement, or experiment related to these projects, suggest a *concrete* next step. Otherwise, output 'No specific project application identified for this item.'
+"""
+
+class AnalysisFields(TypedDict):
+    insight: str
+    angle: str
+    move: str
+
+_ANALYSIS_GENERATION_CONFIG = genai.GenerationConfig(
+    response_mime_type="application/json",
+    response_schema=AnalysisFields,
+)
+
+class ItemAnalysis(TypedDict):
+    summary: str
+    insight: str
+    angle: str
+    move: str
+
+_COMBINED_GENERATION_CONFIG = genai.GenerationConfig(
+    response_mime_type="application/json",
+    response_schema=ItemAnalysis,
+)
+
+# Labels of the plain-text analysis format, still parsed when an analysis response isn't valid JSON
+INSIGHT_LABEL = "💡 Key Technical Insight:"
+ANGLE_LABEL = "📊 The Competitive Angle:"
+MOVE_LABEL = "🚀 Your Potential Move:"
+
+# Analysis field each label introduces
+_ANALYSIS_LABELS = {INSIGHT_LABEL: 'insight', ANGLE_LABEL: 'angle', MOVE_LABEL: 'move'}
+
+# Compiled once at import; these run for every field of every summarized item
+_CODEBLOCK_RE = re.compile(r"```[a-zA-Z]*\n.*?\n```", re.DOTALL)
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+# Non-committal answers, treated as no content when they are the whole field
+_NONCOMMITTAL_RE = re.compile(r"\[analysis generation failed\]|none|n/a|none is clear|none clear|no actionable idea", re.IGNORECASE)
+
+def _strip_markup(text):
+    """Removes markdown code blocks and HTML tags the LLM may have added.
+
+    Each pass only runs when its marker is present, which for most outputs it isn't.
+    """
+    if '```' in text:
+        text = _CODEBLOCK_RE.sub("", text)
+    if '<' in text:
+        text = _HTML_TAG_RE.sub("", text) # Basic HTML tag stripping
+    return text
+
+def _unescape(text):
+    """Unescapes HTML entities like &amp; (only text containing '&' can have any)."""
+    return (html.unescape(text) if '&' in text else text).strip()
+
+def _clean_model_text(text):
+    """Removes markdown code blocks and HTML tags the LLM may have added, and unescapes HTML entities."""
+    return _unescape(_strip_markup(text))
+
+def _clean_analysis_field(content):
+    """Cleans one analysis point like _clean_model_text; returns None for a non-committal answer."""
+    content = _strip_markup(content.strip())
+    if _NONCOMMITTAL_RE.fullmatch(content):
+        return None # Treat non-committal as empty
+    return _unescape(content)
+
+def _load_json_object(text, item_title):
+    """Parses a JSON response that should be an object; logs and returns None otherwise."""
+    try:
+        fields = _json_loads(text)
+    except json.JSONDecodeError as e:
+        logger.error(f"Failed to parse JSON response for {item_title}: {e}")
+        logger.debug(f"Raw response text: {text[:200]}...")
+        return None
+    if not isinstance(fields, dict):
+        logger.error(f"JSON response for {item_title} is not an object.")
+        return None
+    return fields
+
+def _analysis_from_json(fields):
+    """Cleans the insight/angle/move fields of a parsed JSON response into analysis_data."""
+    analysis_data = {'insight': None, 'angle': None, 'move': None}
+    for field in analysis_data:
+        if isinstance(fields.get(field), str):
+            analysis_data[field] = _clean_analysis_field(fields[field]) or None
+    return analysis_data
+
+def _parse_analysis(text):
+    """Splits the analysis model's labelled output into {'insight', 'angle', 'move'} in one pass.
+
+    A field runs from its label at the start of a line up to the next labelled line (or the
+    end of the text). Fields the model didn't give, or answered non-committally, are None.
+    """
+    analysis_data = {'insight': None, 'angle': None, 'move': None}
+    field, lines = None, []
+    for line in text.splitlines():
+        for label, next_field in _ANALYSIS_LABELS.items():
+            if line.startswith(label):
+                if field:
+                    analysis_data[field] = _clean_analysis_field("\n".join(lines))
+                field, lines = next_field, [line[len(label):]]
+                break
+        else:
+            if field:
+                lines.append(line)
+    if field:
+        analysis_data[field] = _clean_analysis_field("\n".join(lines))
+    return analysis_data
+
+async def _summarize_basic(item_title, item_url, content_snippet, lite_model_name, concurrency=None):
+    """Basic summary of an item from the lite model, or None if it failed."""
     logger.debug(f"Requesting basic summary for: {item_title} using {lite_model_name}")
-    summary_prompt = SUMMARIZATION_LITE_PROMPT_TEMPLATE.format(
-        title=item_title,
-        url=item_url,
-        content_snippet=content_snippet
-    )
-    summary_response = _make_gemini_call_with_tracking(
+    summary_prompt = _build_summary_prompt(item_title, item_url, content_snippet)
+    summary_response = await _make_gemini_call_with_tracking_async(
         model_name=lite_model_name,
         prompt=summary_prompt,
-        task_description=f"Basic Summary ({item_title[:30]}...)"
+        task_description=f"Basic Summary ({item_title[:30]}...)",
+        concurrency=concurrency
     )
 
     basic_summary = None
     if summary_response and summary_response.text:
         # Clean summary: strip, remove potential markdown/html if LLM added it
-        basic_summary = summary_response.text.strip()
-        basic_summary = re.sub(r"```[a-zA-Z]*\n.*?\n```", "", basic_summary, flags=re.DOTALL)
-        basic_summary = re.sub(r"<[^>]+>", "", basic_summary)
-        basic_summary = html.unescape(basic_summary).strip()
+        basic_summary = _clean_model_text(summary_response.text.strip())
         logger.debug(f"Generated basic summary for: {item_title}")
     else:
         logger.warning(f"Failed to generate basic summary for: {item_title}. Proceeding without it.")
         basic_summary = None # Use None if failed
 
+    return basic_summary
+
+async def _summarize_then_analyze(item_title, item_url, content_snippet, project_context, lite_model_name, analysis_model_name, concurrency=None):
+    """Two-call path: a basic summary from the lite model, then an analysis of it. Returns (summary, analysis_data)."""
+    # --- 1. Generate Basic Summary (Lite Model) ---
+    basic_summary = await _summarize_basic(item_title, item_url, content_snippet, lite_model_name, concurrency)
+
     # --- 2. Generate Deeper Analysis (Reasoning Model) ---
     logger.debug(f"Requesting analysis for: {item_title} using {analysis_model_name}")
-    analysis_prompt = ANALYSIS_PROMPT_TEMPLATE.format(
-        title=item_title,
-        url=item_url,
-        content_snippet=content_snippet,
-        basic_summary=basic_summary or "[Summary generation failed]",
-        project_context=project_context or "No project context provided." # Pass context (B.3)
+    analysis_prompt = _build_analysis_prompt(
+        item_title, item_url, content_snippet,
+        basic_summary or "[Summary generation failed]",
+        project_context or "No project context provided." # Pass context (B.3)
     )
-    analysis_response = _make_gemini_call_with_tracking(
+    analysis_response = await _make_gemini_call_with_tracking_async(
         model_name=analysis_model_name,
         prompt=analysis_prompt,
-        task_description=f"Deeper Analysis ({item_title[:30]}...)"
+        task_description=f"Deeper Analysis ({item_title[:30]}...)",
+        generation_config=_ANALYSIS_GENERATION_CONFIG,
+        concurrency=concurrency
     )
 
     analysis_data = {
@@ -147,16 +244,90 @@ def _process_single_item(item, config, project_context):
     if analysis_response and analysis_response.text:
         raw_analysis_text = analysis_response.text.strip()
         logger.debug(f"Raw analysis output for {item_title}: {raw_analysis_text[:200]}...")
-        # Extract each field using the helper
-        analysis_data['insight'] = _extract_analysis_field(raw_analysis_text, "💡 Key Technical Insight:")
-        analysis_data['angle'] = _extract_analysis_field(raw_analysis_text, "📊 The Competitive Angle:")
-        analysis_data['move'] = _extract_analysis_field(raw_analysis_text, "🚀 Your Potential Move:")
+        fields = _load_json_object(raw_analysis_text, item_title)
+        # Fall back to the labelled plain-text format if the model didn't answer in JSON
+        analysis_data = _analysis_from_json(fields) if fields is not None else _parse_analysis(raw_analysis_text)
         logger.debug(f"Parsed analysis for {item_title}: {analysis_data}")
     else:
         logger.warning(f"Failed to generate analysis for: {item_title}.")
         # analysis_data fields remain None
 
-    # --- 3. Combine into Structured Dictionary ---
+    return basic_summary, analysis_data
+
+async def _summarize_and_analyze_fused(item_title, item_url, content_snippet, project_context, analysis_model_name, concurrency=None):
+    """Single-call path: summary and analysis as one JSON response. Returns (summary, analysis_data)."""
+    logger.debug(f"Requesting summary and analysis for: {item_title} using {analysis_model_name}")
+    prompt = _build_combined_prompt(item_title, item_url, content_snippet, project_context or "No project context provided.")
+    response = await _make_gemini_call_with_tracking_async(
+        model_name=analysis_model_name,
+        prompt=prompt,
+        task_description=f"Summary & Analysis ({item_title[:30]}...)",
+        generation_config=_COMBINED_GENERATION_CONFIG,
+        concurrency=concurrency
+    )
+
+    analysis_data = {
+        'insight': None,
+        'angle': None,
+        'move': None
+    }
+    if not (response and response.text):
+        logger.warning(f"Failed to generate summary and analysis for: {item_title}.")
+        return None, analysis_data
+    fields = _load_json_object(response.text, item_title)
+    if fields is None:
+        return None, analysis_data
+
+    basic_summary = None
+    if isinstance(fields.get('summary'), str):
+        basic_summary = _clean_model_text(fields['summary']) or None
+    analysis_data = _analysis_from_json(fields)
+    logger.debug(f"Parsed summary and analysis for {item_title}: {analysis_data}")
+    return basic_summary, analysis_data
+
+async def _process_single_item_async(item, config, project_context, cache=None, concurrency=None):
+    """Generates summary & analysis for a single item, returning structured data.
+
+    With a SummaryCache, an item already summarized with the same snippet, models and project
+    context is served from it without calling Gemini. concurrency is the batch's
+    AdaptiveSemaphore, passed on to the Gemini calls.
+    """
+    gemini_config = config.get('gemini_models', {})
+    # Use 2.0 models as defaults, matching user preference and config (Model Reminder)
+    lite_model_name = gemini_config.get('FILTERING_MODEL', 'gemini-2.0-flash-lite') # Changed key name based on likely intent
+    analysis_model_name = gemini_config.get('ANALYSIS_MODEL', 'gemini-2.0-flash') # Changed key name based on likely intent
+
+    item_title = item.get('title', 'N/A')
+    item_url = item.get('url', 'N/A')
+    # B.4 - Capture source name if available for market pulse later
+    item_type = item.get('content_type', 'News') # Default to News
+    source_name = item.get('source_name', item_title) # Use title as fallback for source
+
+    # Prepare the snippet
+    content_snippet = item.get('justification', item.get('summary', NO_SNIPPET))
+    if len(content_snippet) > 2000: # Keep snippet reasonable for both models
+        content_snippet = content_snippet[:1997] + '...'
+
+    fused = gemini_config.get('fused', True)
+    cache_key = summary_key(item_url, content_snippet, lite_model_name, analysis_model_name, str(fused), project_context or "")
+    if cache is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Using cached summary and analysis for: {item_title}")
+            return cached
+
+    min_snippet_chars = config.get('min_snippet_chars_for_analysis', DEFAULT_MIN_SNIPPET_CHARS_FOR_ANALYSIS)
+    if not content_snippet or content_snippet == NO_SNIPPET or len(content_snippet) < min_snippet_chars:
+        # Nothing for the analysis model to work from; the lite model's summary is all we ask for
+        logger.info(f"Snippet too short for analysis, summarizing only: {item_title}")
+        basic_summary = await _summarize_basic(item_title, item_url, content_snippet or NO_SNIPPET, lite_model_name, concurrency)
+        analysis_data = {'insight': None, 'angle': None, 'move': None}
+    elif fused:
+        basic_summary, analysis_data = await _summarize_and_analyze_fused(item_title, item_url, content_snippet, project_context, analysis_model_name, concurrency)
+    else:
+        basic_summary, analysis_data = await _summarize_then_analyze(item_title, item_url, content_snippet, project_context, lite_model_name, analysis_model_name, concurrency)
+
+    # --- Combine into Structured Dictionary ---
     result_data = {
         'url': item_url,
         'title': item_title,
@@ -168,10 +339,31 @@ def _process_single_item(item, config, project_context):
         'source_name': source_name # B.4 / C.7 - Add source name to results
     }
 
+    # Failed generations aren't cached, so the item is tried again on the next run
+    if cache is not None and basic_summary is not None:
+        cache.put(cache_key, result_data)
+
     return result_data # Return dictionary
 
+def _relevance_score(item):
+    """An item's relevance_score as a number; 0 when missing or not numeric."""
+    try:
+        score = float(item.get('relevance_score', 0))
+    except (TypeError, ValueError):
+        return 0.0
+    return score if math.isfinite(score) else 0.0
+
+def _get_summary_cache(ttl_days):
+    """Returns the process's SummaryCache, creating it again only if the configured TTL changed."""
+    global _summary_cache, _summary_cache_ttl
+    with _summary_cache_lock:
+        if _summary_cache is None or _summary_cache_ttl != ttl_days:
+            _summary_cache = SummaryCache(ttl_days=ttl_days)
+            _summary_cache_ttl = ttl_days
+        return _summary_cache
+
 # Modified signature to accept project_context (C7)
-def summarize_and_analyze(items, config, project_context, num_news, num_tutorials, max_workers=3):
+def summarize_and_analyze(items, config, project_context, num_news, num_tutorials, max_workers=8):
     """Selects top items, generates summaries/analyses (as structured data), and separates them.
 
     Args:
@@ -180,7 +372,7 @@ def summarize_and_analyze(items, config, project_context, num_news, num_tutorial
         project_context: String containing the user's project context, or None.
         num_news: Max number of general news/research items to summarize.
         num_tutorials: Max number of tutorial items to summarize.
-        max_workers: Max concurrent API calls for summarization.
+        max_workers: Max items summarized concurrently (async calls, not threads).
 
     Returns:
         A tuple: (list_of_news_data, list_of_tutorial_data)
@@ -191,14 +383,13 @@ def summarize_and_analyze(items, config, project_context, num_news, num_tutorial
         logger.warning("No items provided for summarization.")
         return [], []
 
-    # Sort items by relevance score (descending)
-    # Ensure 'relevance_score' exists and is numeric, default to 0 if not
-    items.sort(key=lambda x: float(x.get('relevance_score', 0) if isinstance(x.get('relevance_score'), (int, float, str)) and str(x.get('relevance_score')).replace('.','',1).isdigit() else 0), reverse=True)
+    # Sort items by relevance score (descending); the key is computed once per item
+    items.sort(key=_relevance_score, reverse=True)
 
-    # Separate tutorials from other content
-    # Ensure 'content_type' exists
-    tutorial_items = [item for item in items if item.get('content_type') == 'Tutorial/Guide']
-    other_items = [item for item in items if item.get('content_type') != 'Tutorial/Guide']
+    # Separate tutorials from other content in one pass
+    tutorial_items, other_items = [], []
+    for item in items:
+        (tutorial_items if item.get('content_type') == 'Tutorial/Guide' else other_items).append(item)
 
     # Select top N news/research and top M tutorials
     selected_news = other_items[:num_news]
@@ -211,45 +402,37 @@ def summarize_and_analyze(items, config, project_context, num_news, num_tutorial
 
     logger.info(f"Summarizing/analyzing top {len(selected_news)} news/other items and {len(selected_tutorials)} tutorial items (generating structured data)...")
 
-    processed_results = {} # Store results keyed by URL: {dict_from__process_single_item}
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Pass config and project_context to the worker function (C7)
-        future_to_url = {
-            executor.submit(_process_single_item, item, config, project_context): item.get('url')
-            for item in items_to_process
-        }
-
-        for future in as_completed(future_to_url):
-            url = future_to_url[future]
-            if url is None: # Should not happen if items have URLs, but safety check
-                logger.warning("Future completed for an item without a URL.")
-                continue
-            try:
-                # Returns the full dictionary now
-                result_dict = future.result()
-                if result_dict:
-                    # Check if essential data is present before storing
-                    if result_dict.get('url') and result_dict.get('title'):
-                        processed_results[url] = result_dict
-                    else:
-                        logger.warning(f"Processed item for {url} missing essential keys (url/title). Skipping.")
-                else:
-                    # Worker function logs failures, but we note it here too
-                    logger.warning(f"Did not receive valid data dictionary for URL: {url}")
-            except Exception as exc:
-                logger.error(f"URL {url} generated an exception during processing future: {exc}", exc_info=True)
-
-    # Separate the generated dictionaries back into news and tutorials
-    news_data = [
-        processed_results[item['url']]
-        for item in selected_news
-        if item.get('url') in processed_results
-    ]
-    tutorial_data = [
-        processed_results[item['url']]
-        for item in selected_tutorials
-        if item.get('url') in processed_results
-    ]
+    cache = _get_summary_cache(config.get('summary_cache_ttl_days', DEFAULT_TTL_DAYS))
+    # Starts at max_workers; halved on 429 bursts and grown back as calls succeed
+    semaphore = AdaptiveSemaphore(max_workers)
+
+    async def _limited(item):
+        # One failing item must not take the rest of the batch down with it
+        try:
+            async with semaphore:
+                # Pass config and project_context to the worker function (C7)
+                return await _process_single_item_async(item, config, project_context, cache, semaphore)
+        except Exception as exc:
+            logger.error(f"URL {item.get('url')} generated an exception during processing: {exc}", exc_info=True)
+            return None
+
+    async def _process_all():
+        return await asyncio.gather(*(_limited(item) for item in items_to_process))
+
+    # Results come back in the order of items_to_process (news first, then tutorials), so
+    # each one goes straight into its output list
+    news_data, tutorial_data = [], []
+    for position, (item, result) in enumerate(zip(items_to_process, run_gemini_coroutine(_process_all()))):
+        url = item.get('url')
+        if url is None: # Should not happen if items have URLs, but safety check
+            logger.warning("Summarization finished for an item without a URL.")
+        elif not result:
+            # Worker function logs failures, but we note it here too
+            logger.warning(f"Did not receive valid data dictionary for URL: {url}")
+        elif result.get('url') and result.get('title'): # Check if essential data is present before storing
+            (news_data if position < len(selected_news) else tutorial_data).append(result)
+        else:
+            logger.warning(f"Processed item for {url} missing essential keys (url/title). Skipping.")
 
     logger.info(f"Generated structured data for {len(news_data)} news/other items and {len(tutorial_data)} tutorial items.")
 
@@ -0,0 +1,132 @@
+import json
+import zlib
+import sqlite3
+import hashlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = "summary_cache.sqlite3"
+DEFAULT_TTL_DAYS = 14
+
+def _sha1(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def summary_key(url, content_snippet, *parts):
+    """Cache key for an item's summary: its URL, a hash of its snippet and any other inputs (model names, context)."""
+    return _sha1("|".join((url, _sha1(content_snippet), *parts)))
+
+class SummaryCache:
+    """SQLite cache of per-item summary/analysis results, so items seen on a previous run aren't sent again.
+
+    Values are JSON-serializable dicts: the result dicts of summarization (also used, in its
+    own file, for generated tutorials), stored zlib-compressed. Entries older than ttl_days
+    are ignored and purged on open. With max_bytes, the least recently used entries are evicted
+    once the stored payloads exceed it. Like the response cache, a cache that can't be opened or
+    written disables itself with a warning rather than failing summarization.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, ttl_days=DEFAULT_TTL_DAYS, max_bytes=None):
+        self._path = path
+        self._ttl = ttl_days * 86400
+        self._enabled = ttl_days > 0
+        self._max_bytes = max_bytes
+        self._conn = None
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def _connection(self):
+        """Opens the database on first use; returns None when the cache is disabled. Call with the lock held."""
+        if self._conn is None and self._enabled:
+            try:
+                conn = sqlite3.connect(self._path, check_same_thread=False)
+                conn.execute("CREATE TABLE IF NOT EXISTS summaries ("
+                             "key TEXT PRIMARY KEY, payload BLOB, created_at INTEGER, last_used INTEGER)")
+                if 'last_used' not in {row[1] for row in conn.execute("PRAGMA table_info(summaries)")}:
+                    conn.execute("ALTER TABLE summaries ADD COLUMN last_used INTEGER") # Caches created before LRU eviction
+                conn.execute("DELETE FROM summaries WHERE created_at < ?", (int(time.time() - self._ttl),))
+                conn.commit()
+                self._conn = conn
+            except sqlite3.Error as e:
+                self._disable(e)
+        return self._conn
+
+    def _disable(self, error):
+        logger.warning(f"Summary cache error in {self._path} ({error}). Disabling this cache for the run.")
+        self._enabled = False
+        self._conn = None
+
+    def get(self, key):
+        """Returns the cached result dict for key if a fresh one is stored, else None."""
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute("SELECT payload FROM summaries WHERE key = ? AND created_at >= ?",
+                                   (key, int(time.time() - self._ttl))).fetchone()
+                if row and self._max_bytes:
+                    conn.execute("UPDATE summaries SET last_used = ? WHERE key = ?", (int(time.time()), key))
+                    conn.commit()
+            except sqlite3.Error as e:
+                self._disable(e)
+                return None
+            if row:
+                self._hits += 1
+            else:
+                self._misses += 1
+        if not row:
+            return None
+        payload = row[0]
+        if isinstance(payload, bytes): # Rows written before compression are plain JSON text
+            payload = zlib.decompress(payload)
+        return json.loads(payload)
+
+    def put(self, key, result_data):
+        """Stores a result dict under key."""
+        payload = zlib.compress(json.dumps(result_data).encode('utf-8'))
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return
+            try:
+                now = int(time.time())
+                conn.execute("INSERT OR REPLACE INTO summaries (key, payload, created_at, last_used) VALUES (?, ?, ?, ?)",
+                             (key, payload, now, now))
+                if self._max_bytes:
+                    self._evict(conn)
+                conn.commit()
+            except sqlite3.Error as e:
+                self._disable(e)
+
+    def _evict(self, conn):
+        """Deletes least recently used entries until the payloads fit in max_bytes. Call with the lock held."""
+        total = conn.execute("SELECT COALESCE(SUM(LENGTH(payload)), 0) FROM summaries").fetchone()[0]
+        if total <= self._max_bytes:
+            return
+        evicted = []
+        for key, size in conn.execute("SELECT key, LENGTH(payload) FROM summaries "
+                                      "ORDER BY COALESCE(last_used, created_at)").fetchall():
+            if total <= self._max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM summaries WHERE key = ?", evicted)
+        logger.info(f"Evicted {len(evicted)} least recently used entries from {self._path}.")
+
+    def stats(self):
+        """Returns this run's hits and misses, and the number and total payload bytes of stored entries."""
+        with self._lock:
+            stats = {'hits': self._hits, 'misses': self._misses, 'entries': 0, 'bytes': 0}
+            conn = self._connection()
+            if conn is None:
+                return stats
+            try:
+                stats['entries'], stats['bytes'] = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM summaries").fetchone()
+            except sqlite3.Error as e:
+                self._disable(e)
+            return stats
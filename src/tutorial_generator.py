@@ -1,37 +1,157 @@
-import google.generativeai as genai
+import json
 import logging
-import random
+import os
+import re
 from textwrap import dedent
-import time
-import json # Added for example usage
-import os # Added for example usage
+import hashlib
+import functools
+import math
+import operator
+import threading
+from collections import deque
 
-# Import the centralized Gemini call function and token tracking
-from src.processing import _make_gemini_call_with_tracking
+from src.summary_cache import SummaryCache
 
 logger = logging.getLogger(__name__)
 
+# --- Tutorial Cache ---
+# Generated tutorials, keyed by sha256 of (model, prompt template, normalized topic): the same topic on the same model
+# is served from here until it expires (tutorial_cache_ttl_days) instead of regenerated.
+# Least recently used tutorials are evicted past tutorial_cache_max_mb
+TUTORIAL_CACHE_PATH = "tutorial_cache.sqlite3"
+DEFAULT_TUTORIAL_CACHE_TTL_DAYS = 30
+DEFAULT_TUTORIAL_CACHE_MAX_MB = 50
+_tutorial_cache = None
+_tutorial_cache_settings = None
+_tutorial_cache_lock = threading.Lock()
+
+def _get_tutorial_cache(ttl_days, max_mb):
+    """Returns the process's tutorial cache, creating it again only if the configured TTL or size changed."""
+    global _tutorial_cache, _tutorial_cache_settings
+    with _tutorial_cache_lock:
+        if _tutorial_cache is None or _tutorial_cache_settings != (ttl_days, max_mb):
+            _tutorial_cache = SummaryCache(path=TUTORIAL_CACHE_PATH, ttl_days=ttl_days,
+                                           max_bytes=int(max_mb * 1024 * 1024) if max_mb else None)
+            _tutorial_cache_settings = (ttl_days, max_mb)
+        return _tutorial_cache
+
+def get_tutorial_cache_stats():
+    """Returns the tutorial cache's hits/misses this run and its stored entries/bytes, or None before first use."""
+    with _tutorial_cache_lock:
+        cache = _tutorial_cache
+    return cache.stats() if cache is not None else None
+
+# --- Semantic Tutorial Cache ---
+# Optional (tutorial_semantic_cache.enabled): a topic whose embedding is close enough to an
+# earlier topic's ("Intro to LangGraph" vs "LangGraph basics") reuses that topic's cached
+# tutorial. Embeddings are kept as one index entry per model in the tutorial cache
+DEFAULT_EMBEDDING_MODEL = 'models/text-embedding-004'
+DEFAULT_SIMILARITY_THRESHOLD = 0.92
+_EMBEDDING_DIMENSIONS = 256 # Plenty for short topic strings, and keeps the index small
+_index_lock = threading.Lock()
+
+def _embed_topic(topic, embedding_model):
+    """Returns the topic's embedding, or None if the embedding call fails."""
+    import google.generativeai as genai # Imported on use: topic selection alone shouldn't pay for the Gemini SDK
+    try:
+        result = genai.embed_content(model=embedding_model, content=topic, output_dimensionality=_EMBEDDING_DIMENSIONS)
+        return result['embedding']
+    except Exception as e:
+        logger.warning(f"Could not embed tutorial topic '{topic}' ({e}). Skipping the semantic tutorial cache.")
+        return None
+
+def _normalize(vector):
+    """Scales vector to unit length, so the dot product of two normalized vectors is their cosine similarity."""
+    norm = math.sqrt(sum(x * x for x in vector))
+    return [x / norm for x in vector] if norm else vector
+
+def _find_similar_tutorial(tutorial_cache, index_key, embedding, threshold):
+    """Returns (topic, cached tutorial) for the most similar indexed topic at or above threshold, else None."""
+    index = tutorial_cache.get(index_key) or {'entries': []}
+    query = _normalize(embedding)
+    best_score, best_entry = 0.0, None
+    for entry in index['entries']: # Indexed embeddings are stored normalized
+        score = sum(map(operator.mul, query, entry['embedding']))
+        if score > best_score:
+            best_score, best_entry = score, entry
+    if best_entry is None or best_score < threshold:
+        return None
+    cached = tutorial_cache.get(best_entry['cache_key'])
+    if cached is None: # The tutorial itself expired
+        return None
+    logger.debug(f"Closest cached tutorial topic: {best_entry['topic']} (similarity {best_score:.3f})")
+    return best_entry['topic'], cached
+
+def _index_tutorial(tutorial_cache, index_key, topic, cache_key, embedding):
+    """Adds a newly generated tutorial's topic embedding to the index, replacing any entry for the same topic."""
+    with _index_lock: # Read-modify-write: concurrent generations would otherwise drop each other's entries
+        index = tutorial_cache.get(index_key) or {'entries': []}
+        entries = [entry for entry in index['entries'] if _normalize_topic(entry['topic']) != _normalize_topic(topic)]
+        entries.append({'topic': topic, 'cache_key': cache_key, 'embedding': _normalize(embedding)})
+        tutorial_cache.put(index_key, {'entries': entries})
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+def _normalize_topic(topic):
+    """Case- and whitespace-insensitive form of a topic ("LangGraph Basics " -> "langgraph basics"), for cache lookups."""
+    return _WHITESPACE_RE.sub(' ', topic.strip().lower())
+
 # --- State for Topic Rotation ---
-# In a more robust system, this state might be stored externally (db, file)
-_tutorial_topics = []
-_current_topic_index = 0
+# The next topic is always at the front; selecting one rotates it to the back. The last topic
+# sent is saved to a small JSON file, so separate runs (run_mode: once) carry on the rotation
+# instead of starting over at the first topic
+TUTORIAL_STATE_FILE = "data/tutorial_state.json"
+_tutorial_topics = deque()
+_topics_lock = threading.Lock()
+
+def _load_last_topic(filepath):
+    """Returns the last sent topic recorded in filepath, or None."""
+    if not filepath or not os.path.exists(filepath):
+        return None
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return json.load(f).get('last_topic')
+    except Exception as e:
+        logger.error(f"Error loading tutorial rotation state from {filepath}: {e}")
+        return None
+
+def load_tutorial_topics(initial_topics, state_filepath=None):
+    """Initializes the list of tutorial topics, dropping case/whitespace variants of a topic already listed.
 
-def load_tutorial_topics(initial_topics):
-    """Initializes the list of tutorial topics."""
-    global _tutorial_topics, _current_topic_index
-    _tutorial_topics = initial_topics[:]
-    _current_topic_index = 0
-    logger.info(f"Loaded tutorial topics: {_tutorial_topics}")
+    With state_filepath, the rotation continues after the last topic saved by save_tutorial_rotation.
+    """
+    unique_topics = {}
+    for topic in initial_topics:
+        unique_topics.setdefault(_normalize_topic(topic), topic)
+    last_topic = _load_last_topic(state_filepath)
+    with _topics_lock:
+        _tutorial_topics.clear()
+        _tutorial_topics.extend(unique_topics.values())
+        if last_topic is not None:
+            keys = list(unique_topics)
+            last_key = _normalize_topic(last_topic)
+            if last_key in unique_topics:
+                _tutorial_topics.rotate(-(keys.index(last_key) + 1))
+    logger.info(f"Loaded tutorial topics: {list(_tutorial_topics)}")
+
+def save_tutorial_rotation(topic, filepath=TUTORIAL_STATE_FILE):
+    """Records topic as the last one sent, so the next run's rotation starts after it."""
+    try:
+        if os.path.dirname(filepath):
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump({'last_topic': topic}, f)
+    except Exception as e:
+        logger.error(f"Error saving tutorial rotation state to {filepath}: {e}")
 
 def select_tutorial_topic():
     """Selects the next tutorial topic from the list (simple rotation)."""
-    global _current_topic_index
-    if not _tutorial_topics:
-        logger.warning("No tutorial topics loaded or available.")
-        return None
-
-    selected_topic = _tutorial_topics[_current_topic_index]
-    _current_topic_index = (_current_topic_index + 1) % len(_tutorial_topics) # Rotate index
+    with _topics_lock:
+        if not _tutorial_topics:
+            logger.warning("No tutorial topics loaded or available.")
+            return None
+        selected_topic = _tutorial_topics[0]
+        _tutorial_topics.rotate(-1)
     logger.info(f"Selected tutorial topic: {selected_topic}")
     return selected_topic
 
@@ -67,18 +187,59 @@ TUTORIAL_GENERATION_PROMPT_TEMPLATE = dedent(r"""
     **Generate the HTML tutorial now:**
 """)
 
+@functools.lru_cache(maxsize=64)
+def _build_prompt(topic):
+    """Formats the tutorial prompt for a topic. Memoized: topics come from a short rotating list."""
+    return TUTORIAL_GENERATION_PROMPT_TEMPLATE.format(topic=topic)
+
+# Part of every cache key, so editing the prompt template invalidates tutorials generated from the old one
+_TEMPLATE_HASH = hashlib.sha256(TUTORIAL_GENERATION_PROMPT_TEMPLATE.encode('utf-8')).hexdigest()
+
 # Modified signature to accept config
-def generate_tutorial(topic, config):
-    """Generates an HTML tutorial for the given topic using the configured Gemini model."""
+def generate_tutorial(topic, config, cache=True):
+    """Generates an HTML tutorial for the given topic using the configured Gemini model.
+
+    A tutorial generated earlier for the same topic and model is returned from the tutorial
+    cache, as is one for a similar topic when the semantic cache is enabled; cache=False
+    forces a new one (which then replaces the cached tutorial). The tutorial cache is the only
+    cache involved: the Gemini response cache is bypassed, so a tutorial isn't stored twice.
+    """
     if not topic:
         logger.error("No topic provided for tutorial generation.")
         return None
 
+    # Import the centralized Gemini call function here, so importing this module for topic
+    # selection alone doesn't load processing and the Gemini SDK
+    from src.processing import _make_gemini_call_with_tracking
+
     # Get the model name from config
     gemini_config = config.get('gemini_models', {})
     model_name = gemini_config.get('TUTORIAL_MODEL', 'gemini-2.0-flash') # Default fallback
 
-    prompt = TUTORIAL_GENERATION_PROMPT_TEMPLATE.format(topic=topic)
+    prompt = _build_prompt(topic)
+    tutorial_cache = _get_tutorial_cache(config.get('tutorial_cache_ttl_days', DEFAULT_TUTORIAL_CACHE_TTL_DAYS),
+                                         config.get('tutorial_cache_max_mb', DEFAULT_TUTORIAL_CACHE_MAX_MB))
+    # The prompt keeps the topic's own casing; cache keys and embeddings use its normalized form
+    normalized_topic = _normalize_topic(topic)
+    cache_key = hashlib.sha256(f"{model_name}\n{_TEMPLATE_HASH}\n{normalized_topic}".encode('utf-8')).hexdigest()
+    if cache:
+        cached = tutorial_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Using cached tutorial for topic: {topic}")
+            return cached['html']
+
+    semantic_config = config.get('tutorial_semantic_cache', {})
+    embedding = None
+    if semantic_config.get('enabled', False):
+        index_key = f"topic_index:{model_name}"
+        embedding = _embed_topic(normalized_topic, semantic_config.get('embedding_model', DEFAULT_EMBEDDING_MODEL))
+        if embedding is not None and cache:
+            similar = _find_similar_tutorial(tutorial_cache, index_key, embedding,
+                                             semantic_config.get('similarity_threshold', DEFAULT_SIMILARITY_THRESHOLD))
+            if similar is not None:
+                logger.info(f"Using cached tutorial for similar topic '{similar[0]}' for topic: {topic}")
+                return similar[1]['html']
+
     logger.info(f"Requesting tutorial generation for topic: {topic} using {model_name}")
 
     # Use the centralized call function
@@ -87,7 +248,8 @@ def generate_tutorial(topic, config):
     response = _make_gemini_call_with_tracking(
         model_name=model_name,
         prompt=prompt,
-        task_description=f"Tutorial Generation ({topic})"
+        task_description=f"Tutorial Generation ({topic})",
+        use_cache=False # Stored in the tutorial cache below instead
         # retries=3, delay=10 # Can potentially override defaults here if needed
     )
 
@@ -97,11 +259,16 @@ def generate_tutorial(topic, config):
 
     tutorial_html = response.text
     logger.info(f"Successfully generated tutorial for topic: {topic}")
+    tutorial_cache.put(cache_key, {'topic': topic, 'model': model_name, 'html': tutorial_html})
+    if embedding is not None:
+        _index_tutorial(tutorial_cache, index_key, topic, cache_key, embedding)
     # logger.debug(f"Generated tutorial HTML (start):\n{tutorial_html[:500]}...")
     return tutorial_html
 
 # --- Example Usage (for testing) ---
 if __name__ == '__main__':
+    import json
+    import os
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(name)s - %(message)s')
 
     # Load config
@@ -167,4 +334,9 @@ if __name__ == '__main__':
     # Print final token counts for the test run
     final_counts = get_token_counts()
     print("\n--- Token Counts for Test Run ---")
-    print(json.dumps(final_counts, indent=2)) 
\ No newline at end of file
+    print(json.dumps(final_counts, indent=2))
+
+    cache_stats = get_tutorial_cache_stats()
+    if cache_stats:
+        print("\n--- Tutorial Cache Stats ---")
+        print(json.dumps(cache_stats, indent=2)) 
\ No newline at end of file
@@ -0,0 +1,53 @@
+import pytest
+
+from src import config_loader
+from src.config_loader import load_config
+
+@pytest.fixture
+def fresh_config(monkeypatch, tmp_path):
+    """Loads config from an empty directory with a controlled environment, restoring the cache afterwards."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config_loader, '_DOTENV_PATH', '')
+    for name in ('REDIS_URL', 'REDIS_HOST', 'REDIS_PORT', 'MAIL_DRY_RUN'):
+        monkeypatch.delenv(name, raising=False)
+    config_loader._load_config.cache_clear()
+    yield tmp_path
+    config_loader._load_config.cache_clear()
+
+def test_redis_settings_come_from_the_environment(monkeypatch, fresh_config):
+    monkeypatch.setenv('REDIS_HOST', 'cache.internal')
+    monkeypatch.setenv('REDIS_PORT', '6380')
+
+    config = load_config()
+
+    assert config.get('redis_url') is None
+    assert config['redis_host'] == 'cache.internal'
+    assert config['redis_port'] == 6380
+
+def test_redis_settings_come_from_config_yaml(fresh_config):
+    (fresh_config / 'config.yaml').write_text('redis_url: redis://cache.internal:6379/0\n')
+
+    config = load_config()
+
+    assert config['redis_url'] == 'redis://cache.internal:6379/0'
+    assert config['redis_port'] == 6379
+
+@pytest.mark.parametrize('value, expected', [('1', True), ('yes', True), ('0', False), ('false', False), ('', False)])
+def test_mail_dry_run_is_parsed_as_a_flag(monkeypatch, fresh_config, value, expected):
+    monkeypatch.setenv('MAIL_DRY_RUN', value)
+
+    assert load_config()['email_config']['dry_run'] is expected
+
+def test_dry_run_can_be_set_in_config_yaml(fresh_config):
+    (fresh_config / 'config.yaml').write_text('email_config:\n  dry_run: true\n')
+
+    assert load_config()['email_config']['dry_run'] is True
+
+def test_default_and_explicit_paths_share_one_cached_config(fresh_config):
+    (fresh_config / 'config.yaml').write_text('num_news_items_to_summarize: 3\n')
+
+    config = load_config()
+
+    assert load_config('config.yaml') is config
+    assert load_config(str(fresh_config / 'config.yaml')) is config
+    assert load_config() is config
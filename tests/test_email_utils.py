@@ -0,0 +1,338 @@
+import smtplib
+import socket
+import sys
+import threading
+
+import pytest
+
+import src.email_utils as email_utils
+from src.config_loader import SmtpConfig
+
+class StubSMTPServer:
+    """Minimal ESMTP server on localhost that records delivered messages.
+
+    RCPT TO for an address in `refuse` gets a 550; with drop_after_data the connection is
+    closed once the message data has been received, without a reply. Any AUTH succeeds.
+    """
+
+    def __init__(self, pipelining=True, refuse=(), drop_after_data=False):
+        self.pipelining = pipelining
+        self.refuse = set(refuse)
+        self.drop_after_data = drop_after_data
+        self.messages = [] # (mail_from, rcpt_tos, data)
+        self._sock = socket.create_server(('127.0.0.1', 0))
+        self.host, self.port = self._sock.getsockname()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._sock.close()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        with conn, conn.makefile('rb') as reader:
+            def reply(text):
+                conn.sendall(text.encode() + b'\r\n')
+
+            reply('220 stub ESMTP')
+            mail_from, rcpt_tos = None, []
+            for raw in reader:
+                line = raw.decode().rstrip('\r\n')
+                verb = line.split(' ', 1)[0].upper()
+                if verb == 'EHLO':
+                    extensions = ['stub', 'AUTH PLAIN LOGIN'] + (['PIPELINING'] if self.pipelining else [])
+                    reply('\r\n'.join(f'250-{extension}' for extension in extensions))
+                    reply('250 SIZE 1000000')
+                elif verb == 'AUTH':
+                    reply('235 Authentication successful')
+                elif verb == 'MAIL':
+                    mail_from, rcpt_tos = line[10:].split(' ', 1)[0], []
+                    reply('250 OK')
+                elif verb == 'RCPT':
+                    address = line[8:].split(' ', 1)[0].strip('<>')
+                    if address in self.refuse:
+                        reply('550 No such user')
+                    else:
+                        rcpt_tos.append(address)
+                        reply('250 OK')
+                elif verb == 'DATA':
+                    if not rcpt_tos:
+                        reply('554 No valid recipients')
+                        continue
+                    reply('354 End data with <CR><LF>.<CR><LF>')
+                    data = []
+                    for data_line in reader:
+                        if data_line == b'.\r\n':
+                            break
+                        data.append(data_line[1:] if data_line.startswith(b'.') else data_line)
+                    self.messages.append((mail_from, rcpt_tos, b''.join(data)))
+                    if self.drop_after_data:
+                        return
+                    reply('250 Queued')
+                elif verb in ('RSET', 'NOOP'):
+                    reply('250 OK')
+                elif verb == 'QUIT':
+                    reply('221 Bye')
+                    return
+                else:
+                    reply('502 Not implemented')
+
+@pytest.fixture
+def stub_server():
+    servers = []
+
+    def start(**options):
+        server = StubSMTPServer(**options)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+@pytest.fixture(autouse=True)
+def empty_pool():
+    """Keeps pooled sessions from leaking between tests."""
+    email_utils._thread_pool().clear()
+    yield
+    pool = email_utils._thread_pool()
+    while pool:
+        pool.popitem()[1].close()
+
+def _smtp_config(stub):
+    return SmtpConfig(sender='sender@example.com', recipient='reader@example.com', username='sender@example.com',
+                      password='secret', host=stub.host, port=stub.port, timeout=5)
+
+def _message():
+    return email_utils.render_digest_mime('Digest', '<p>Hello</p>', 'sender@example.com')
+
+def _recipients(stub):
+    return [rcpt_tos for _, rcpt_tos, _ in stub.messages]
+
+@pytest.fixture
+def plain_connections(monkeypatch):
+    """Opens unauthenticated, unencrypted connections to the stub server; records each one."""
+    opened = []
+
+    def open_smtp(smtp):
+        server = smtplib.SMTP(smtp.host, smtp.port, timeout=smtp.timeout)
+        opened.append(server)
+        return server
+
+    monkeypatch.setattr(email_utils, '_open_smtp', open_smtp)
+    return opened
+
+def test_send_email_reads_the_provider_case_insensitively(monkeypatch):
+    monkeypatch.setattr(email_utils, '_dry_run_enabled', lambda: False)
+    sent = []
+    monkeypatch.setitem(email_utils._EMAIL_SENDERS, 'smtp', lambda *args: sent.append(args) or True)
+
+    assert email_utils.send_email('Digest', '<p>Hello</p>', {'email_provider': ' SMTP '}) is True
+    assert len(sent) == 1
+
+def test_send_email_rejects_an_unknown_provider(monkeypatch):
+    monkeypatch.setattr(email_utils, '_dry_run_enabled', lambda: False)
+
+    assert email_utils.send_email('Digest', '<p>Hello</p>', {'email_provider': 'carrier-pigeon'}) is False
+
+def test_dry_run_writes_the_email_instead_of_sending_it(monkeypatch, tmp_path):
+    monkeypatch.setattr(email_utils, '_dry_run_enabled', lambda: True)
+    monkeypatch.setattr(email_utils, '_DRY_RUN_DIR', tmp_path)
+    monkeypatch.setitem(email_utils._EMAIL_SENDERS, 'smtp', pytest.fail)
+
+    assert email_utils.send_email('Digest', '<p>Hello</p>', {'sender_email': 'sender@example.com',
+                                                             'recipient_email': 'reader@example.com'}) is True
+    [eml] = tmp_path.glob('*.eml')
+    assert b'To: reader@example.com' in eml.read_bytes()
+
+# --- Persistent sessions ---
+
+def test_send_batch_sends_every_message_over_one_session(stub_server, plain_connections):
+    stub = stub_server()
+    envelopes = [(['a@example.com'], _message()), (['b@example.com'], _message())]
+
+    result = email_utils._send_batch(_smtp_config(stub), envelopes, 2)
+
+    assert result == email_utils.BatchResult(2, 0)
+    assert len(plain_connections) == 1
+    assert _recipients(stub) == [['a@example.com'], ['b@example.com']]
+
+def test_pooled_session_is_reused_across_batches(stub_server, plain_connections):
+    stub = stub_server()
+    smtp = _smtp_config(stub)
+
+    email_utils._send_batch(smtp, [(['a@example.com'], _message())], 1)
+    email_utils._send_batch(smtp, [(['b@example.com'], _message())], 1)
+
+    assert len(plain_connections) == 1
+    assert len(stub.messages) == 2
+
+def test_send_batch_reconnects_once_after_a_disconnect(stub_server, plain_connections, monkeypatch):
+    stub = stub_server()
+    real_send = email_utils._pipelined_send
+    attempts = []
+
+    def flaky_send(server, from_addr, to_addrs, msg):
+        attempts.append(to_addrs)
+        if len(attempts) == 1:
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        return real_send(server, from_addr, to_addrs, msg)
+
+    monkeypatch.setattr(email_utils, '_pipelined_send', flaky_send)
+    result = email_utils._send_batch(_smtp_config(stub), [(['a@example.com'], _message())], 1)
+
+    assert result == email_utils.BatchResult(1, 0)
+    assert len(plain_connections) == 2
+    assert len(stub.messages) == 1
+
+def test_send_email_smtp_fails_without_a_parseable_recipient(monkeypatch):
+    monkeypatch.setattr(email_utils, '_send_digest', pytest.fail)
+    config = {'sender_email': 'sender@example.com', 'recipient_email': ' , ', 'smtp_server': 'localhost',
+              'smtp_port': 587, 'smtp_password': 'secret'}
+
+    assert email_utils.send_email_smtp('Digest', '<p>Hello</p>', config) is False
+
+# --- Pipelining ---
+
+MESSAGE = b'Subject: Digest\r\n\r\nHello\r\n.leading dot\r\n'
+
+@pytest.mark.parametrize('pipelining', [True, False])
+def test_pipelined_send_delivers_the_message(stub_server, pipelining):
+    stub = stub_server(pipelining=pipelining)
+    with smtplib.SMTP(stub.host, stub.port, timeout=5) as server:
+        refused = email_utils._pipelined_send(server, 'sender@example.com', ['reader@example.com'], MESSAGE)
+
+    assert refused == {}
+    assert stub.messages == [('<sender@example.com>', ['reader@example.com'], MESSAGE)]
+
+@pytest.mark.parametrize('pipelining', [True, False])
+def test_pipelined_send_reports_refused_recipients(stub_server, pipelining):
+    stub = stub_server(pipelining=pipelining, refuse={'gone@example.com'})
+    with smtplib.SMTP(stub.host, stub.port, timeout=5) as server:
+        refused = email_utils._pipelined_send(server, 'sender@example.com',
+                                              ['reader@example.com', 'gone@example.com'], MESSAGE)
+
+    assert refused == {'gone@example.com': (550, b'No such user')}
+    assert _recipients(stub) == [['reader@example.com']]
+
+@pytest.mark.parametrize('pipelining', [True, False])
+def test_pipelined_send_raises_when_every_recipient_is_refused(stub_server, pipelining):
+    stub = stub_server(pipelining=pipelining, refuse={'gone@example.com'})
+    with smtplib.SMTP(stub.host, stub.port, timeout=5) as server:
+        with pytest.raises(smtplib.SMTPRecipientsRefused) as excinfo:
+            email_utils._pipelined_send(server, 'sender@example.com', ['gone@example.com'], MESSAGE)
+        # The session is reset and stays usable for the next message
+        assert server.noop()[0] == 250
+
+    assert excinfo.value.recipients == {'gone@example.com': (550, b'No such user')}
+    assert stub.messages == []
+
+# --- Async fan-out ---
+
+def test_async_fan_out_sends_one_message_per_recipient(stub_server):
+    pytest.importorskip('aiosmtplib')
+    stub = stub_server()
+    recipients = [f'reader{n}@example.com' for n in range(5)]
+
+    result = email_utils.send_digest_concurrently('Digest', '<p>Hello</p>', recipients, _smtp_config(stub),
+                                                  max_connections=3)
+
+    assert result == email_utils.BatchResult(5, 0)
+    assert sorted(rcpt_to for rcpt_tos in _recipients(stub) for rcpt_to in rcpt_tos) == recipients
+
+def test_async_fan_out_counts_recipients_as_failed_when_no_worker_connects():
+    pytest.importorskip('aiosmtplib')
+    with socket.create_server(('127.0.0.1', 0)) as sock:
+        host, port = sock.getsockname()
+    smtp = SmtpConfig(sender='sender@example.com', recipient='reader@example.com', username='sender@example.com',
+                      password='secret', host=host, port=port, timeout=5)
+
+    result = email_utils.send_digest_concurrently('Digest', '<p>Hello</p>', ['a@example.com', 'b@example.com'], smtp)
+
+    assert result == email_utils.BatchResult(0, 2, aborted=True)
+
+def test_async_fan_out_without_aiosmtplib_reports_every_recipient_failed(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'aiosmtplib', None)
+
+    result = email_utils.send_digest_concurrently('Digest', '<p>Hello</p>', ['a@example.com'], {})
+
+    assert result == email_utils.BatchResult(0, 1)
+
+# --- Failure threshold ---
+
+def test_send_batch_counts_refusals_and_continues(stub_server, plain_connections):
+    stub = stub_server(refuse={'gone@example.com'})
+    envelopes = [(['gone@example.com'], _message()), (['b@example.com'], _message())]
+
+    result = email_utils._send_batch(_smtp_config(stub), envelopes, 2)
+
+    assert result == email_utils.BatchResult(1, 1)
+    assert _recipients(stub) == [['b@example.com']]
+
+def test_send_batch_aborts_once_a_third_of_a_large_batch_failed(stub_server, plain_connections):
+    stub = stub_server(refuse={'gone@example.com'})
+    total = email_utils._ABORT_MIN_BATCH
+    envelopes = [(['gone@example.com'], _message()) for _ in range(total)]
+
+    result = email_utils._send_batch(_smtp_config(stub), envelopes, total)
+
+    assert result == email_utils.BatchResult(0, total // 3, aborted=True)
+
+def test_send_batch_stops_on_authentication_failure(stub_server, monkeypatch):
+    stub = stub_server()
+
+    def open_smtp(smtp):
+        raise smtplib.SMTPAuthenticationError(535, b'Bad credentials')
+
+    monkeypatch.setattr(email_utils, '_open_smtp', open_smtp)
+    envelopes = [([f'{n}@example.com'], _message()) for n in range(3)]
+
+    result = email_utils._send_batch(_smtp_config(stub), envelopes, 3)
+
+    assert result == email_utils.BatchResult(0, 1, aborted=True)
+    assert stub.messages == []
+
+# --- Resends ---
+
+@pytest.mark.parametrize('pipelining', [True, False])
+def test_pipelined_send_flags_a_connection_lost_after_the_data(stub_server, pipelining):
+    stub = stub_server(pipelining=pipelining, drop_after_data=True)
+    with smtplib.SMTP(stub.host, stub.port, timeout=5) as server:
+        with pytest.raises(email_utils._DeliveryUncertain):
+            email_utils._pipelined_send(server, 'sender@example.com', ['reader@example.com'], MESSAGE)
+
+    assert len(stub.messages) == 1
+
+def test_send_batch_retry_resends_the_same_bytes(stub_server, plain_connections, monkeypatch):
+    stub = stub_server()
+    payloads = []
+    real_send = email_utils._pipelined_send
+
+    def flaky_send(server, from_addr, to_addrs, msg):
+        payloads.append(msg)
+        if len(payloads) == 1:
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        return real_send(server, from_addr, to_addrs, msg)
+
+    monkeypatch.setattr(email_utils, '_pipelined_send', flaky_send)
+    email_utils._send_batch(_smtp_config(stub), [(['a@example.com'], _message())], 1)
+
+    assert len(payloads) == 2
+    assert payloads[0] is payloads[1]
+
+def test_send_batch_does_not_resend_after_the_data_was_sent(stub_server, plain_connections):
+    stub = stub_server(drop_after_data=True)
+    envelopes = [(['a@example.com'], _message()), (['b@example.com'], _message())]
+
+    result = email_utils._send_batch(_smtp_config(stub), envelopes, 2)
+
+    # Both messages reached the server exactly once, but neither was confirmed
+    assert result == email_utils.BatchResult(0, 2)
+    assert _recipients(stub) == [['a@example.com'], ['b@example.com']]
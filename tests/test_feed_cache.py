@@ -0,0 +1,85 @@
+import time
+
+from src.feed_cache import FeedCache, _REDIS_KEY_PREFIX
+from src.ingestion import FeedItem
+
+class FakeRedis:
+    """Just enough of redis.Redis for FeedCache: hashes, pipelines and delete."""
+
+    def __init__(self):
+        self.hashes = {}
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def pipeline(self):
+        return self
+
+    def hset(self, key, mapping):
+        self.hashes[key] = {name.encode(): value.encode() if isinstance(value, str) else value
+                            for name, value in mapping.items()}
+
+    def expire(self, key, seconds):
+        pass
+
+    def execute(self):
+        pass
+
+    def delete(self, key):
+        self.hashes.pop(key, None)
+
+def _redis_cache():
+    redis = FakeRedis()
+    cache = FeedCache(encode_item=FeedItem.as_dict, decode_item=FeedItem.from_dict)
+    cache._redis = redis
+    cache._redis_checked = True
+    return cache, redis
+
+def _item():
+    published = time.gmtime(1_700_000_000)
+    return FeedItem(title='A model', link='https://example.com/a', published=published,
+                    published_epoch=1_700_000_000.0, summary='An AI summary',
+                    source_feed='https://example.com/feed', id='a')
+
+def test_items_round_trip_through_redis_as_json():
+    cache, redis = _redis_cache()
+    cache.put('https://example.com/feed', 123.0, {'items': [_item()], 'etag': '"v1"', 'modified': None})
+    cache._memory.clear() # Force the read to come from Redis
+
+    fetched_at, data = cache.get('https://example.com/feed')
+
+    assert fetched_at == 123.0
+    assert data['items'] == [_item()]
+    assert data['items'][0].published == _item().published
+    assert data['etag'] == '"v1"'
+    assert data['modified'] is None
+    assert redis.hashes[_REDIS_KEY_PREFIX + 'https://example.com/feed'][b'items'].startswith(b'[')
+
+def test_corrupt_items_are_discarded_as_a_miss():
+    cache, redis = _redis_cache()
+    cache.put('https://example.com/feed', 123.0, {'items': [_item()]})
+    cache._memory.clear()
+    redis.hashes[_REDIS_KEY_PREFIX + 'https://example.com/feed'][b'items'] = b'\x80\x04not json'
+
+    assert cache.get('https://example.com/feed') is None
+    assert _REDIS_KEY_PREFIX + 'https://example.com/feed' not in redis.hashes
+
+def test_partial_entry_without_fetched_at_is_discarded():
+    cache, redis = _redis_cache()
+    redis.hashes[_REDIS_KEY_PREFIX + 'https://example.com/feed'] = {b'items': b'[]', b'etag': b'"v1"'}
+
+    assert cache.get('https://example.com/feed') is None
+    assert _REDIS_KEY_PREFIX + 'https://example.com/feed' not in redis.hashes
+
+def test_item_with_missing_fields_is_discarded():
+    cache, redis = _redis_cache()
+    redis.hashes[_REDIS_KEY_PREFIX + 'https://example.com/feed'] = {
+        b'items': b'[{"title": "no link"}]', b'fetched_at': b'123.0'}
+
+    assert cache.get('https://example.com/feed') is None
+
+def test_memory_entries_expire_after_ttl():
+    cache = FeedCache(ttl=60)
+    cache.put('https://example.com/feed', time.time() - 120, {'items': []})
+
+    assert cache.get('https://example.com/feed') is None
@@ -0,0 +1,169 @@
+import datetime
+from types import SimpleNamespace
+
+import pytest
+
+import src.ingestion as ingestion
+from src.feed_cache import FeedCache
+
+FEED_URL = 'https://example.com/feed'
+
+RSS_BODY = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel>
+  <item><title>New AI model</title><link>https://example.com/1</link></item>
+  <item><title>Another AI agent</title><link>https://example.com/2</link></item>
+</channel></rss>"""
+
+def _response(status_code, content=b'', headers=None):
+    return SimpleNamespace(status_code=status_code, content=content, headers=headers or {})
+
+@pytest.fixture
+def feed_cache(monkeypatch):
+    cache = FeedCache()
+    cache._redis_checked = True # In-memory only, whatever Redis settings the environment has
+    monkeypatch.setattr(ingestion, '_fetch_cache', cache)
+    return cache
+
+@pytest.fixture
+def spec():
+    return ingestion._build_filter_spec({'max_hours_since_published': None})
+
+def _serve(monkeypatch, *responses):
+    """Makes _http_get return responses in order, recording the request headers."""
+    calls = []
+    queue = list(responses)
+
+    def http_get(url, headers):
+        calls.append(headers)
+        return queue.pop(0)
+
+    monkeypatch.setattr(ingestion, '_http_get', http_get)
+    return calls
+
+def _links(items):
+    return [item.link for item in items]
+
+def _age_entry(cache, seconds):
+    """Backdates the cached entry so the next fetch revalidates instead of using it as fresh."""
+    fetched_at, data = cache.get(FEED_URL)
+    cache.put(FEED_URL, fetched_at - seconds, data)
+
+# --- Conditional GET ---
+
+def test_revalidation_sends_the_cached_validators(monkeypatch, feed_cache, spec):
+    headers = {'ETag': '"v1"', 'Last-Modified': 'Wed, 14 Oct 2026 08:00:00 GMT'}
+    calls = _serve(monkeypatch, _response(200, RSS_BODY, headers), _response(304))
+    ingestion._fetch_single_feed(FEED_URL, {}, spec)
+    _age_entry(feed_cache, 3600)
+
+    items, _ = ingestion._fetch_single_feed(FEED_URL, {}, spec)
+
+    assert calls == [{}, {'If-None-Match': '"v1"', 'If-Modified-Since': 'Wed, 14 Oct 2026 08:00:00 GMT'}]
+    assert _links(items) == ['https://example.com/1', 'https://example.com/2']
+
+def test_not_modified_without_a_cached_entry_returns_no_items(monkeypatch, feed_cache, spec):
+    _serve(monkeypatch, _response(304))
+
+    assert ingestion._fetch_single_feed(FEED_URL, {}, spec) == ([], FEED_URL)
+
+def test_failed_fetch_drops_the_cached_entry(monkeypatch, feed_cache, spec):
+    _serve(monkeypatch, _response(200, RSS_BODY), _response(500))
+    ingestion._fetch_single_feed(FEED_URL, {}, spec)
+    _age_entry(feed_cache, 3600)
+
+    assert ingestion._fetch_single_feed(FEED_URL, {}, spec) == (None, FEED_URL)
+    assert feed_cache.get(FEED_URL) is None
+
+# --- Cached items ---
+
+def test_not_modified_response_drops_items_processed_since_caching(monkeypatch, feed_cache, spec):
+    _serve(monkeypatch, _response(200, RSS_BODY, {'ETag': '"v1"'}), _response(304))
+    ingestion._fetch_single_feed(FEED_URL, {}, spec)
+    _age_entry(feed_cache, 3600)
+
+    processed_urls = {'https://example.com/1': datetime.datetime.now()}
+    items, _ = ingestion._fetch_single_feed(FEED_URL, processed_urls, spec)
+
+    assert _links(items) == ['https://example.com/2']
+
+def test_fresh_cache_hit_drops_items_processed_since_caching(monkeypatch, feed_cache, spec):
+    calls = _serve(monkeypatch, _response(200, RSS_BODY))
+    ingestion._fetch_single_feed(FEED_URL, {}, spec)
+
+    processed_urls = {'https://example.com/2': datetime.datetime.now()}
+    items, _ = ingestion._fetch_single_feed(FEED_URL, processed_urls, spec)
+
+    assert len(calls) == 1
+    assert _links(items) == ['https://example.com/1']
+
+def test_items_processed_over_a_week_ago_are_returned_again(monkeypatch, feed_cache, spec):
+    _serve(monkeypatch, _response(200, RSS_BODY))
+    ingestion._fetch_single_feed(FEED_URL, {}, spec)
+
+    processed_urls = {'https://example.com/1': datetime.datetime.now() - datetime.timedelta(days=8)}
+    items, _ = ingestion._fetch_single_feed(FEED_URL, processed_urls, spec)
+
+    assert _links(items) == ['https://example.com/1', 'https://example.com/2']
+
+def test_cached_items_behind_the_cutoff_are_dropped(feed_cache):
+    item = ingestion.FeedItem(title='Old AI news', link='https://example.com/old', published=None,
+                              published_epoch=1_000.0, summary='', source_feed=FEED_URL, id=None)
+    undated = ingestion.FeedItem(title='Undated', link='https://example.com/undated', published=None,
+                                 published_epoch=None, summary='', source_feed=FEED_URL, id=None)
+    spec = ingestion._build_filter_spec({'max_hours_since_published': 48})
+
+    kept = ingestion._reselect_cached_items([item, undated], {}, spec, datetime.datetime.now())
+
+    assert kept == [undated]
+
+# --- Cross-feed deduplication ---
+
+def test_items_in_several_feeds_are_kept_once(monkeypatch, feed_cache):
+    _serve(monkeypatch, _response(200, RSS_BODY), _response(200, RSS_BODY))
+    config = {'ingestion': {'max_hours_since_published': None}}
+
+    items = ingestion.fetch_all_feeds([FEED_URL, 'https://mirror.example.org/feed'], config, {}, max_workers=1)
+
+    assert sorted(item['link'] for item in items) == ['https://example.com/1', 'https://example.com/2']
+
+# --- Feed parsing ---
+
+def _parse(body, monkeypatch, spec):
+    _serve(monkeypatch, _response(200, body))
+    items, _ = ingestion._fetch_single_feed(FEED_URL, {}, spec)
+    return items
+
+def test_rss_090_feed_falls_back_to_feedparser(monkeypatch, feed_cache, spec):
+    body = b"""<?xml version="1.0"?>
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" xmlns="http://my.netscape.com/rdf/simple/0.9/">
+  <channel><title>Old feed</title><link>https://example.com/</link></channel>
+  <item><title>Vintage AI news</title><link>https://example.com/vintage</link></item>
+</rdf:RDF>"""
+
+    assert _links(_parse(body, monkeypatch, spec)) == ['https://example.com/vintage']
+
+def test_atom_xhtml_summary_keeps_its_text(monkeypatch, feed_cache, spec):
+    body = b"""<?xml version="1.0"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <entry>
+    <title>Atom AI entry</title><link href="https://example.com/atom"/><id>urn:atom:1</id>
+    <summary type="xhtml"><div xmlns="http://www.w3.org/1999/xhtml"><p>Nested <b>AI</b> text</p></div></summary>
+  </entry>
+</feed>"""
+
+    [item] = _parse(body, monkeypatch, spec)
+
+    assert item.summary == 'Nested AI text'
+
+def test_html_summaries_are_reduced_to_text(monkeypatch, feed_cache, spec):
+    body = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel>
+  <item><title>AI &amp;amp; more</title><link>https://example.com/html</link>
+    <description><![CDATA[<p>First&nbsp;paragraph</p><script>alert(1)</script><p>Second &amp; last</p>]]></description>
+  </item>
+</channel></rss>"""
+
+    [item] = _parse(body, monkeypatch, spec)
+
+    assert item.title == 'AI & more'
+    assert item.summary == 'First paragraph Second & last'
@@ -0,0 +1,34 @@
+from src.prefilter import prefilter
+
+FEEDS = ['https://a.example.com/feed', 'https://b.example.com/feed']
+
+def _items(count):
+    return [{'title': f'Item {n}', 'summary': '', 'source_feed': FEEDS[n % 2]} for n in range(count)]
+
+def test_without_a_prefilter_section_every_item_is_kept():
+    items = _items(200)
+
+    assert prefilter(items, {'rss_feeds': FEEDS}) is items
+
+def test_without_keep_every_item_is_kept():
+    items = _items(200)
+    config = {'rss_feeds': FEEDS, 'prefilter': {'priority_keywords': ['gemini']}}
+
+    assert prefilter(items, config) is items
+
+def test_keep_caps_the_items_by_score_in_original_order():
+    items = _items(6)
+    items[4]['title'] = 'Gemini release'
+    config = {'rss_feeds': FEEDS, 'prefilter': {'keep': 3, 'priority_keywords': ['GEMINI']}}
+
+    kept = prefilter(items, config)
+
+    # Item 4 matches a keyword; the rest come from the higher-weighted first feed
+    assert kept == [items[0], items[2], items[4]]
+
+def test_only_configured_keywords_count():
+    items = _items(4)
+    items[3]['title'] = 'OpenAI news'
+    config = {'rss_feeds': FEEDS, 'prefilter': {'keep': 2}}
+
+    assert prefilter(items, config) == [items[0], items[2]]
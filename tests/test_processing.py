@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+import pytest
+
+import src.processing as processing
+
+def _items(count):
+    return [{'title': f'Story number {n} about something', 'link': f'https://example.com/{n}',
+             'summary': '', 'source_feed': 'https://example.com/feed'} for n in range(count)]
+
+def test_over_budget_prompts_are_split_without_pre_filtering_again(monkeypatch):
+    prefilter_calls = []
+    real_prefilter = processing.prefilter
+    sent_sizes = []
+    real_build = processing._build_filter_prompt
+
+    def spy_prefilter(items, config):
+        prefilter_calls.append(len(items))
+        return real_prefilter(items, config)
+
+    def spy_build(items, config):
+        sent_sizes.append(len(items))
+        return real_build(items, config)
+
+    monkeypatch.setattr(processing, 'prefilter', spy_prefilter)
+    monkeypatch.setattr(processing, '_build_filter_prompt', spy_build)
+    monkeypatch.setattr(processing, '_prompt_over_budget', lambda model, prompt, config, count: count > 3)
+    monkeypatch.setattr(processing, '_make_gemini_call_with_tracking',
+                        lambda **kwargs: SimpleNamespace(text='[{"idx": 0}]'))
+
+    result = processing.filter_and_tag_items(_items(8), {'prefilter': {'keep': 6}})
+
+    assert prefilter_calls == [8]
+    assert sent_sizes == [6, 3, 3]
+    assert [item['url'] for item in result] == ['https://example.com/0', 'https://example.com/3']
+
+def test_prompt_well_under_budget_is_not_counted(monkeypatch):
+    monkeypatch.setattr(processing, 'get_gemini_model', pytest.fail)
+
+    assert processing._prompt_over_budget('model', 'x' * 400, {'max_prompt_tokens': 1000}, 1) is False
+
+@pytest.mark.parametrize('counted, expected', [(900, False), (1100, True)])
+def test_prompt_near_budget_is_counted_with_the_model(monkeypatch, counted, expected):
+    model = SimpleNamespace(count_tokens=lambda prompt: SimpleNamespace(total_tokens=counted))
+    monkeypatch.setattr(processing, 'get_gemini_model', lambda name: model)
+
+    assert processing._prompt_over_budget('model', 'x' * 2400, {'max_prompt_tokens': 1000}, 1) is expected
@@ -0,0 +1,112 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import src.rate_limiter as rate_limiter
+from src.rate_limiter import AdaptiveSemaphore, TokenBucket, WINDOW_SECONDS
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replaces the limiter's clock with one the test advances by hand."""
+    now = [1000.0]
+    monkeypatch.setattr(rate_limiter, 'time', SimpleNamespace(monotonic=lambda: now[0], sleep=None))
+    return now
+
+@pytest.mark.parametrize('rpm, tpm', [(None, None), (0, None), (0, 0), (-1, None)])
+def test_missing_or_non_positive_limits_never_wait(clock, rpm, tpm):
+    bucket = TokenBucket(rpm=rpm, tpm=tpm)
+    for _ in range(100):
+        entry, wait = bucket.reserve(10_000)
+        assert entry is not None and wait == 0
+
+def test_zero_rpm_with_a_token_limit_only_enforces_tokens(clock):
+    bucket = TokenBucket(rpm=0, tpm=100)
+    assert bucket.reserve(60)[0] is not None
+    entry, wait = bucket.reserve(60)
+    assert entry is None
+    assert wait == WINDOW_SECONDS
+
+def test_rpm_limit_waits_until_the_oldest_request_leaves_the_window(clock):
+    bucket = TokenBucket(rpm=2)
+    bucket.reserve(1)
+    clock[0] += 10
+    bucket.reserve(1)
+
+    entry, wait = bucket.reserve(1)
+    assert entry is None
+    assert wait == WINDOW_SECONDS - 10
+
+    clock[0] += wait
+    assert bucket.reserve(1)[0] is not None
+
+def test_request_larger_than_the_token_budget_goes_through_on_an_empty_window(clock):
+    bucket = TokenBucket(tpm=100)
+    assert bucket.reserve(500)[0] is not None
+    assert bucket.reserve(1)[0] is None
+
+def test_settle_corrects_the_token_estimate(clock):
+    bucket = TokenBucket(tpm=100)
+    entry, _ = bucket.reserve(90)
+    assert bucket.reserve(20)[0] is None
+
+    bucket.settle(entry, 10)
+    assert bucket.reserve(20)[0] is not None
+
+def test_settle_after_the_entry_left_the_window_does_not_change_the_total(clock):
+    bucket = TokenBucket(tpm=100)
+    entry, _ = bucket.reserve(50)
+    clock[0] += WINDOW_SECONDS + 1
+    bucket.reserve(100)
+
+    bucket.settle(entry, 1_000)
+    assert bucket._tokens == 100
+
+def test_configure_rate_limits_ignores_zero_and_invalid_values():
+    processing = pytest.importorskip('src.processing')
+    processing.configure_rate_limits({
+        'default': {'rpm': 0},
+        'model-a': {'rpm': 'fast', 'tpm': 1000},
+        'model-b': {'rpm': '5'},
+        'model-c': {'rpm': 0, 'tpm': None},
+    })
+    try:
+        assert processing._default_rate_limits is None
+        assert processing._get_rate_limiter('unlisted') is None
+        assert processing._get_rate_limiter('model-c') is None
+        assert (processing._rate_limiters['model-a']._rpm, processing._rate_limiters['model-a']._tpm) == (None, 1000)
+        assert processing._rate_limiters['model-b']._rpm == 5
+    finally:
+        processing.configure_rate_limits({})
+
+def test_adaptive_semaphore_halves_on_failure_and_recovers_on_successes():
+    semaphore = AdaptiveSemaphore(8, success_streak=2, cooldown=0)
+    semaphore.on_failure()
+    assert semaphore.limit == 4
+    semaphore.on_failure()
+    semaphore.on_failure()
+    semaphore.on_failure()
+    assert semaphore.limit == 1
+
+    semaphore.on_success()
+    semaphore.on_success()
+    assert semaphore.limit == 2
+
+def test_adaptive_semaphore_limits_concurrent_holders():
+    semaphore = AdaptiveSemaphore(2)
+    active = 0
+    peak = 0
+
+    async def task():
+        nonlocal active, peak
+        async with semaphore:
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0)
+            active -= 1
+
+    async def main():
+        await asyncio.gather(*(task() for _ in range(6)))
+
+    asyncio.run(main())
+    assert peak == 2
@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+
+import google.generativeai as genai
+
+from src.response_cache import ResponseCache
+
+def _response(text):
+    usage = SimpleNamespace(prompt_token_count=10, candidates_token_count=5, total_token_count=15)
+    return SimpleNamespace(text=text, usage_metadata=usage)
+
+def test_responses_round_trip(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / 'cache.sqlite3'))
+    cache.put('model', 'prompt', _response('answer'))
+
+    cached = cache.get('model', 'prompt')
+
+    assert cached.text == 'answer'
+    assert cached.usage_metadata.total_token_count == 15
+
+def test_generation_config_is_part_of_the_key(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / 'cache.sqlite3'))
+    json_mode = genai.GenerationConfig(response_mime_type='application/json', temperature=0.2)
+    cache.put('model', 'prompt', _response('[]'), json_mode)
+
+    assert cache.get('model', 'prompt') is None
+    assert cache.get('model', 'prompt', {'response_mime_type': 'application/json'}) is None
+    assert cache.get('model', 'prompt', genai.GenerationConfig(response_mime_type='application/json',
+                                                                temperature=0.2)).text == '[]'
+
+def test_equal_dict_configs_share_an_entry(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / 'cache.sqlite3'))
+    cache.put('model', 'prompt', _response('answer'), {'temperature': 0.2, 'response_schema': list[int]})
+
+    assert cache.get('model', 'prompt', {'response_schema': list[int], 'temperature': 0.2}).text == 'answer'
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / 'cache.sqlite3'), enabled=False)
+    cache.put('model', 'prompt', _response('answer'))
+
+    assert cache.get('model', 'prompt') is None
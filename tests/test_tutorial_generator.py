@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+import pytest
+
+import src.processing as processing
+import src.tutorial_generator as tutorial_generator
+from src.tutorial_generator import load_tutorial_topics, save_tutorial_rotation, select_tutorial_topic
+
+TOPICS = ['LangGraph basics', 'Vertex AI pipelines', 'Label Studio setup']
+
+def test_rotation_starts_at_the_first_topic_without_saved_state(tmp_path):
+    load_tutorial_topics(TOPICS, str(tmp_path / 'state.json'))
+
+    assert select_tutorial_topic() == 'LangGraph basics'
+
+def test_rotation_continues_after_the_last_topic_sent(tmp_path):
+    state_file = str(tmp_path / 'data' / 'state.json')
+    for expected in TOPICS + TOPICS[:1]:
+        # Each run loads the topics afresh, as a run_mode: once process does
+        load_tutorial_topics(TOPICS, state_file)
+        topic = select_tutorial_topic()
+        save_tutorial_rotation(topic, state_file)
+        assert topic == expected
+
+def test_a_saved_topic_no_longer_listed_restarts_the_rotation(tmp_path):
+    state_file = str(tmp_path / 'state.json')
+    save_tutorial_rotation('Retired topic', state_file)
+    load_tutorial_topics(TOPICS, state_file)
+
+    assert select_tutorial_topic() == 'LangGraph basics'
+
+@pytest.fixture
+def tutorial_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(tutorial_generator, 'TUTORIAL_CACHE_PATH', str(tmp_path / 'tutorials.sqlite3'))
+    monkeypatch.setattr(tutorial_generator, '_tutorial_cache', None)
+
+def test_tutorials_are_cached_once_outside_the_response_cache(monkeypatch, tutorial_cache):
+    calls = []
+
+    def gemini_call(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(text='<h2>Tutorial</h2>')
+
+    monkeypatch.setattr(processing, '_make_gemini_call_with_tracking', gemini_call)
+
+    assert tutorial_generator.generate_tutorial('LangGraph basics', {}) == '<h2>Tutorial</h2>'
+    assert tutorial_generator.generate_tutorial('langgraph  Basics', {}) == '<h2>Tutorial</h2>'
+    assert len(calls) == 1
+    assert calls[0]['use_cache'] is False